@@ -0,0 +1,132 @@
+"""
+Admission control for the Comic Panel Description Generator API.
+Each endpoint class runs at most a fixed number of requests at once and queues
+a bounded number more. Requests beyond that are turned away immediately with a
+Retry-After hint instead of piling up until they all time out.
+"""
+
+import logging
+import math
+import threading
+import time
+from mcp_server.utils.metrics import metrics_registry
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+admission_in_flight = metrics_registry.gauge(
+    "admission_in_flight", "Admitted requests being handled", ("endpoint_class",))
+admission_queue_depth = metrics_registry.gauge(
+    "admission_queue_depth", "Requests waiting for admission", ("endpoint_class",))
+admission_wait_seconds = metrics_registry.histogram(
+    "admission_wait_seconds", "Time admitted requests waited in the queue", ("endpoint_class",))
+admission_rejected = metrics_registry.counter(
+    "admission_rejected_total", "Requests turned away by admission control", ("endpoint_class", "reason"))
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted."""
+
+    def __init__(self, message, reason, retry_after):
+        """
+        Initialize the rejection.
+
+        Args:
+            message (str): Error message
+            reason (str): "queue_full" or "timeout"
+            retry_after (int): Seconds the client should wait before retrying
+        """
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = retry_after
+
+class AdmissionLimiter:
+    """
+    Caps concurrent requests for one endpoint class, with a bounded FIFO queue.
+
+    Waiters are woken in arrival order and new arrivals do not jump ahead of
+    them. Under gevent the lock and condition are cooperative, so waiting
+    requests do not block the worker.
+    """
+
+    def __init__(self, name, max_in_flight, max_queue, queue_timeout):
+        """
+        Initialize the limiter.
+
+        Args:
+            name (str): Endpoint class name, used in metrics and messages
+            max_in_flight (int): Requests handled at once
+            max_queue (int): Requests allowed to wait for a slot
+            queue_timeout (float): Longest time a request waits for a slot, in seconds
+        """
+        self.name = name
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.max_queue = max(0, int(max_queue))
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.waiting = 0
+        # Moving average of how long a request holds its slot, for Retry-After
+        self._hold_seconds = 1.0
+        self._condition = threading.Condition()
+
+        admission_in_flight.set_function(lambda: self.in_flight, endpoint_class=name)
+        admission_queue_depth.set_function(lambda: self.waiting, endpoint_class=name)
+
+    def retry_after(self):
+        """
+        Estimate when a slot is likely to be free.
+
+        Returns:
+            int: Seconds, at least 1
+        """
+        backlog = (self.waiting + 1) / self.max_in_flight
+        return max(1, math.ceil(self._hold_seconds * backlog))
+
+    def _reject(self, reason, message):
+        admission_rejected.inc(endpoint_class=self.name, reason=reason)
+        logger.warning(f"Rejecting {self.name} request: {message}")
+        raise AdmissionRejected(message, reason, self.retry_after())
+
+    def acquire(self):
+        """
+        Take a slot, waiting in the queue if all slots are busy.
+
+        Raises:
+            AdmissionRejected: If the queue is full or no slot frees up within queue_timeout
+        """
+        start = time.monotonic()
+        with self._condition:
+            if self.in_flight < self.max_in_flight and self.waiting == 0:
+                self.in_flight += 1
+                admission_wait_seconds.observe(0.0, endpoint_class=self.name)
+                return
+
+            if self.waiting >= self.max_queue:
+                self._reject("queue_full", f"{self.name} queue is full ({self.waiting} waiting)")
+
+            self.waiting += 1
+            try:
+                expires_at = start + self.queue_timeout
+                while self.in_flight >= self.max_in_flight:
+                    remaining = expires_at - time.monotonic()
+                    if remaining <= 0:
+                        self._reject("timeout", f"no {self.name} slot within {self.queue_timeout:.0f}s")
+                    self._condition.wait(remaining)
+            finally:
+                self.waiting -= 1
+
+            self.in_flight += 1
+        admission_wait_seconds.observe(time.monotonic() - start, endpoint_class=self.name)
+
+    def release(self, held_seconds=None):
+        """
+        Give a slot back and wake the longest waiting request.
+
+        Args:
+            held_seconds (float, optional): How long the slot was held, used for Retry-After
+        """
+        with self._condition:
+            self.in_flight -= 1
+            if held_seconds is not None:
+                self._hold_seconds = 0.8 * self._hold_seconds + 0.2 * held_seconds
+            self._condition.notify()
@@ -7,11 +7,17 @@ import os
 import base64
 import json
 import logging
-import tempfile
 import time
-from flask import Flask, request, jsonify
+import contextvars
+import ipaddress
+import socket
+import requests
+from urllib.parse import urlparse
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from flask import Flask, Response, g, request, jsonify
 from werkzeug.exceptions import BadRequest
 from dotenv import load_dotenv
+from mcp_server.utils.provider_utils import Deadline, DEADLINE_HEADER
 
 # Load environment variables from .env file
 load_dotenv()
@@ -20,28 +26,322 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# Check if we should use local processing or MCP
-USE_MCP = os.environ.get('USE_MCP', 'false').lower() == 'true'
+# Time budget for a describe request when the caller does not send a shorter one.
+# Keeps the provider chain inside the web app's API_TIMEOUT (30s).
+DESCRIBE_BUDGET_SECONDS = float(os.environ.get('DESCRIBE_BUDGET_SECONDS', 25))
 
-if USE_MCP:
-    # Import MCP client
-    logger.info("Using MCP for processing")
-    from mcp_client import analyze_panel_with_mcp, generate_description_with_mcp, verify_description_with_mcp
-else:
-    # Import local processing modules
-    logger.info("Using local processing")
-    from app.vision import analyze_panel
-    from app.textgen import generate_description
+# Progressive describe: background LLM upgrades and how long clients may long-poll for them
+DESCRIBE_JOB_WORKERS = int(os.environ.get('DESCRIBE_JOB_WORKERS', 4))
+DESCRIBE_JOB_TTL = float(os.environ.get('DESCRIBE_JOB_TTL', 600))
+# Most upgrades queued or running; past that the draft is returned without one
+DESCRIBE_JOB_MAX_PENDING = int(os.environ.get('DESCRIBE_JOB_MAX_PENDING', 64))
+MAX_POLL_WAIT_SECONDS = 30
+
+# Worker pool for image analysis (OpenCV releases the GIL) and the largest batch accepted
+ANALYSIS_WORKERS = int(os.environ.get('ANALYSIS_WORKERS', os.cpu_count() or 4))
+MAX_BATCH_SIZE = int(os.environ.get('MAX_BATCH_SIZE', 200))
+# Images of one batch analyzed at once; a batch holds a single analyze slot,
+# so at most ANALYZE_MAX_IN_FLIGHT * BATCH_MAX_IN_FLIGHT images are in flight
+BATCH_MAX_IN_FLIGHT = int(os.environ.get('BATCH_MAX_IN_FLIGHT', 4))
+
+# Job queue for long-running image, page and archive jobs
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+JOB_TTL = float(os.environ.get('JOB_TTL', 3600))
+JOB_MAX_PENDING = int(os.environ.get('JOB_MAX_PENDING', 32))
+MAX_ARCHIVE_PAGES = int(os.environ.get('MAX_ARCHIVE_PAGES', 200))
+MAX_ARCHIVE_PAGE_BYTES = 50 * 1024 * 1024
+WEBHOOK_TIMEOUT = 10  # seconds
+# Webhook hosts allowed when set (comma-separated); otherwise any host with only public addresses
+WEBHOOK_ALLOWED_HOSTS = {host.strip().lower() for host in os.environ.get('WEBHOOK_ALLOWED_HOSTS', '').split(',') if host.strip()}
+JOB_TYPES = ("image", "page", "archive")
+
+# Admission control: requests handled at once and queued per endpoint class.
+# Analysis is CPU-bound, so its limit follows the core count; describe mostly
+# waits on providers and can run many more at once under gevent.
+ANALYZE_MAX_IN_FLIGHT = int(os.environ.get('ANALYZE_MAX_IN_FLIGHT', os.cpu_count() or 4))
+ANALYZE_MAX_QUEUE = int(os.environ.get('ANALYZE_MAX_QUEUE', 2 * ANALYZE_MAX_IN_FLIGHT))
+DESCRIBE_MAX_IN_FLIGHT = int(os.environ.get('DESCRIBE_MAX_IN_FLIGHT', 200))
+DESCRIBE_MAX_QUEUE = int(os.environ.get('DESCRIBE_MAX_QUEUE', 400))
+ADMISSION_QUEUE_TIMEOUT = float(os.environ.get('ADMISSION_QUEUE_TIMEOUT', 10))
+
+from app.pipeline import (USE_MCP, analyze_path, analyze_image_bytes, describe_with_mode,
+                          resolve_describe_mode, upgrade_description, process_panel, split_page,
+                          read_archive_pages, read_archive_page)
+from mcp_server.utils.metrics import metrics_registry
+from mcp_server.utils.tracing import TRACEPARENT_HEADER, begin_trace, end_trace, server_timing
+from mcp_server.utils.feedback_store import get_feedback_store, parse_rating
+from mcp_server.utils.feedback_analytics import get_feedback_analytics, warm_up as warm_up_feedback_analytics
+from app.jobs import JobStore, JobQueueFull
+from app.admission import AdmissionLimiter, AdmissionRejected
 
 # Create Flask app
 app = Flask(__name__)
 
+http_requests_in_flight = metrics_registry.gauge(
+    "http_requests_in_flight", "Requests currently being handled", ("endpoint",))
+http_request_seconds = metrics_registry.histogram(
+    "http_request_seconds", "Time to handle a request, up to the first response byte", ("endpoint", "method", "status"))
+
+def after_response(func, *args):
+    """
+    Run request cleanup once the response has been sent.
+    
+    Teardown runs as soon as the view returns, before a streamed body is
+    produced, so for streamed responses the cleanup is deferred until the
+    server closes the response.
+    
+    Args:
+        func (callable): Cleanup function
+        *args: Arguments for func
+    """
+    response = g.get("streamed_response")
+    if response is None:
+        func(*args)
+    else:
+        response.call_on_close(lambda: func(*args))
+
+@app.before_request
+def start_request_metrics():
+    """Count the request as in flight and start its timer."""
+    # Label by route rule rather than path so job ids do not create new series
+    g.metrics_endpoint = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    g.request_start = time.perf_counter()
+    http_requests_in_flight.inc(endpoint=g.metrics_endpoint)
+
+@app.after_request
+def record_request_metrics(response):
+    """Record the request duration with its status code."""
+    start = g.get("request_start")
+    if start is not None:
+        http_request_seconds.observe(time.perf_counter() - start, endpoint=g.metrics_endpoint,
+                                     method=request.method, status=str(response.status_code))
+    return response
+
+@app.after_request
+def note_streamed_response(response):
+    """Remember a streamed response so cleanup can wait for its body."""
+    if response.is_streamed:
+        g.streamed_response = response
+    return response
+
+@app.teardown_request
+def finish_request_metrics(exc):
+    """Remove the request from the in-flight count."""
+    endpoint = g.pop("metrics_endpoint", None)
+    if endpoint is not None:
+        after_response(lambda: http_requests_in_flight.dec(endpoint=endpoint))
+
+@app.before_request
+def start_request_trace():
+    """Start this request's root span, continuing the caller's trace."""
+    g.trace_root, g.trace_token = begin_trace(f"api {request.method} {g.metrics_endpoint}",
+                                              request.headers.get(TRACEPARENT_HEADER))
+
+@app.after_request
+def add_server_timing(response):
+    """Summarize the stages of the request in a Server-Timing header."""
+    root = g.get("trace_root")
+    if root is not None:
+        response.headers["Server-Timing"] = server_timing(root)
+    return response
+
+@app.teardown_request
+def finish_request_trace(exc):
+    """Finish and export the request's root span."""
+    root = g.pop("trace_root", None)
+    if root is not None:
+        # The context variable is reset here, in the request's context; the
+        # root span of a streamed response ends with its body
+        end_trace(root, g.pop("trace_token"), finish=False)
+        after_response(root.finish)
+
+admission_limiters = {
+    "analyze": AdmissionLimiter("analyze", ANALYZE_MAX_IN_FLIGHT, ANALYZE_MAX_QUEUE, ADMISSION_QUEUE_TIMEOUT),
+    "describe": AdmissionLimiter("describe", DESCRIBE_MAX_IN_FLIGHT, DESCRIBE_MAX_QUEUE, ADMISSION_QUEUE_TIMEOUT)
+}
+
+# View functions under admission control, by endpoint class
+ADMISSION_CLASSES = {
+    "analyze": "analyze",
+    "analyze_batch": "analyze",
+    "process": "analyze",
+    "describe": "describe"
+}
+
+@app.before_request
+def admit_request():
+    """Wait for a slot in the endpoint's class, or turn the request away."""
+    endpoint_class = ADMISSION_CLASSES.get(request.endpoint)
+    if endpoint_class is None:
+        return None
+    
+    limiter = admission_limiters[endpoint_class]
+    try:
+        limiter.acquire()
+    except AdmissionRejected as e:
+        response = jsonify({"error": str(e), "reason": e.reason})
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, 503
+    g.admission = (limiter, time.monotonic())
+    return None
+
+@app.teardown_request
+def release_admission(exc):
+    """Give the request's slot back."""
+    admission = g.pop("admission", None)
+    if admission is not None:
+        limiter, admitted_at = admission
+        after_response(lambda: limiter.release(time.monotonic() - admitted_at))
+
+# Shared pool for image analysis
+analysis_executor = ThreadPoolExecutor(max_workers=ANALYSIS_WORKERS, thread_name_prefix="analysis")
+
+# Background workers that upgrade progressive descriptions with the LLM result
+describe_jobs = JobStore("describe", max_workers=DESCRIBE_JOB_WORKERS, ttl=DESCRIBE_JOB_TTL,
+                         max_pending=DESCRIBE_JOB_MAX_PENDING)
+
+def job_response(job):
+    """Shape an /api/jobs job for API responses and webhooks."""
+    response = {
+        "job_id": job["job_id"],
+        "type": job["type"],
+        "status": job["status"],
+        "progress": job["progress"],
+        "created_at": job["created_at"],
+        "finished_at": job["finished_at"]
+    }
+    if job["status"] == "done":
+        response["result"] = job["result"]
+    elif job["status"] == "error":
+        response["error"] = job["error"]
+    return response
+
+def check_webhook_url(url):
+    """
+    Make sure a webhook URL cannot be used to reach internal services.
+    
+    With WEBHOOK_ALLOWED_HOSTS set, only those hosts are accepted. Otherwise
+    the host is resolved and every address must be public: loopback,
+    private, link-local (including cloud metadata endpoints) and other
+    reserved ranges are rejected.
+    
+    Args:
+        url (str): Webhook URL
+        
+    Raises:
+        ValueError: If the URL is not http(s) or its host is not allowed
+    """
+    parsed = urlparse(url)
+    if parsed.scheme not in ('http', 'https') or not parsed.hostname:
+        raise ValueError("webhook_url must be an http or https URL")
+    
+    host = parsed.hostname.lower()
+    if WEBHOOK_ALLOWED_HOSTS:
+        if host not in WEBHOOK_ALLOWED_HOSTS:
+            raise ValueError(f"webhook_url host {host} is not allowed")
+        return
+    
+    try:
+        addresses = socket.getaddrinfo(host, parsed.port or 80, proto=socket.IPPROTO_TCP)
+    except socket.gaierror as e:
+        raise ValueError(f"webhook_url host {host} cannot be resolved: {str(e)}")
+    for address in addresses:
+        # Drop any IPv6 zone id before parsing
+        ip = ipaddress.ip_address(address[4][0].split('%')[0])
+        if not ip.is_global:
+            raise ValueError(f"webhook_url host {host} resolves to a non-public address")
+
+def send_job_webhook(job):
+    """POST a finished job to its webhook URL, if it has one."""
+    webhook_url = job.get("webhook_url")
+    if not webhook_url:
+        return
+    
+    try:
+        # Checked again at delivery: the host may resolve differently by now
+        check_webhook_url(webhook_url)
+        # Redirects are not followed, so they cannot lead to an internal address
+        response = requests.post(webhook_url, json=job_response(job), timeout=WEBHOOK_TIMEOUT,
+                                 allow_redirects=False)
+        logger.info(f"Webhook for job {job['job_id']} returned {response.status_code}")
+    except (ValueError, requests.RequestException) as e:
+        logger.error(f"Webhook for job {job['job_id']} failed: {str(e)}")
+
+# Bounded pool for /api/jobs; results are kept for JOB_TTL seconds
+panel_jobs = JobStore("jobs", max_workers=JOB_WORKERS, ttl=JOB_TTL, max_pending=JOB_MAX_PENDING,
+                      on_finish=send_job_webhook)
+
+# Build the feedback aggregates while the server starts taking requests
+warm_up_feedback_analytics()
+
+def run_panel_job(job_type, data, pages, commercial_grade=False):
+    """
+    Process an /api/jobs job on the job pool.
+    
+    Args:
+        job_type (str): "image", "page" or "archive"
+        data (bytes): Uploaded image or archive
+        pages (list): (name, zipfile.ZipInfo) pairs for archives, None otherwise
+        commercial_grade (bool, optional): Use the minimal rule-based description
+        
+    Returns:
+        dict: Pages processed, panel results in reading order and per-page or per-panel errors
+    """
+    if pages is None:
+        pages = [(job_type, None)]
+    
+    panels = []
+    errors = []
+    panel_num = 0
+    for page_num, (name, info) in enumerate(pages, 1):
+        try:
+            page_bytes = data if info is None else read_archive_page(data, info)
+            if job_type == "image":
+                units = [{"image_bytes": page_bytes}]
+            else:
+                units = [{"image": image} for image in split_page(page_bytes)]
+        except ValueError as e:
+            errors.append({"page": page_num, "source": name, "error": str(e)})
+            units = []
+        
+        for unit in units:
+            panel_num += 1
+            try:
+                result = process_panel(panel_num=panel_num, commercial_grade=commercial_grade,
+                                       deadline=Deadline(DESCRIBE_BUDGET_SECONDS), **unit)
+                result.update(page=page_num, panel_num=panel_num, source=name)
+                panels.append(result)
+            except Exception as e:
+                logger.error(f"Error processing panel {panel_num} of {name}: {str(e)}")
+                errors.append({"page": page_num, "panel_num": panel_num, "source": name, "error": str(e)})
+            panel_jobs.report_progress(pages_done=page_num - 1, pages_total=len(pages), panels_done=panel_num)
+        
+        panel_jobs.report_progress(pages_done=page_num, pages_total=len(pages), panels_done=panel_num)
+    
+    return {"pages": len(pages), "panels": panels, "errors": errors}
+
+def describe_job_response(job):
+    """Shape a describe job for API responses."""
+    response = {"job_id": job["job_id"], "status": job["status"]}
+    if job["status"] == "done":
+        response["description"] = job["result"]
+    elif job["status"] == "error":
+        response["error"] = job["error"]
+    return response
+
+def is_raw_image_request():
+    """Whether the request body is the encoded image itself."""
+    return request.mimetype.startswith('image/') or request.mimetype == 'application/octet-stream'
+
 @app.route('/api/analyze', methods=['POST'])
 def analyze():
     """
     Analyze a comic panel image.
     
-    Request body:
+    Request body, one of:
+        - the encoded image itself, with an image/* or application/octet-stream Content-Type
+        - multipart/form-data with the image in a "file" part
+        - JSON (base64 images are about a third larger than the formats above):
         {
             "image_data": "base64 encoded image or path",
             "is_path": boolean,
@@ -56,49 +356,43 @@ def analyze():
         }
     """
     try:
-        # Get request data
-        data = request.json
-        if not data:
-            raise BadRequest("Missing request body")
-        
-        image_data = data.get('image_data')
-        is_path = data.get('is_path', False)
-        
-        if not image_data:
-            raise BadRequest("Missing image_data parameter")
-        
-        # Process the image
-        if is_path:
-            # Use the path directly
-            if USE_MCP:
-                result = analyze_panel_with_mcp(image_data)
-            else:
-                result = analyze_panel(image_data)
+        if is_raw_image_request():
+            # Decode straight from the body without an intermediate copy
+            result = analyze_image_bytes(request.get_data(cache=False))
+        elif request.files:
+            upload = request.files.get('file')
+            if upload is None:
+                raise BadRequest("Missing file part")
+            result = analyze_image_bytes(upload.read())
         else:
-            # Save base64 data to a temporary file
-            try:
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as temp:
-                    temp_path = temp.name
-                    # Decode base64 data
-                    image_bytes = base64.b64decode(image_data)
-                    temp.write(image_bytes)
-                
-                # Process the temporary file
-                if USE_MCP:
-                    result = analyze_panel_with_mcp(temp_path)
-                else:
-                    result = analyze_panel(temp_path)
-                
-                # Clean up
-                os.unlink(temp_path)
-            except Exception as e:
-                logger.error(f"Error processing base64 image: {str(e)}")
-                if os.path.exists(temp_path):
-                    os.unlink(temp_path)
-                raise
+            # Get request data
+            data = request.json
+            if not data:
+                raise BadRequest("Missing request body")
+            
+            image_data = data.get('image_data')
+            is_path = data.get('is_path', False)
+            
+            if not image_data:
+                raise BadRequest("Missing image_data parameter")
+            
+            # Process the image
+            if is_path:
+                # Use the path directly
+                result = analyze_path(image_data)
+            else:
+                result = analyze_image_bytes(base64.b64decode(image_data))
         
         return jsonify(result)
     
+    except (BadRequest, ValueError) as e:
+        logger.error(f"Invalid request to /api/analyze: {str(e)}")
+        return jsonify({
+            "error": getattr(e, 'description', str(e)),
+            "figures": 1,
+            "motion": "static",
+            "objects": "none"
+        }), 400
     except Exception as e:
         logger.error(f"Error in /api/analyze: {str(e)}")
         return jsonify({
@@ -108,6 +402,149 @@ def analyze():
             "objects": "none"
         }), 500
 
+def analyze_batch_item(item):
+    """Analyze one batch item: ("bytes", data) or ("path", path)."""
+    kind, value = item
+    if kind == "path":
+        return analyze_path(value)
+    return analyze_image_bytes(value)
+
+def read_batch_items():
+    """
+    Read the images of an /api/analyze_batch request.
+    
+    Returns:
+        list: (id, item, error) tuples in request order; item is None when
+            the entry could not be read and error says why
+        
+    Raises:
+        BadRequest: If the request holds no images or too many
+    """
+    entries = []
+    if request.files:
+        for field, storage in request.files.items(multi=True):
+            entries.append((storage.filename or field, ("bytes", storage.read()), None))
+    else:
+        data = request.get_json(silent=True)
+        if isinstance(data, dict):
+            data = data.get('images')
+        if not isinstance(data, list):
+            raise BadRequest("Expected multipart images or a JSON array of images")
+        
+        for index, entry in enumerate(data):
+            if isinstance(entry, str):
+                entry = {"image_data": entry}
+            if not isinstance(entry, dict) or not entry.get('image_data'):
+                entries.append((str(index), None, "Missing image_data"))
+                continue
+            
+            entry_id = str(entry.get('id', index))
+            if entry.get('is_path', False):
+                entries.append((entry_id, ("path", entry['image_data']), None))
+                continue
+            try:
+                entries.append((entry_id, ("bytes", base64.b64decode(entry['image_data'], validate=True)), None))
+            except (ValueError, TypeError) as e:
+                entries.append((entry_id, None, f"Invalid base64 image data: {str(e)}"))
+    
+    if not entries:
+        raise BadRequest("No images in request")
+    if len(entries) > MAX_BATCH_SIZE:
+        raise BadRequest(f"Too many images in one batch ({len(entries)} > {MAX_BATCH_SIZE})")
+    return entries
+
+@app.route('/api/analyze_batch', methods=['POST'])
+def analyze_batch():
+    """
+    Analyze many comic panel images in one request.
+    
+    Request body, either multipart/form-data with one file part per image, or JSON:
+        [
+            {"id": string, "image_data": "base64 encoded image or path", "is_path": boolean},
+            ...
+        ]
+        (a {"images": [...]} object and bare base64 strings are also accepted)
+    
+    Returns:
+        NDJSON stream (application/x-ndjson), one record per image in
+        completion order, followed by a summary record:
+            {"type": "result", "index": integer, "id": string, "status": "ok",
+             "result": {...}, "elapsed_ms": float}
+            {"type": "result", "index": integer, "id": string, "status": "error",
+             "error": string}
+            {"type": "summary", "total": integer, "succeeded": integer,
+             "failed": integer, "elapsed_ms": float}
+    """
+    try:
+        entries = read_batch_items()
+    except BadRequest as e:
+        return jsonify({"error": e.description}), 400
+    
+    start = time.perf_counter()
+    
+    def timed(item):
+        item_start = time.perf_counter()
+        result = analyze_batch_item(item)
+        return result, (time.perf_counter() - item_start) * 1000
+    
+    # Workers run in copies of the request context so their spans join the
+    # trace, even once the generator runs after the view has returned
+    context = contextvars.copy_context()
+    rejected = []
+    pending = []
+    for index, (entry_id, item, error) in enumerate(entries):
+        if item is None:
+            rejected.append({"type": "result", "index": index, "id": entry_id, "status": "error", "error": error})
+        else:
+            pending.append((index, entry_id, item))
+    pending.reverse()
+    futures = {}
+    
+    def submit_more():
+        # Keep at most BATCH_MAX_IN_FLIGHT images of this batch on the shared pool
+        while pending and len(futures) < BATCH_MAX_IN_FLIGHT:
+            index, entry_id, item = pending.pop()
+            futures[analysis_executor.submit(context.copy().run, timed, item)] = (index, entry_id)
+    
+    # Start the first images before the response streams
+    submit_more()
+    
+    def stream():
+        succeeded = 0
+        try:
+            for record in rejected:
+                yield json.dumps(record) + "\n"
+            
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, entry_id = futures.pop(future)
+                    record = {"type": "result", "index": index, "id": entry_id}
+                    try:
+                        result, elapsed_ms = future.result()
+                        record.update(status="ok", result=result, elapsed_ms=round(elapsed_ms, 2))
+                        succeeded += 1
+                    except Exception as e:
+                        logger.error(f"Error analyzing batch item {entry_id}: {str(e)}")
+                        record.update(status="error", error=str(e))
+                    submit_more()
+                    yield json.dumps(record) + "\n"
+            
+            yield json.dumps({
+                "type": "summary",
+                "total": len(entries),
+                "succeeded": succeeded,
+                "failed": len(entries) - succeeded,
+                "elapsed_ms": round((time.perf_counter() - start) * 1000, 2)
+            }) + "\n"
+        finally:
+            # Client went away: don't analyze images nobody will read
+            pending.clear()
+            for future in futures:
+                future.cancel()
+    
+    return Response(stream(), mimetype='application/x-ndjson')
+
 @app.route('/api/describe', methods=['POST'])
 def describe():
     """
@@ -120,13 +557,33 @@ def describe():
                 "motion": "action" or "static",
                 "objects": "sparks" or "none"
             },
-            "panel_num": integer
+            "panel_num": integer,
+            "progressive": boolean
         }
     
+    Headers:
+        X-Request-Budget: optional seconds left in the caller's budget
+    
     Returns:
         {
             "description": string
         }
+        
+        With "progressive": true the rule-based description is returned at once
+        with status 202 and a job id; the LLM description is fetched later from
+        /api/describe/<job_id>:
+        {
+            "description": string,
+            "job_id": string,
+            "status": "pending"
+        }
+        
+        When DESCRIBE_JOB_MAX_PENDING upgrades are already queued, the
+        rule-based description is returned with status 200 and no job:
+        {
+            "description": string,
+            "upgrade": "skipped"
+        }
     """
     try:
         # Get request data
@@ -140,26 +597,27 @@ def describe():
         if not image_data:
             raise BadRequest("Missing image_data parameter")
         
+        # Resolve the mode first so only the stages it needs run
+        mode = resolve_describe_mode(data.get('commercial_grade', False), data.get('progressive', False))
+        
+        # Request-scoped budget: the caller's remaining time, capped by ours
+        deadline = Deadline.from_header(request.headers.get(DEADLINE_HEADER), DESCRIBE_BUDGET_SECONDS)
+        
         # Generate description
-        if USE_MCP:
-            description = generate_description_with_mcp(image_data, panel_num)
-            
-            # Verify the description to ensure it's factual
-            description = verify_description_with_mcp(description)
-        else:
-            description = generate_description(image_data, panel_num)
-            
-        # Check if commercial grade mode is requested
-        commercial_grade = data.get('commercial_grade', False)
-        if commercial_grade:
-            # For commercial grade, use a more minimal, factual description
-            if USE_MCP:
-                from mcp_client import generate_rule_based_description
-                description = generate_rule_based_description(image_data, panel_num)
-            else:
-                from app.textgen import MultiProviderTextGen
-                text_gen = MultiProviderTextGen()
-                description = text_gen._generate_rule_based(image_data, panel_num)
+        description = describe_with_mode(image_data, panel_num, mode, deadline)
+        
+        # Progressive mode: upgrade the rule-based description in the
+        # background. The background job is not bound by the caller's
+        # request budget, only by our own.
+        if mode == "progressive":
+            try:
+                job_id = describe_jobs.submit(upgrade_description, image_data, panel_num,
+                                              Deadline(DESCRIBE_BUDGET_SECONDS))
+            except JobQueueFull as e:
+                # The draft is already a usable answer; shed the upgrade, not the request
+                logger.warning(f"Skipping progressive upgrade: {str(e)}")
+                return jsonify({"description": description, "upgrade": "skipped"})
+            return jsonify({"description": description, "job_id": job_id, "status": "pending"}), 202
         
         return jsonify({"description": description})
     
@@ -170,6 +628,235 @@ def describe():
             "description": f"Panel {panel_num}: Error generating description."
         }), 500
 
+@app.route('/api/describe/<job_id>', methods=['GET'])
+def describe_job(job_id):
+    """
+    Get the upgraded description for a progressive describe request.
+    
+    Query parameters:
+        wait: optional seconds to wait for the job to finish (long-poll, max 30)
+    
+    Returns:
+        {
+            "job_id": string,
+            "status": "pending", "running", "done" or "error",
+            "description": string (when done)
+        }
+    """
+    try:
+        wait = min(max(float(request.args.get('wait', 0)), 0), MAX_POLL_WAIT_SECONDS)
+    except ValueError:
+        return jsonify({"error": "wait must be a number"}), 400
+    
+    job = describe_jobs.get(job_id, wait)
+    if job is None:
+        return jsonify({"error": "Unknown or expired job"}), 404
+    
+    return jsonify(describe_job_response(job))
+
+@app.route('/api/describe/<job_id>/events', methods=['GET'])
+def describe_job_events(job_id):
+    """
+    Push the upgraded description as a server-sent event.
+    
+    Sends a single "description" event with the same body as
+    /api/describe/<job_id> once the job finishes, with keep-alive
+    comments while it is still running.
+    """
+    if describe_jobs.get(job_id) is None:
+        return jsonify({"error": "Unknown or expired job"}), 404
+    
+    def stream():
+        while True:
+            job = describe_jobs.get(job_id, MAX_POLL_WAIT_SECONDS / 2)
+            if job is None:
+                return
+            if job["status"] in ("done", "error"):
+                yield f"event: description\ndata: {json.dumps(describe_job_response(job))}\n\n"
+                return
+            yield ": keep-alive\n\n"
+    
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/process', methods=['POST'])
+def process():
+    """
+    Analyze a comic panel and describe it in one request.
+    
+    Request body, one of:
+        - the encoded image itself (image/* Content-Type), options in the query string
+        - multipart/form-data with the image in a "file" part, options as form fields
+        - JSON:
+        {
+            "image_data": "base64 encoded image or path",
+            "is_path": boolean,
+            "panel_num": integer,
+            "commercial_grade": boolean,
+            "verify": boolean (default true)
+        }
+    
+    Headers:
+        X-Request-Budget: optional seconds left in the caller's budget
+    
+    Returns:
+        {
+            "analysis": {"figures": integer, "motion": string, "objects": string},
+            "description": string,
+            "verified": boolean,
+            "timings": {"analyze_ms": float, "describe_ms": float, "verify_ms": float, "total_ms": float}
+        }
+    """
+    try:
+        image_bytes = None
+        image_path = None
+        
+        if is_raw_image_request():
+            image_bytes = request.get_data(cache=False)
+            options = request.args
+        elif request.files:
+            upload = request.files.get('file')
+            if upload is None:
+                raise BadRequest("Missing file part")
+            image_bytes = upload.read()
+            options = request.form
+        else:
+            options = request.json
+            if not options:
+                raise BadRequest("Missing request body")
+            if not options.get('image_data'):
+                raise BadRequest("Missing image_data parameter")
+            
+            if options.get('is_path', False):
+                image_path = options['image_data']
+            else:
+                try:
+                    image_bytes = base64.b64decode(options['image_data'], validate=True)
+                except (ValueError, TypeError) as e:
+                    raise BadRequest(f"Invalid base64 image data: {str(e)}")
+        
+        panel_num = int(options.get('panel_num', 1))
+        commercial_grade = str(options.get('commercial_grade', False)).lower() == 'true'
+        verify = str(options.get('verify', True)).lower() == 'true'
+    except (BadRequest, ValueError) as e:
+        return jsonify({"error": getattr(e, 'description', str(e))}), 400
+    
+    # Request-scoped budget: the caller's remaining time, capped by ours
+    deadline = Deadline.from_header(request.headers.get(DEADLINE_HEADER), DESCRIBE_BUDGET_SECONDS)
+    
+    try:
+        result = process_panel(image_bytes, image_path, panel_num, commercial_grade, verify, deadline)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error in /api/process: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+    
+    return jsonify(result)
+
+@app.route('/api/jobs', methods=['POST'])
+def create_job():
+    """
+    Queue a long-running image, page or archive job.
+    
+    Request body, one of:
+        - the image or zip archive itself (image/*, application/zip or
+          application/octet-stream), options in the query string
+        - multipart/form-data with the upload in a "file" part, options as form fields
+        - JSON with the upload base64 encoded in "image_data" and the options below
+    
+    Options:
+        type: "image" (one panel), "page" (split into panels) or "archive" (zip of pages).
+            Defaults to "archive" for zip uploads and "image" otherwise.
+        commercial_grade: boolean
+        webhook_url: optional http(s) URL that receives the finished job as a POST;
+            must resolve to public addresses, or be in WEBHOOK_ALLOWED_HOSTS
+    
+    Returns:
+        202 with {"job_id": string, "status": "pending", "status_url": string},
+        400 for invalid uploads, or 503 with Retry-After when the queue is full
+    """
+    try:
+        if is_raw_image_request() or request.mimetype in ('application/zip', 'application/x-zip-compressed'):
+            data = request.get_data(cache=False)
+            options = request.args
+        elif request.files:
+            upload = request.files.get('file')
+            if upload is None:
+                raise BadRequest("Missing file part")
+            data = upload.read()
+            options = request.form
+        else:
+            options = request.json
+            if not options or not options.get('image_data'):
+                raise BadRequest("Missing image_data parameter")
+            try:
+                data = base64.b64decode(options['image_data'], validate=True)
+            except (ValueError, TypeError) as e:
+                raise BadRequest(f"Invalid base64 data: {str(e)}")
+        
+        if not data:
+            raise BadRequest("Empty upload")
+        
+        job_type = options.get('type') or ("archive" if data.startswith(b"PK\x03\x04") else "image")
+        if job_type not in JOB_TYPES:
+            raise BadRequest(f"type must be one of {', '.join(JOB_TYPES)}")
+        
+        webhook_url = options.get('webhook_url')
+        if webhook_url:
+            check_webhook_url(webhook_url)
+        
+        commercial_grade = str(options.get('commercial_grade', False)).lower() == 'true'
+        
+        # Validate archives up front so bad uploads fail fast
+        pages = read_archive_pages(data, MAX_ARCHIVE_PAGES, MAX_ARCHIVE_PAGE_BYTES) if job_type == "archive" else None
+    except (BadRequest, ValueError) as e:
+        return jsonify({"error": getattr(e, 'description', str(e))}), 400
+    
+    try:
+        job_id = panel_jobs.submit(run_panel_job, job_type, data, pages, commercial_grade,
+                                   metadata={"type": job_type, "webhook_url": webhook_url})
+    except JobQueueFull as e:
+        response = jsonify({"error": str(e)})
+        response.headers['Retry-After'] = '30'
+        return response, 503
+    
+    return jsonify({
+        "job_id": job_id,
+        "status": "pending",
+        "status_url": f"/api/jobs/{job_id}"
+    }), 202
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    Get the status, progress and (when done) result of a job.
+    
+    Query parameters:
+        wait: optional seconds to wait for the job to finish (long-poll, max 30)
+    
+    Returns:
+        {
+            "job_id": string,
+            "type": "image", "page" or "archive",
+            "status": "pending", "running", "done" or "error",
+            "progress": {"pages_done": integer, "pages_total": integer, "panels_done": integer},
+            "created_at": float,
+            "finished_at": float,
+            "result": {"pages": integer, "panels": [...], "errors": [...]} (when done)
+        }
+    """
+    try:
+        wait = min(max(float(request.args.get('wait', 0)), 0), MAX_POLL_WAIT_SECONDS)
+    except ValueError:
+        return jsonify({"error": "wait must be a number"}), 400
+    
+    job = panel_jobs.get(job_id, wait)
+    if job is None:
+        return jsonify({"error": "Unknown or expired job"}), 404
+    
+    return jsonify(job_response(job))
+
 @app.route('/api/feedback', methods=['POST'])
 def feedback():
     """
@@ -210,7 +897,7 @@ def feedback():
         # Process the feedback with MCP if available
         if USE_MCP:
             try:
-                from mcp_client import process_feedback_with_mcp
+                from app.mcp_client import process_feedback_with_mcp
                 
                 result = process_feedback_with_mcp(
                     data.get('rating'),
@@ -227,13 +914,8 @@ def feedback():
                 logger.error(f"Error processing feedback with MCP: {str(e)}")
                 # Fall back to local storage
         
-        # Store the feedback in a file
-        feedback_dir = os.path.join(os.path.dirname(__file__), 'feedback')
-        os.makedirs(feedback_dir, exist_ok=True)
-        
-        feedback_file = os.path.join(feedback_dir, f"feedback_{int(time.time())}.json")
-        with open(feedback_file, 'w') as f:
-            json.dump(data, f, indent=2)
+        # Queue the feedback for the store; it is written in the background
+        get_feedback_store().submit(data, source="api")
         
         # Return success
         return jsonify({
@@ -248,11 +930,143 @@ def feedback():
             "message": str(e)
         }), 500
 
+def query_number(name, convert, default=None):
+    """
+    Read a numeric query parameter.
+    
+    Args:
+        name (str): Parameter name
+        convert (type): int or float
+        default (optional): Value when the parameter is absent
+        
+    Returns:
+        The converted value, or default
+        
+    Raises:
+        BadRequest: If the parameter is present but not a number
+    """
+    value = request.args.get(name)
+    if value is None:
+        return default
+    try:
+        return convert(value)
+    except ValueError:
+        raise BadRequest(f"{name} must be a number")
+
+@app.route('/api/feedback', methods=['GET'])
+def list_feedback():
+    """
+    List feedback submissions, newest first.
+    
+    Query parameters:
+        rating: Only this rating
+        issue_type: Only this issue type
+        since, until: Only submissions in this range of Unix times
+        before_id: Only submissions older than this id, for the next page
+        limit: Largest number of submissions returned (default 100, at most 1000)
+    
+    Returns:
+        {
+            "feedback": [{"id": integer, "created_at": float, "rating": integer, "issue_type": string,
+                          "original_description": string, "edited_description": string,
+                          "comments": string, "source": string}],
+            "next_before_id": integer or null
+        }
+        or 400 if a filter is not a valid number
+    """
+    try:
+        since = query_number('since', float)
+        until = query_number('until', float)
+        before_id = query_number('before_id', int)
+        limit = min(max(query_number('limit', int, 100), 1), 1000)
+        rating = request.args.get('rating')
+        if rating is not None:
+            rating = parse_rating(rating)
+            if rating is None:
+                raise BadRequest("rating must be a whole number")
+    except BadRequest as e:
+        return jsonify({"error": e.description}), 400
+    
+    try:
+        records = get_feedback_store().query(
+            rating=rating,
+            issue_type=request.args.get('issue_type'),
+            since=since,
+            until=until,
+            before_id=before_id,
+            limit=limit
+        )
+        
+        return jsonify({
+            "feedback": records,
+            "next_before_id": records[-1]["id"] if len(records) == limit else None
+        })
+    
+    except Exception as e:
+        logger.error(f"Error in GET /api/feedback: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/feedback/stats', methods=['GET'])
+def feedback_stats():
+    """
+    Get aggregate statistics over all feedback.
+    
+    Aggregates are loaded from the store in the background when the server
+    starts and then updated every FEEDBACK_ANALYTICS_INTERVAL seconds with
+    the submissions stored since; each call only copies the current
+    aggregates. Until the startup load finishes, the totals are partial, and
+    new feedback shows up after the next update.
+    
+    Returns:
+        {
+            "total": integer,
+            "ratings": {"1": integer, ..., "5": integer},
+            "average_rating": float,
+            "issue_types": {string: integer},
+            "removed_phrases": [{"phrase": string, "count": integer}],
+            "inserted_phrases": [{"phrase": string, "count": integer}]
+        }
+    """
+    try:
+        return jsonify(get_feedback_analytics().snapshot())
+    
+    except Exception as e:
+        logger.error(f"Error in /api/feedback/stats: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """
+    Get the process metrics in the Prometheus text format.
+    
+    Covers request latency and concurrency per endpoint, each vision stage,
+    provider attempts, fallback depth, prompt-cache hits, job and local model
+    queue depths, and describe latency per mode.
+    
+    Query parameters:
+        format: "json" for the same metrics as JSON
+    
+    Returns:
+        Prometheus text exposition, or with format=json:
+        {
+            "<metric name>": {
+                "type": "counter" | "gauge" | "histogram",
+                "help": string,
+                "samples": [{"labels": {...}, "value": number}
+                            or {"labels": {...}, "buckets": {...}, "count": integer, "sum": float}]
+            }
+        }
+    """
+    if request.args.get('format') == 'json':
+        return jsonify(metrics_registry.snapshot())
+    return Response(metrics_registry.to_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 @app.route('/api/health', methods=['GET'])
 def health():
     """Health check endpoint."""
     return jsonify({"status": "ok"})
 
 if __name__ == '__main__':
+    # Development server; production runs gunicorn -c gunicorn_api.conf.py app.api_server:app
     port = int(os.environ.get('API_PORT', 8001))
     app.run(host='0.0.0.0', port=port)
@@ -1,12 +1,19 @@
 import os
-import uuid
-import base64
 import json
+import math
+import hashlib
+import mimetypes
+import tempfile
+import threading
 import requests
 import logging
-from flask import Flask, request, render_template, redirect, url_for, flash
+from flask import Flask, Request, g, request, render_template, redirect, url_for, flash, jsonify
 from werkzeug.utils import secure_filename
 from dotenv import load_dotenv
+from app.batches import BatchStore
+from app.jobs import JobStore, JobQueueFull
+from mcp_server.utils.provider_utils import Deadline, DEADLINE_HEADER, parse_retry_after
+from mcp_server.utils.tracing import begin_trace, end_trace, inject_headers, server_timing, span
 
 # Load environment variables from .env file
 load_dotenv()
@@ -16,31 +23,201 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(level
 logger = logging.getLogger(__name__)
 
 # Configuration
-UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
 MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max upload size
+# Uploads up to this size are kept in memory; larger ones spool to a temporary file
+UPLOAD_SPOOL_THRESHOLD = int(os.environ.get('UPLOAD_SPOOL_THRESHOLD', 4 * 1024 * 1024))
 
 # API configuration
 API_BASE_URL = os.environ.get('API_BASE_URL', 'http://localhost:8000/api')
 API_TIMEOUT = 30  # seconds
+# Use the one-round-trip /api/process endpoint instead of /api/analyze + /api/describe
+USE_PROCESS_ENDPOINT = os.environ.get('USE_PROCESS_ENDPOINT', 'true').lower() == 'true'
+# How uploads reach the pipeline: "http" calls the API server at API_BASE_URL,
+# "inprocess" runs it in this process when both are deployed together
+PIPELINE_MODE = os.environ.get('PIPELINE_MODE', 'http').lower()
 
-# Ensure upload directory exists
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+# Total time budget for one upload; stays under the gunicorn worker timeout (60s)
+REQUEST_BUDGET = float(os.environ.get('REQUEST_BUDGET_SECONDS', 55))
+# Time reserved for the API response to travel back once its budget is spent
+API_RESPONSE_MARGIN = 0.5  # seconds
+
+# Multi-file and page uploads: panels processed at once, most files per upload,
+# and how long finished batches stay available to the result page
+BATCH_WORKERS = int(os.environ.get('BATCH_WORKERS', 8))
+MAX_BATCH_FILES = int(os.environ.get('MAX_BATCH_FILES', 50))
+BATCH_TTL = float(os.environ.get('BATCH_TTL', 3600))
+# Result page polling interval
+BATCH_POLL_INTERVAL_MS = 500
+
+# Speculative processing of a file as soon as it is selected: workers, most
+# unfinished at once, and how long a finished result waits for its submit
+PREANALYZE_WORKERS = int(os.environ.get('PREANALYZE_WORKERS', 4))
+PREANALYZE_MAX_PENDING = int(os.environ.get('PREANALYZE_MAX_PENDING', 32))
+PREANALYZE_TTL = float(os.environ.get('PREANALYZE_TTL', 300))
+# Longest a submit waits for an unfinished preanalysis before processing the
+# file itself, so the fallback still has most of the request budget
+PREANALYZE_MAX_WAIT = float(os.environ.get('PREANALYZE_MAX_WAIT', REQUEST_BUDGET / 4))
+
+# Retry hint shown when the API sheds a request without sending Retry-After
+API_BUSY_RETRY_SECONDS = 5
+
+class APIBusy(Exception):
+    """Raised when the API turns a request away under load (429 or 503)."""
+    
+    def __init__(self, retry_after):
+        super().__init__(f"The service is busy. Please try again in {retry_after} seconds.")
+        self.retry_after = retry_after
+
+class UploadRequest(Request):
+    """Request that keeps uploaded files in memory up to UPLOAD_SPOOL_THRESHOLD."""
+    
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        # Werkzeug's default spools to disk above 500KB, which most page scans exceed
+        return tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_THRESHOLD, mode='rb+')
 
 app = Flask(__name__)
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+app.request_class = UploadRequest
 app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
 app.secret_key = os.environ.get('FLASK_SECRET_KEY', 'dev_key_for_testing')
 
+# Panels of multi-file and page uploads, described concurrently
+batch_store = BatchStore("web-batch", max_workers=BATCH_WORKERS, ttl=BATCH_TTL)
+
+# Results of speculative processing, found again by content hash and mode
+preanalysis_jobs = JobStore("preanalyze", max_workers=PREANALYZE_WORKERS, ttl=PREANALYZE_TTL,
+                            max_pending=PREANALYZE_MAX_PENDING)
+preanalysis_index = {}
+preanalysis_lock = threading.Lock()
+
+@app.before_request
+def start_request_trace():
+    """Start a new trace for every request to the web app."""
+    g.trace_root, g.trace_token = begin_trace(f"web {request.method} {request.path}")
+
+@app.after_request
+def add_server_timing(response):
+    """Summarize the stages of the request in a Server-Timing header."""
+    root = g.get("trace_root")
+    if root is not None:
+        response.headers["Server-Timing"] = server_timing(root)
+    return response
+
+@app.teardown_request
+def finish_request_trace(exc):
+    """Finish and export the request's root span."""
+    root = g.pop("trace_root", None)
+    if root is not None:
+        end_trace(root, g.pop("trace_token"))
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def analyze_panel_api(image_path):
+def api_timeout(deadline=None):
+    """
+    Get the timeout for an API call, clamped to the request budget.
+    
+    Args:
+        deadline (Deadline, optional): Request budget
+        
+    Returns:
+        float: Timeout in seconds
+    """
+    if deadline is None:
+        return API_TIMEOUT
+    return deadline.timeout_for(API_TIMEOUT)
+
+def process_panel_api(image_bytes, filename, panel_num=1, commercial_grade=False, deadline=None):
+    """
+    Call the API to analyze and describe a comic panel in one request.
+    
+    Args:
+        image_bytes (bytes): Encoded image data
+        filename (str): Name of the uploaded file
+        panel_num (int): Panel number
+        commercial_grade (bool): Whether to use commercial grade mode
+        deadline (Deadline, optional): Request budget, forwarded to the API
+        
+    Returns:
+        tuple: (analysis dict, description), or None if the API cannot be reached
+            or has no /process endpoint, so the caller can use the separate calls
+        
+    Raises:
+        APIBusy: If the API sheds the request; retrying elsewhere would only add load
+        Exception: For any other failure
+    """
+    logger.info(f"Using API at {API_BASE_URL} for panel processing")
+    
+    # Forward our remaining budget so the provider chain fits inside it
+    headers = {}
+    if deadline is not None:
+        headers[DEADLINE_HEADER] = f"{deadline.remaining() - API_RESPONSE_MARGIN:.3f}"
+    
+    try:
+        # Call the API
+        with span("api.process"):
+            response = requests.post(
+                f"{API_BASE_URL}/process",
+                files={"file": (filename, image_bytes)},
+                data={"panel_num": panel_num, "commercial_grade": str(commercial_grade).lower()},
+                headers=inject_headers(headers),
+                timeout=api_timeout(deadline)
+            )
+    except requests.ConnectionError as e:
+        logger.error(f"Error in process_panel_api: {str(e)}")
+        return None
+    
+    if response.status_code == 200:
+        result = response.json()
+        logger.info(f"API processing successful: {result['timings']}")
+        return result["analysis"], result["description"]
+    
+    logger.error(f"API error: {response.status_code} - {response.text}")
+    if response.status_code in (429, 503):
+        retry_after = parse_retry_after(response.headers)
+        raise APIBusy(math.ceil(retry_after) if retry_after is not None else API_BUSY_RETRY_SECONDS)
+    if response.status_code == 404:
+        # An older API without /process
+        return None
+    raise RuntimeError(f"API error: {response.status_code}")
+
+def process_panel_inprocess(image_bytes, panel_num=1, commercial_grade=False, deadline=None):
+    """
+    Analyze and describe a comic panel with the pipeline in this process.
+    
+    Skips the HTTP round trip, the multipart encoding and the JSON response
+    that process_panel_api pays for.
+    
+    Args:
+        image_bytes (bytes): Encoded image data
+        panel_num (int): Panel number
+        commercial_grade (bool): Whether to use commercial grade mode
+        deadline (Deadline, optional): Request budget
+        
+    Returns:
+        tuple: (analysis dict, description) or None if processing failed
+    """
+    try:
+        # Imported on first use so the http mode does not load the pipeline
+        from app.pipeline import process_panel
+        
+        result = process_panel(image_bytes=image_bytes, panel_num=panel_num,
+                               commercial_grade=commercial_grade, deadline=deadline)
+        logger.info(f"In-process processing successful: {result['timings']}")
+        return result["analysis"], result["description"]
+    
+    except Exception as e:
+        logger.error(f"Error in process_panel_inprocess: {str(e)}")
+        return None
+
+def analyze_panel_api(image_bytes, filename, deadline=None):
     """
     Call the API to analyze a comic panel.
     
     Args:
-        image_path (str): Path to the image file
+        image_bytes (bytes): Encoded image data
+        filename (str): Name of the uploaded file, used for the content type
+        deadline (Deadline, optional): Request budget
         
     Returns:
         dict: Analysis results
@@ -50,16 +227,15 @@ def analyze_panel_api(image_path):
         if API_BASE_URL:
             logger.info(f"Using API at {API_BASE_URL} for panel analysis")
             
-            # Convert image to base64
-            with open(image_path, 'rb') as image_file:
-                encoded_image = base64.b64encode(image_file.read()).decode('utf-8')
-            
-            # Call the API
-            response = requests.post(
-                f"{API_BASE_URL}/analyze",
-                json={"image_data": encoded_image, "is_path": False, "panel_num": 1},
-                timeout=API_TIMEOUT
-            )
+            # Send the image as the raw request body rather than base64 in JSON
+            content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+            with span("api.analyze"):
+                response = requests.post(
+                    f"{API_BASE_URL}/analyze",
+                    data=image_bytes,
+                    headers=inject_headers({"Content-Type": content_type}),
+                    timeout=api_timeout(deadline)
+                )
             
             if response.status_code == 200:
                 result = response.json()
@@ -74,10 +250,16 @@ def analyze_panel_api(image_path):
             logger.info("Using MCP server directly for panel analysis")
             
             # Import the MCP client only when needed
-            from mcp_client import analyze_panel_with_mcp
+            from app.mcp_client import analyze_panel_with_mcp
             
-            # Call the MCP client
-            result = analyze_panel_with_mcp(image_path)
+            # The MCP server reads images from disk
+            with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(filename)[1]) as temp:
+                temp_path = temp.name
+                temp.write(image_bytes)
+            try:
+                result = analyze_panel_with_mcp(temp_path)
+            finally:
+                os.unlink(temp_path)
             logger.info(f"MCP analysis successful: {result}")
             return result
             
@@ -86,7 +268,7 @@ def analyze_panel_api(image_path):
         # Return default values in case of error
         return {"figures": 1, "motion": "static", "objects": "none"}
 
-def generate_description_api(image_data, panel_num=1, commercial_grade=False):
+def generate_description_api(image_data, panel_num=1, commercial_grade=False, deadline=None):
     """
     Call the API to generate a description for a comic panel.
     
@@ -94,21 +276,38 @@ def generate_description_api(image_data, panel_num=1, commercial_grade=False):
         image_data (dict): Analysis data
         panel_num (int): Panel number
         commercial_grade (bool): Whether to use commercial grade mode
+        deadline (Deadline, optional): Request budget, forwarded to the API
         
     Returns:
         str: Generated description
     """
+    # Commercial grade is built from the rules alone; no remote call needed
+    if commercial_grade:
+        return generate_commercial_grade_description(image_data, panel_num)
+    
+    # No time left for a remote call - answer from the rules right away
+    if deadline is not None and not deadline.can_fit(API_RESPONSE_MARGIN):
+        logger.warning("Request budget exhausted before description generation")
+        return generate_rule_based_description(image_data, panel_num)
+    
     try:
         # Check if we should use local processing or API
         if API_BASE_URL:
             logger.info(f"Using API at {API_BASE_URL} for description generation")
             
+            # Forward our remaining budget so the provider chain fits inside it
+            headers = {}
+            if deadline is not None:
+                headers[DEADLINE_HEADER] = f"{deadline.remaining() - API_RESPONSE_MARGIN:.3f}"
+            
             # Call the API
-            response = requests.post(
-                f"{API_BASE_URL}/describe",
-                json={"image_data": image_data, "panel_num": panel_num, "commercial_grade": commercial_grade},
-                timeout=API_TIMEOUT
-            )
+            with span("api.describe"):
+                response = requests.post(
+                    f"{API_BASE_URL}/describe",
+                    json={"image_data": image_data, "panel_num": panel_num, "commercial_grade": commercial_grade},
+                    headers=inject_headers(headers),
+                    timeout=api_timeout(deadline)
+                )
             
             if response.status_code == 200:
                 result = response.json()
@@ -124,10 +323,10 @@ def generate_description_api(image_data, panel_num=1, commercial_grade=False):
             logger.info("Using MCP server directly for description generation")
             
             # Import the MCP client only when needed
-            from mcp_client import generate_description_with_mcp
+            from app.mcp_client import generate_description_with_mcp
             
             # Call the MCP client
-            description = generate_description_with_mcp(image_data, panel_num)
+            description = generate_description_with_mcp(image_data, panel_num, deadline)
             logger.info(f"MCP description generation successful: {description}")
             return description
             
@@ -231,58 +430,351 @@ def generate_commercial_grade_description(image_data, panel_num=1):
     
     return description
 
+def describe_upload(image_bytes, filename, panel_num=1, commercial_grade=False, deadline=None):
+    """
+    Analyze and describe one panel in-process or through the API.
+    
+    Args:
+        image_bytes (bytes): Encoded image data
+        filename (str): Name of the uploaded file
+        panel_num (int): Panel number
+        commercial_grade (bool): Whether to use commercial grade mode
+        deadline (Deadline, optional): Request budget
+        
+    Returns:
+        tuple: (analysis dict, description)
+        
+    Raises:
+        APIBusy: If the API is shedding load
+    """
+    # One round trip for analysis and description
+    processed = None
+    if PIPELINE_MODE == 'inprocess':
+        processed = process_panel_inprocess(image_bytes, panel_num, commercial_grade, deadline)
+    elif API_BASE_URL and USE_PROCESS_ENDPOINT:
+        processed = process_panel_api(image_bytes, filename, panel_num, commercial_grade, deadline)
+    
+    if processed is not None:
+        return processed
+    
+    # Process the image using the API
+    image_data = analyze_panel_api(image_bytes, filename, deadline)
+    
+    # Generate description using the API with commercial grade parameter
+    description = generate_description_api(image_data, panel_num, commercial_grade, deadline)
+    return image_data, description
+
+def preanalysis_key(image_bytes, commercial_grade):
+    """Key speculative results by content hash and description mode."""
+    mode = "commercial" if commercial_grade else "standard"
+    return f"{hashlib.sha256(image_bytes).hexdigest()}:{mode}"
+
+def run_preanalysis(image_bytes, filename, commercial_grade):
+    """Describe a selected file ahead of its submit, with the budget of a single upload."""
+    return describe_upload(image_bytes, filename, 1, commercial_grade, Deadline(REQUEST_BUDGET))
+
+def start_preanalysis(image_bytes, filename, commercial_grade):
+    """
+    Start describing a selected file unless the same file and mode already are.
+    
+    Args:
+        image_bytes (bytes): Encoded image data
+        filename (str): Name of the selected file
+        commercial_grade (bool): Whether to use commercial grade mode
+        
+    Returns:
+        tuple: (key, job id)
+        
+    Raises:
+        JobQueueFull: If PREANALYZE_MAX_PENDING files are already being processed
+    """
+    key = preanalysis_key(image_bytes, commercial_grade)
+    with preanalysis_lock:
+        job_id = preanalysis_index.get(key)
+        if job_id is not None and preanalysis_jobs.get(job_id) is not None:
+            return key, job_id
+        
+        job_id = preanalysis_jobs.submit(run_preanalysis, image_bytes, filename, commercial_grade)
+        # Forget keys whose results have expired
+        for stale in [k for k, j in preanalysis_index.items() if preanalysis_jobs.get(j) is None]:
+            del preanalysis_index[stale]
+        preanalysis_index[key] = job_id
+    
+    return key, job_id
+
+def take_preanalysis(image_bytes, commercial_grade, deadline):
+    """
+    Get the speculative result for a submitted file, waiting for it if still running.
+    
+    Args:
+        image_bytes (bytes): Encoded image data
+        commercial_grade (bool): Whether to use commercial grade mode
+        deadline (Deadline): Request budget; the wait takes at most PREANALYZE_MAX_WAIT of it
+        
+    Returns:
+        tuple: (analysis dict, description) or None if the file was not preanalyzed
+    """
+    key = preanalysis_key(image_bytes, commercial_grade)
+    with preanalysis_lock:
+        job_id = preanalysis_index.get(key)
+    if job_id is None:
+        return None
+    
+    wait = min(PREANALYZE_MAX_WAIT, deadline.remaining() - API_RESPONSE_MARGIN)
+    job = preanalysis_jobs.get(job_id, max(0.0, wait))
+    if job is None or job["status"] != "done":
+        logger.info(f"Preanalysis {key[:12]} not usable, processing on submit")
+        return None
+    
+    logger.info(f"Using preanalysis {key[:12]}, finished {job['finished_at'] - job['created_at']:.2f}s after selection")
+    analysis, description = job["result"]
+    return analysis, description
+
+def split_upload(image_bytes):
+    """
+    Split an uploaded page into panels.
+    
+    Args:
+        image_bytes (bytes): Encoded page image
+        
+    Returns:
+        list: PNG-encoded panel images in reading order
+        
+    Raises:
+        ValueError: If the image cannot be decoded
+    """
+    # Imported on first use; single-panel uploads never need OpenCV here
+    import cv2
+    from app.vision import decode_image, split_page_into_panels
+    
+    with span("split"):
+        img = decode_image(image_bytes)
+        if img is None:
+            raise ValueError("Could not decode image")
+        
+        panels = []
+        for panel in split_page_into_panels(img):
+            ok, encoded = cv2.imencode('.png', panel)
+            if not ok:
+                raise ValueError("Could not encode panel")
+            panels.append(encoded.tobytes())
+        return panels
+
+def describe_batch_panel(image_bytes, filename, position, panel_num, commercial_grade):
+    """
+    Describe one panel of a batch on the batch pool.
+    
+    Args:
+        image_bytes (bytes): Encoded panel image
+        filename (str): Uploaded file the panel came from
+        position (list): [file index, panel index within the file], for ordering on the result page
+        panel_num (int): Panel number used in the description
+        commercial_grade (bool): Whether to use commercial grade mode
+        
+    Returns:
+        dict: position, source, panel_num, analysis and description
+    """
+    # Each panel gets the budget of a single upload
+    image_data, description = describe_upload(image_bytes, filename, panel_num, commercial_grade,
+                                              Deadline(REQUEST_BUDGET))
+    return {
+        "position": position,
+        "source": filename,
+        "panel_num": panel_num,
+        "analysis": image_data,
+        "description": description
+    }
+
+def split_batch_page(batch_id, image_bytes, filename, file_index, commercial_grade):
+    """
+    Split one page of a batch and queue its panels on the batch pool.
+    
+    Args:
+        batch_id (str): Batch id
+        image_bytes (bytes): Encoded page image
+        filename (str): Uploaded file name
+        file_index (int): Position of the file in the upload
+        commercial_grade (bool): Whether to use commercial grade mode
+    """
+    for panel_index, panel_bytes in enumerate(split_upload(image_bytes), 1):
+        batch_store.submit(batch_id, describe_batch_panel, panel_bytes, filename, [file_index, panel_index],
+                           panel_index, commercial_grade,
+                           context={"source": filename, "panel_num": panel_index})
+
+def start_batch(uploads, commercial_grade, split_pages):
+    """
+    Queue a multi-file or page upload for concurrent processing.
+    
+    Args:
+        uploads (list): (filename, image bytes) pairs in upload order
+        commercial_grade (bool): Whether to use commercial grade mode
+        split_pages (bool): Treat each file as a page and describe its panels
+        
+    Returns:
+        str: Batch id
+    """
+    batch_id = batch_store.create({
+        "sources": [filename for filename, _ in uploads],
+        "commercial_grade": commercial_grade,
+        "split_pages": split_pages
+    })
+    
+    for file_index, (filename, image_bytes) in enumerate(uploads):
+        if split_pages:
+            batch_store.submit(batch_id, split_batch_page, batch_id, image_bytes, filename, file_index,
+                               commercial_grade, context={"source": filename})
+        else:
+            # Each file is one panel of the session, numbered in upload order
+            batch_store.submit(batch_id, describe_batch_panel, image_bytes, filename, [file_index, 1],
+                               file_index + 1, commercial_grade, context={"source": filename})
+    
+    logger.info(f"Started batch {batch_id} with {len(uploads)} file(s)")
+    return batch_id
+
 @app.route('/', methods=['GET', 'POST'])
 def index():
     if request.method == 'POST':
+        # Budget for the whole upload, shared by every downstream call
+        deadline = Deadline(REQUEST_BUDGET)
+        
         # Check if the post request has the file part
         if 'file' not in request.files:
             flash('No file part')
             return redirect(request.url)
         
-        file = request.files['file']
+        files = [file for file in request.files.getlist('file') if file.filename != '']
         
         # If user does not select file, browser also
         # submit an empty part without filename
-        if file.filename == '':
+        if not files:
             flash('No selected file')
             return redirect(request.url)
         
+        if len(files) > MAX_BATCH_FILES:
+            flash(f'Too many files. Upload at most {MAX_BATCH_FILES} at a time.')
+            return redirect(request.url)
+        
+        if not all(allowed_file(file.filename) for file in files):
+            flash('Only JPG and PNG images are supported')
+            return redirect(request.url)
+        
         # Check if commercial grade mode is selected
         commercial_grade = 'commercial_grade' in request.form
+        split_pages = 'split_pages' in request.form
+        
+        # Read each upload once from its in-memory (or spooled) stream; nothing is saved
+        with span("upload.read"):
+            uploads = [(secure_filename(file.filename), file.read()) for file in files]
         
-        if file and allowed_file(file.filename):
-            # Generate a unique filename to prevent collisions
-            filename = str(uuid.uuid4()) + secure_filename(file.filename)
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
+        if len(uploads) > 1 or split_pages:
+            # Describe the panels concurrently and show them as they finish
+            batch_id = start_batch(uploads, commercial_grade, split_pages)
+            return redirect(url_for('batch', batch_id=batch_id))
+        
+        filename, image_bytes = uploads[0]
+        try:
+            panel_num = 1  # A single upload is a single panel
             
-            try:
-                # Process the image using the API
-                image_data = analyze_panel_api(filepath)
-                
-                # Generate description based on mode
-                panel_num = 1  # For MVP, we assume a single panel
-                
-                # Generate description using the API with commercial grade parameter
-                description = generate_description_api(image_data, panel_num, commercial_grade)
-                
-                # Clean up the file after processing
-                os.remove(filepath)
-                
-                return render_template('result.html', 
-                                      description=description, 
-                                      image_data=image_data, 
-                                      commercial_grade=commercial_grade)
+            # Usually already done: the page starts processing when the file is selected
+            processed = take_preanalysis(image_bytes, commercial_grade, deadline)
+            if processed is None:
+                processed = describe_upload(image_bytes, filename, panel_num, commercial_grade, deadline)
+            image_data, description = processed
             
-            except Exception as e:
-                # Clean up the file in case of error
-                if os.path.exists(filepath):
-                    os.remove(filepath)
-                flash(f'Error processing image: {str(e)}')
-                return redirect(request.url)
+            return render_template('result.html', 
+                                  description=description, 
+                                  image_data=image_data, 
+                                  commercial_grade=commercial_grade)
+        
+        except APIBusy as e:
+            flash(str(e))
+            return redirect(request.url)
+        
+        except Exception as e:
+            flash(f'Error processing image: {str(e)}')
+            return redirect(request.url)
     
     return render_template('index.html')
 
+@app.route('/preanalyze', methods=['POST'])
+def preanalyze():
+    """
+    Start processing a file as soon as it is selected in the upload form.
+    
+    Request body: multipart/form-data with the image in a "file" part and
+    commercial_grade set when that mode is selected. Submitting the same file
+    and mode afterwards picks up the result instead of starting over.
+    
+    Returns:
+        202 with {"key": string, "status": "pending", "running" or "done"},
+        400 for invalid uploads, or 503 when too many files are being processed
+    """
+    file = request.files.get('file')
+    if file is None or file.filename == '' or not allowed_file(file.filename):
+        return jsonify({"error": "Upload a JPG or PNG image in the file part"}), 400
+    
+    commercial_grade = 'commercial_grade' in request.form
+    with span("upload.read"):
+        image_bytes = file.read()
+    
+    try:
+        key, job_id = start_preanalysis(image_bytes, secure_filename(file.filename), commercial_grade)
+    except JobQueueFull as e:
+        return jsonify({"error": str(e)}), 503
+    
+    job = preanalysis_jobs.get(job_id)
+    return jsonify({"key": key, "status": job["status"] if job else "pending"}), 202
+
+@app.route('/batch/<batch_id>')
+def batch(batch_id):
+    """Result page for a multi-file or page upload; panels are filled in as they finish."""
+    snapshot = batch_store.get(batch_id)
+    if snapshot is None:
+        flash('That batch has expired. Please upload the files again.')
+        return redirect(url_for('index'))
+    
+    return render_template('batch.html',
+                          batch_id=batch_id,
+                          sources=snapshot["sources"],
+                          commercial_grade=snapshot["commercial_grade"],
+                          split_pages=snapshot["split_pages"],
+                          poll_interval=BATCH_POLL_INTERVAL_MS)
+
+@app.route('/batch/<batch_id>/results')
+def batch_results(batch_id):
+    """
+    Get the panels of a batch finished since the caller last asked.
+    
+    Query parameters:
+        after: number of results the caller already has
+        
+    Returns:
+        {
+            "status": "running" or "done",
+            "completed": integer,
+            "pending": integer,
+            "results": [{"position": [file, panel], "source": string, "panel_num": integer,
+                         "analysis": {...}, "description": string}, ...],
+            "errors": [{"source": string, "error": string}, ...]
+        }
+    """
+    try:
+        after = max(int(request.args.get('after', 0)), 0)
+    except ValueError:
+        return jsonify({"error": "after must be an integer"}), 400
+    
+    snapshot = batch_store.get(batch_id, after)
+    if snapshot is None:
+        return jsonify({"error": "Unknown or expired batch"}), 404
+    
+    return jsonify({
+        "status": snapshot["status"],
+        "completed": snapshot["completed"],
+        "pending": snapshot["pending"],
+        "results": snapshot["results"],
+        "errors": snapshot["errors"]
+    })
+
 @app.errorhandler(413)
 def too_large(e):
     return render_template('index.html', error="File too large! Maximum size is 16MB."), 413
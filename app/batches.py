@@ -0,0 +1,153 @@
+"""
+Multi-panel upload batches for the Comic Panel Description Generator web app.
+The panels of a batch are processed concurrently on a shared worker pool and
+each result is recorded as soon as it is ready, so the result page can show
+the first panels while the slowest ones are still being described.
+"""
+
+import contextvars
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from mcp_server.utils.metrics import metrics_registry
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+batch_task_seconds = metrics_registry.histogram(
+    "batch_task_seconds", "Time spent on one task of a web upload batch", ("status",))
+
+class BatchStore:
+    """
+    Runs the tasks of each batch on a worker pool and keeps their results for a TTL.
+
+    Batches are plain dicts. Results are appended in completion order; readers
+    pass the number of results they already have to get only the new ones.
+    A task may submit more tasks to its own batch, e.g. one per panel of a
+    page it has split; the batch is done once no task is left.
+    """
+    def __init__(self, name, max_workers=8, ttl=3600):
+        """
+        Initialize the batch store.
+
+        Args:
+            name (str): Name used for worker threads and logging
+            max_workers (int, optional): Size of the worker pool. Defaults to 8.
+            ttl (float, optional): Seconds to keep finished batches. Defaults to 3600.
+        """
+        self.name = name
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._batches = {}
+        self._condition = threading.Condition()
+
+    def create(self, metadata=None):
+        """
+        Start an empty batch.
+
+        Args:
+            metadata (dict, optional): Extra fields stored on the batch
+
+        Returns:
+            str: Batch id
+        """
+        batch_id = uuid.uuid4().hex
+        batch = dict(metadata or {})
+        batch.update({
+            "batch_id": batch_id,
+            "status": "running",
+            "pending": 0,
+            "results": [],
+            "errors": [],
+            "created_at": time.time(),
+            "finished_at": None
+        })
+
+        with self._condition:
+            self._purge_expired()
+            self._batches[batch_id] = batch
+        return batch_id
+
+    def submit(self, batch_id, func, *args, context=None, **kwargs):
+        """
+        Run a task of a batch in the background.
+
+        Args:
+            batch_id (str): Batch id
+            func (callable): Function to run; a non-None return value is added to the results
+            *args: Positional arguments for func
+            context (dict, optional): Fields recorded with the error if func raises
+            **kwargs: Keyword arguments for func
+        """
+        with self._condition:
+            self._batches[batch_id]["pending"] += 1
+
+        # Run in a copy of the caller's context so the task's spans join the request trace
+        self._executor.submit(contextvars.copy_context().run, self._run, batch_id, func, args, kwargs, context)
+
+    def _run(self, batch_id, func, args, kwargs, context):
+        """Execute a task and record its outcome."""
+        start = time.perf_counter()
+        result = None
+        error = None
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            logger.error(f"{self.name} task of batch {batch_id} failed: {str(e)}")
+            error = dict(context or {}, error=str(e))
+        batch_task_seconds.observe(time.perf_counter() - start, status="error" if error else "done")
+
+        with self._condition:
+            batch = self._batches.get(batch_id)
+            if batch is None:
+                return
+            if result is not None:
+                batch["results"].append(result)
+            if error is not None:
+                batch["errors"].append(error)
+            batch["pending"] -= 1
+            if batch["pending"] == 0:
+                batch["status"] = "done"
+                batch["finished_at"] = time.time()
+            self._condition.notify_all()
+
+    def _purge_expired(self):
+        """Drop finished batches older than the TTL. Caller must hold the lock."""
+        cutoff = time.time() - self.ttl
+        expired = [batch_id for batch_id, batch in self._batches.items()
+                   if batch["finished_at"] is not None and batch["finished_at"] < cutoff]
+        for batch_id in expired:
+            del self._batches[batch_id]
+
+    def get(self, batch_id, after=0, wait=0):
+        """
+        Get a snapshot of a batch with the results added after the first `after`.
+
+        Args:
+            batch_id (str): Batch id
+            after (int, optional): Number of results the caller already has. Defaults to 0.
+            wait (float, optional): Seconds to wait for a new result or for the batch
+                to finish. Defaults to 0.
+
+        Returns:
+            dict: Copy of the batch with completed (total results so far) and the
+                new results, or None if it does not exist or has expired
+        """
+        with self._condition:
+            self._purge_expired()
+            batch = self._batches.get(batch_id)
+            if batch is None:
+                return None
+
+            if wait > 0:
+                self._condition.wait_for(
+                    lambda: len(batch["results"]) > after or batch["status"] == "done", wait)
+
+            snapshot = dict(batch)
+            snapshot["completed"] = len(batch["results"])
+            snapshot["results"] = batch["results"][after:]
+            snapshot["errors"] = list(batch["errors"])
+            return snapshot
@@ -0,0 +1,62 @@
+"""
+Concurrency helpers for the Comic Panel Description Generator.
+Under gunicorn's gevent workers, threads become greenlets and provider calls
+yield to the event loop while they wait on the network. CPU-bound work
+(OpenCV, local models) would block that loop, so it is sent to a pool of
+native threads instead.
+"""
+
+import os
+import logging
+import threading
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Native threads for CPU-bound work under gevent
+CPU_WORKERS = int(os.environ.get('CPU_WORKERS', os.cpu_count() or 4))
+
+_cpu_pool = None
+_cpu_pool_lock = threading.Lock()
+
+def gevent_patched():
+    """
+    Check whether gevent has monkey-patched threading in this process.
+
+    Returns:
+        bool: True when running under a gevent worker
+    """
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched('threading')
+
+def _get_cpu_pool():
+    """Create the native thread pool on first use."""
+    global _cpu_pool
+    with _cpu_pool_lock:
+        if _cpu_pool is None:
+            from gevent.threadpool import ThreadPoolExecutor as NativeThreadPoolExecutor
+            logger.info(f"Running CPU-bound work on {CPU_WORKERS} native threads")
+            _cpu_pool = NativeThreadPoolExecutor(max_workers=CPU_WORKERS)
+        return _cpu_pool
+
+def run_cpu_bound(func, *args, **kwargs):
+    """
+    Run CPU-bound work without blocking the gevent event loop.
+
+    Without gevent the function is simply called on the current thread.
+
+    Args:
+        func (callable): Function to run
+        *args: Positional arguments for func
+        **kwargs: Keyword arguments for func
+
+    Returns:
+        The return value of func
+    """
+    if not gevent_patched():
+        return func(*args, **kwargs)
+    return _get_cpu_pool().submit(func, *args, **kwargs).result()
@@ -0,0 +1,185 @@
+"""
+Background job store for the Comic Panel Description Generator.
+This module runs slow work off the request thread and keeps the results in memory for a limited time.
+"""
+
+import contextvars
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from mcp_server.utils.metrics import metrics_registry
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+job_queue_depth = metrics_registry.gauge(
+    "job_queue_depth", "Pending and running jobs", ("queue",))
+job_wait_seconds = metrics_registry.histogram(
+    "job_wait_seconds", "Time jobs spend queued before a worker picks them up", ("queue",))
+job_run_seconds = metrics_registry.histogram(
+    "job_run_seconds", "Time jobs spend running", ("queue", "status"))
+
+class JobQueueFull(Exception):
+    """Raised when a job store already has its maximum number of unfinished jobs."""
+    pass
+
+class JobStore:
+    """
+    Runs jobs on a worker pool and keeps their status and results for a TTL.
+
+    Jobs are plain dicts so they can be returned from API endpoints as-is.
+    """
+    def __init__(self, name, max_workers=4, ttl=600, max_pending=None, on_finish=None):
+        """
+        Initialize the job store.
+
+        Args:
+            name (str): Name used for worker threads and logging
+            max_workers (int, optional): Size of the worker pool. Defaults to 4.
+            ttl (float, optional): Seconds to keep finished jobs. Defaults to 600.
+            max_pending (int, optional): Most unfinished jobs accepted at once. Defaults to no limit.
+            on_finish (callable, optional): Called with a copy of each job when it finishes
+        """
+        self.name = name
+        self.ttl = ttl
+        self.max_pending = max_pending
+        self.on_finish = on_finish
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._jobs = {}
+        self._events = {}
+        self._lock = threading.Lock()
+        self._current = threading.local()
+        job_queue_depth.set_function(self.depth, queue=name)
+
+    def submit(self, func, *args, metadata=None, **kwargs):
+        """
+        Run a function in the background.
+
+        Args:
+            func (callable): Function to run; its return value becomes the job result
+            *args: Positional arguments for func
+            metadata (dict, optional): Extra fields stored on the job
+            **kwargs: Keyword arguments for func
+
+        Returns:
+            str: Job id
+
+        Raises:
+            JobQueueFull: If max_pending jobs are already unfinished
+        """
+        job_id = uuid.uuid4().hex
+        job = dict(metadata or {})
+        job.update({
+            "job_id": job_id,
+            "status": "pending",
+            "progress": None,
+            "result": None,
+            "error": None,
+            "created_at": time.time(),
+            "finished_at": None
+        })
+
+        with self._lock:
+            self._purge_expired()
+            if self.max_pending is not None and self._unfinished() >= self.max_pending:
+                raise JobQueueFull(f"{self.name} queue is full ({self.max_pending} unfinished jobs)")
+            self._jobs[job_id] = job
+            self._events[job_id] = threading.Event()
+
+        # Run in a copy of the caller's context so the job's spans join the request trace
+        self._executor.submit(contextvars.copy_context().run, self._run, job_id, func, args, kwargs)
+        return job_id
+
+    def _run(self, job_id, func, args, kwargs):
+        """Execute a job and record its outcome."""
+        self._update(job_id, status="running")
+        self._current.job_id = job_id
+        started_at = time.time()
+        with self._lock:
+            created_at = self._jobs[job_id]["created_at"]
+        job_wait_seconds.observe(started_at - created_at, queue=self.name)
+        status = "done"
+        try:
+            result = func(*args, **kwargs)
+            self._update(job_id, status="done", result=result, finished_at=time.time())
+        except Exception as e:
+            status = "error"
+            logger.error(f"{self.name} job {job_id} failed: {str(e)}")
+            self._update(job_id, status="error", error=str(e), finished_at=time.time())
+        finally:
+            job_run_seconds.observe(time.time() - started_at, queue=self.name, status=status)
+            self._current.job_id = None
+            event = self._events.get(job_id)
+            if event is not None:
+                event.set()
+
+        if self.on_finish is not None:
+            job = self.get(job_id)
+            try:
+                if job is not None:
+                    self.on_finish(job)
+            except Exception as e:
+                logger.error(f"{self.name} job {job_id} completion callback failed: {str(e)}")
+
+    def report_progress(self, **progress):
+        """
+        Record progress for the job running on the calling thread.
+
+        Args:
+            **progress: Progress fields, e.g. completed=3, total=10
+        """
+        job_id = getattr(self._current, "job_id", None)
+        if job_id is not None:
+            self._update(job_id, progress=progress)
+
+    def depth(self):
+        """
+        Count the jobs that have not finished yet.
+
+        Returns:
+            int: Pending and running jobs
+        """
+        with self._lock:
+            return self._unfinished()
+
+    def _unfinished(self):
+        """Count pending and running jobs. Caller must hold the lock."""
+        return sum(1 for job in self._jobs.values() if job["finished_at"] is None)
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(fields)
+
+    def _purge_expired(self):
+        """Drop finished jobs older than the TTL. Caller must hold the lock."""
+        cutoff = time.time() - self.ttl
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job["finished_at"] is not None and job["finished_at"] < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+            self._events.pop(job_id, None)
+
+    def get(self, job_id, wait=0):
+        """
+        Get a snapshot of a job, optionally waiting for it to finish.
+
+        Args:
+            job_id (str): Job id
+            wait (float, optional): Seconds to wait for completion. Defaults to 0.
+
+        Returns:
+            dict: Copy of the job, or None if it does not exist or has expired
+        """
+        event = self._events.get(job_id)
+        if event is not None and wait > 0:
+            event.wait(wait)
+
+        with self._lock:
+            self._purge_expired()
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
@@ -7,6 +7,7 @@ import os
 import json
 import logging
 import base64
+from mcp_server.utils.tracing import inject_arguments, span
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -48,6 +49,21 @@ def get_mcp_client():
         logger.error(f"Error creating MCP client: {str(e)}")
         return None
 
+def call_tool(client, tool_name, arguments):
+    """
+    Call an MCP tool, passing the trace context along.
+    
+    Args:
+        client (mcp.Client): Connected MCP client
+        tool_name (str): Tool to call
+        arguments (dict): Tool arguments
+        
+    Returns:
+        The tool result
+    """
+    with span(f"mcp.{tool_name}"):
+        return client.call_tool(MCP_SERVER_NAME, tool_name, inject_arguments(arguments))
+
 def analyze_panel_with_mcp(image_path):
     """
     Analyze a comic panel using the MCP server.
@@ -68,8 +84,8 @@ def analyze_panel_with_mcp(image_path):
             return {"figures": 1, "motion": "static", "objects": "none"}
         
         # Call the analyze_panel tool
-        result = client.call_tool(
-            MCP_SERVER_NAME,
+        result = call_tool(
+            client,
             "analyze_panel",
             {
                 "image_data": image_path,
@@ -106,13 +122,14 @@ def analyze_panel_with_mcp(image_path):
         logger.error(f"Error in analyze_panel_with_mcp: {str(e)}")
         return {"figures": 1, "motion": "static", "objects": "none"}
 
-def generate_description_with_mcp(image_data, panel_num=1):
+def generate_description_with_mcp(image_data, panel_num=1, deadline=None):
     """
     Generate a description for a comic panel using the MCP server.
     
     Args:
         image_data (dict): Analysis data
         panel_num (int): Panel number
+        deadline (Deadline, optional): Request budget forwarded to the tool
         
     Returns:
         str: Generated description
@@ -137,17 +154,21 @@ def generate_description_with_mcp(image_data, panel_num=1):
                 "center": [50, 50]  # Placeholder
             })
         
+        arguments = {
+            "panel_num": panel_num,
+            "figures": figures,
+            "scene_type": image_data.get("motion", "static"),
+            "attributes": ["dynamic" if image_data.get("motion") == "action" else "calm"],
+            "relationships": []
+        }
+        if deadline is not None:
+            arguments["budget_seconds"] = deadline.remaining()
+        
         # Call the generate_description tool
-        result = client.call_tool(
-            MCP_SERVER_NAME,
+        result = call_tool(
+            client,
             "generate_description",
-            {
-                "panel_num": panel_num,
-                "figures": figures,
-                "scene_type": image_data.get("motion", "static"),
-                "attributes": ["dynamic" if image_data.get("motion") == "action" else "calm"],
-                "relationships": []
-            }
+            arguments
         )
         
         # Parse the result
@@ -184,8 +205,8 @@ def process_feedback_with_mcp(rating, issue_type, original_description, edited_d
             return {"success": True, "message": "Feedback saved locally (MCP server not available)"}
         
         # Call the process_feedback tool
-        result = client.call_tool(
-            MCP_SERVER_NAME,
+        result = call_tool(
+            client,
             "process_feedback",
             {
                 "rating": rating,
@@ -226,8 +247,8 @@ def verify_description_with_mcp(description):
             return description
         
         # Call the verify_description tool
-        result = client.call_tool(
-            MCP_SERVER_NAME,
+        result = call_tool(
+            client,
             "verify_description",
             {
                 "description": description
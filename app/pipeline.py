@@ -0,0 +1,357 @@
+"""
+Processing pipeline for the Comic Panel Description Generator.
+This module runs panel analysis, description generation and verification,
+either locally or through the MCP server depending on USE_MCP.
+"""
+
+import os
+import io
+import logging
+import tempfile
+import time
+import zipfile
+import cv2
+from mcp_server.utils.text_utils import remove_speculative_language, collapse_whitespace
+from mcp_server.utils.metrics import metrics_registry
+from mcp_server.utils.tracing import span
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Check if we should use local processing or MCP
+USE_MCP = os.environ.get('USE_MCP', 'false').lower() == 'true'
+
+if USE_MCP:
+    # Import MCP client
+    logger.info("Using MCP for processing")
+    from app.mcp_client import (analyze_panel_with_mcp, generate_description_with_mcp,
+                            verify_description_with_mcp, generate_rule_based_description)
+else:
+    # Import local processing modules
+    logger.info("Using local processing")
+    from app.vision import analyze_panel, analyze_image
+    from app.textgen import generate_description, text_generator
+
+from app.vision import decode_image, split_page_into_panels
+from app.concurrency import run_cpu_bound
+
+# File types read from uploaded archives
+ARCHIVE_IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+# Describe modes: standard runs the provider chain; commercial and progressive
+# answer from the rules (progressive upgrades in the background)
+DESCRIBE_MODES = ("standard", "commercial", "progressive")
+
+describe_latency = metrics_registry.histogram(
+    "describe_latency_seconds", "Time to produce a panel description", ("mode",))
+
+def analyze_path(image_path):
+    """
+    Analyze a comic panel image on disk.
+
+    Args:
+        image_path (str): Path to the image file
+
+    Returns:
+        dict: Analysis results
+    """
+    with span("analyze"):
+        if USE_MCP:
+            return analyze_panel_with_mcp(image_path)
+        return run_cpu_bound(analyze_panel, image_path)
+
+def analyze_image_bytes(image_bytes):
+    """
+    Analyze encoded image bytes.
+
+    Args:
+        image_bytes (bytes): Encoded image data
+
+    Returns:
+        dict: Analysis results
+
+    Raises:
+        ValueError: If the image cannot be decoded
+    """
+    with span("analyze"):
+        if USE_MCP:
+            # The MCP server reads images from disk
+            with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as temp:
+                temp_path = temp.name
+                temp.write(image_bytes)
+            try:
+                return analyze_panel_with_mcp(temp_path)
+            finally:
+                os.unlink(temp_path)
+
+        return run_cpu_bound(_analyze_image_bytes, image_bytes)
+
+def _analyze_image_bytes(image_bytes):
+    """Decode and analyze image bytes on the current thread."""
+    img = decode_image(image_bytes)
+    if img is None:
+        raise ValueError("Could not decode image")
+    return analyze_image(img)
+
+def analyze_array(img):
+    """
+    Analyze a decoded grayscale image, such as a panel cut from a page.
+
+    Args:
+        img (numpy.ndarray): Grayscale image
+
+    Returns:
+        dict: Analysis results
+    """
+    if USE_MCP:
+        ok, encoded = cv2.imencode('.png', img)
+        if not ok:
+            raise ValueError("Could not encode image")
+        return analyze_image_bytes(encoded.tobytes())
+    with span("analyze"):
+        return run_cpu_bound(analyze_image, img)
+
+def describe_panel(image_data, panel_num, deadline=None):
+    """
+    Generate a description with the provider chain, without verification.
+
+    Args:
+        image_data (dict): Dictionary containing image analysis results
+        panel_num (int): Panel number
+        deadline (Deadline, optional): Request-scoped time budget
+
+    Returns:
+        str: Generated panel description
+    """
+    with span("describe"):
+        if USE_MCP:
+            return generate_description_with_mcp(image_data, panel_num, deadline)
+        return generate_description(image_data, panel_num, deadline)
+
+def verify_description(description):
+    """
+    Remove speculative language from a description.
+
+    Args:
+        description (str): Description to verify
+
+    Returns:
+        str: Verified description
+    """
+    with span("verify"):
+        if USE_MCP:
+            return verify_description_with_mcp(description)
+        return collapse_whitespace(remove_speculative_language(description))
+
+def generate_llm_description(image_data, panel_num, deadline=None):
+    """
+    Generate a description with the provider chain.
+
+    Descriptions from the MCP server are verified, as /api/describe has always done.
+
+    Args:
+        image_data (dict): Dictionary containing image analysis results
+        panel_num (int): Panel number
+        deadline (Deadline, optional): Request-scoped time budget
+
+    Returns:
+        str: Generated panel description
+    """
+    description = describe_panel(image_data, panel_num, deadline)
+    if USE_MCP:
+        # Verify the description to ensure it's factual
+        description = verify_description(description)
+    return description
+
+def generate_rule_based(image_data, panel_num):
+    """
+    Generate the rule-based description without calling any provider.
+
+    Args:
+        image_data (dict): Dictionary containing image analysis results
+        panel_num (int): Panel number
+
+    Returns:
+        str: Rule-based panel description
+    """
+    with span("describe.rules"):
+        if USE_MCP:
+            return generate_rule_based_description(image_data, panel_num)
+        return text_generator._generate_rule_based(image_data, panel_num)
+
+def resolve_describe_mode(commercial_grade=False, progressive=False):
+    """
+    Decide which describe mode a request needs.
+
+    Args:
+        commercial_grade (bool, optional): Minimal, strictly factual description requested
+        progressive (bool, optional): Immediate answer with a background upgrade requested
+
+    Returns:
+        str: One of DESCRIBE_MODES
+    """
+    if commercial_grade:
+        return "commercial"
+    if progressive:
+        return "progressive"
+    return "standard"
+
+def describe_with_mode(image_data, panel_num, mode="standard", deadline=None):
+    """
+    Describe a panel, running only the stages the mode needs.
+
+    Commercial and progressive descriptions come from the rules without any
+    provider call; standard descriptions go through the provider chain.
+
+    Args:
+        image_data (dict): Dictionary containing image analysis results
+        panel_num (int): Panel number
+        mode (str, optional): One of DESCRIBE_MODES. Defaults to "standard".
+        deadline (Deadline, optional): Request-scoped time budget
+
+    Returns:
+        str: Panel description
+    """
+    with describe_latency.time(mode=mode):
+        if mode == "standard":
+            return generate_llm_description(image_data, panel_num, deadline)
+        return generate_rule_based(image_data, panel_num)
+
+def upgrade_description(image_data, panel_num, deadline=None):
+    """
+    Generate the provider description that replaces a progressive one.
+
+    Args:
+        image_data (dict): Dictionary containing image analysis results
+        panel_num (int): Panel number
+        deadline (Deadline, optional): Time budget for the upgrade
+
+    Returns:
+        str: Generated panel description
+    """
+    with describe_latency.time(mode="progressive_upgrade"):
+        return generate_llm_description(image_data, panel_num, deadline)
+
+def process_panel(image_bytes=None, image_path=None, panel_num=1, commercial_grade=False,
+                  verify=True, deadline=None, image=None):
+    """
+    Analyze, describe and optionally verify one panel.
+
+    Args:
+        image_bytes (bytes, optional): Encoded image data
+        image_path (str, optional): Path to the image file, used when image_bytes is not given
+        panel_num (int, optional): Panel number. Defaults to 1.
+        commercial_grade (bool, optional): Use the minimal rule-based description. Defaults to False.
+        verify (bool, optional): Remove speculative language from the description. Defaults to True.
+        deadline (Deadline, optional): Request-scoped time budget for description generation
+        image (numpy.ndarray, optional): Decoded grayscale image, used instead of the other sources
+
+    Returns:
+        dict: Dictionary containing:
+            - analysis: Analysis results
+            - description: Panel description
+            - verified: Whether the description was verified
+            - timings: Milliseconds spent in each stage and in total
+
+    Raises:
+        ValueError: If the image cannot be decoded
+    """
+    timings = {}
+    start = time.perf_counter()
+
+    if image is not None:
+        analysis = analyze_array(image)
+    elif image_bytes is not None:
+        analysis = analyze_image_bytes(image_bytes)
+    else:
+        analysis = analyze_path(image_path)
+    stage_end = time.perf_counter()
+    timings["analyze_ms"] = round((stage_end - start) * 1000, 2)
+
+    stage_start = stage_end
+    if commercial_grade:
+        description = generate_rule_based(analysis, panel_num)
+    else:
+        description = describe_panel(analysis, panel_num, deadline)
+    stage_end = time.perf_counter()
+    timings["describe_ms"] = round((stage_end - stage_start) * 1000, 2)
+    describe_latency.observe(stage_end - stage_start, mode=resolve_describe_mode(commercial_grade))
+
+    # Rule-based descriptions contain no speculative language
+    verified = verify and not commercial_grade
+    if verified:
+        stage_start = stage_end
+        description = verify_description(description)
+        stage_end = time.perf_counter()
+        timings["verify_ms"] = round((stage_end - stage_start) * 1000, 2)
+
+    timings["total_ms"] = round((stage_end - start) * 1000, 2)
+
+    return {
+        "analysis": analysis,
+        "description": description,
+        "verified": verified,
+        "timings": timings
+    }
+
+def split_page(image_bytes):
+    """
+    Decode a page and split it into panels.
+
+    Args:
+        image_bytes (bytes): Encoded page image
+
+    Returns:
+        list: Grayscale panel images in reading order
+
+    Raises:
+        ValueError: If the image cannot be decoded
+    """
+    with span("split"):
+        return run_cpu_bound(_split_page, image_bytes)
+
+def _split_page(image_bytes):
+    """Decode and split a page on the current thread."""
+    img = decode_image(image_bytes)
+    if img is None:
+        raise ValueError("Could not decode image")
+    return split_page_into_panels(img)
+
+def read_archive_pages(archive_bytes, max_pages, max_page_bytes):
+    """
+    List the page images in a zip archive.
+
+    Args:
+        archive_bytes (bytes): Zip archive
+        max_pages (int): Largest number of pages accepted
+        max_page_bytes (int): Largest uncompressed page accepted
+
+    Returns:
+        list: (name, zipfile.ZipInfo) pairs in name order
+
+    Raises:
+        ValueError: If the archive is invalid or exceeds the limits
+    """
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(archive_bytes))
+    except zipfile.BadZipFile as e:
+        raise ValueError(f"Invalid archive: {str(e)}")
+
+    # Sort by name only: ZipInfo is not orderable, and an archive may repeat a name
+    pages = sorted(((info.filename, info) for info in archive.infolist()
+                    if not info.is_dir() and info.filename.lower().endswith(ARCHIVE_IMAGE_EXTENSIONS)),
+                   key=lambda page: page[0])
+    if not pages:
+        raise ValueError("Archive contains no images")
+    if len(pages) > max_pages:
+        raise ValueError(f"Archive has too many pages ({len(pages)} > {max_pages})")
+    for name, info in pages:
+        if info.file_size > max_page_bytes:
+            raise ValueError(f"Archive entry {name} is too large")
+    return pages
+
+def read_archive_page(archive_bytes, info):
+    """Read one page from a zip archive."""
+    with zipfile.ZipFile(io.BytesIO(archive_bytes)) as archive:
+        return archive.read(info)
@@ -1,13 +1,130 @@
 import os
 import logging
-import requests
+import queue
+import threading
+import time
 import json
-from transformers import pipeline
+from concurrent.futures import Future
+from mcp_server.utils.text_utils import remove_speculative_language
+from mcp_server.utils.provider_utils import SYSTEM_PROMPT, build_chat_payload, build_anthropic_payload, prompt_cache_stats, post_with_retry, provider_url, fallback_depth
+from app.concurrency import run_cpu_bound
+from mcp_server.utils.metrics import metrics_registry
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+local_queue_depth = metrics_registry.gauge(
+    "local_model_queue_depth", "Prompts waiting for the local model batcher")
+local_batch_seconds = metrics_registry.histogram(
+    "local_model_batch_seconds", "Time to run one local model batch")
+local_batch_size = metrics_registry.histogram(
+    "local_model_batch_size", "Prompts per local model batch", buckets=(1, 2, 4, 8, 16, 32))
+
+class LocalModelBatcher:
+    """
+    Single inference worker that micro-batches prompts for the local model.
+    
+    Callers submit prompts from any thread and receive a Future. The worker
+    collects prompts that arrive within a short window (up to a maximum batch
+    size) and runs them through the pipeline as one padded batch, so the
+    shared pipeline is only ever touched by one thread.
+    """
+    def __init__(self, model, window_ms=5, max_batch_size=8, generation_kwargs=None):
+        """
+        Initialize the batcher and start its worker thread.
+        
+        Args:
+            model: Hugging Face text-generation pipeline
+            window_ms (float, optional): How long to wait for more prompts after the first one. Defaults to 5.
+            max_batch_size (int, optional): Maximum number of prompts per batch. Defaults to 8.
+            generation_kwargs (dict, optional): Keyword arguments passed to the pipeline call.
+        """
+        self.model = model
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.generation_kwargs = dict(generation_kwargs or {})
+        self._queue = queue.Queue()
+        local_queue_depth.set_function(self._queue.qsize)
+        
+        self._configure_padding()
+        
+        self._worker = threading.Thread(target=self._run, name="local-model-batcher", daemon=True)
+        self._worker.start()
+    
+    def _configure_padding(self):
+        """Make the tokenizer able to pad a batch of prompts of different lengths."""
+        tokenizer = getattr(self.model, "tokenizer", None)
+        if tokenizer is None:
+            return
+        
+        # GPT-2 style models have no pad token; reuse EOS and pad on the left
+        # so every prompt ends right where generation starts
+        if tokenizer.pad_token_id is None:
+            tokenizer.pad_token = tokenizer.eos_token
+        tokenizer.padding_side = "left"
+        self.generation_kwargs.setdefault("pad_token_id", tokenizer.pad_token_id)
+    
+    def submit(self, prompt):
+        """
+        Queue a prompt for generation.
+        
+        Args:
+            prompt (str): The prompt to send to the model
+            
+        Returns:
+            concurrent.futures.Future: Resolves to the full generated text (prompt included)
+        """
+        future = Future()
+        self._queue.put((prompt, future))
+        return future
+    
+    def _collect_batch(self):
+        """Block for the first prompt, then gather more until the window closes or the batch is full."""
+        batch = [self._queue.get()]
+        window_end = time.monotonic() + self.window
+        
+        while len(batch) < self.max_batch_size:
+            remaining = window_end - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        
+        return batch
+    
+    def _run(self):
+        """Worker loop: run each collected batch through the model and resolve its futures."""
+        while True:
+            batch = self._collect_batch()
+            
+            # Drop prompts whose callers have already given up
+            batch = [(prompt, future) for prompt, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            
+            prompts = [prompt for prompt, _ in batch]
+            logger.info(f"Running local model batch of {len(prompts)} prompt(s)")
+            local_batch_size.observe(len(prompts))
+            
+            try:
+                # Native thread under gevent so the batch does not block the event loop
+                with local_batch_seconds.time():
+                    results = run_cpu_bound(self.model, prompts, batch_size=len(prompts), **self.generation_kwargs)
+            except Exception as e:
+                logger.error(f"Local model batch failed: {str(e)}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            
+            for (_, future), result in zip(batch, results):
+                # A list input yields one list of sequences per prompt
+                if isinstance(result, list):
+                    result = result[0]
+                future.set_result(result["generated_text"])
+
 class MultiProviderTextGen:
     """
     Enhanced text generation class that supports multiple API providers with fallback chain.
@@ -28,17 +145,27 @@ class MultiProviderTextGen:
         self.google_key = os.environ.get('GOOGLE_API_KEY', '')
         self.hf_key = os.environ.get('HUGGINGFACE_API_KEY', '')
         
-        # API endpoints
-        self.openai_url = "https://api.openai.com/v1/chat/completions"
-        self.anthropic_url = "https://api.anthropic.com/v1/messages"
-        self.grok_url = "https://api.xai.com/v1/chat/completions"  # Update with actual endpoint
-        self.deepseek_url = "https://api.deepseek.com/v1/chat/completions"  # Update with actual endpoint
-        self.hf_inference_url = "https://api-inference.huggingface.co/models/"
+        # API endpoints (base URLs can be overridden with <PROVIDER>_BASE_URL)
+        self.openai_url = provider_url("openai")
+        self.anthropic_url = provider_url("anthropic")
+        self.grok_url = provider_url("grok")
+        self.deepseek_url = provider_url("deepseek")
+        self.hf_inference_url = provider_url("huggingface")
         
         # Default priority order (can be configured)
         self.config = config or {}
         self.priority = self.config.get('priority', ['openai', 'anthropic', 'grok', 'deepseek', 'huggingface', 'rule_based'])
         
+        # Local model micro-batching settings
+        self.local_batch_window_ms = float(self.config.get('local_batch_window_ms', os.environ.get('LOCAL_BATCH_WINDOW_MS', 5)))
+        self.local_batch_max_size = int(self.config.get('local_batch_max_size', os.environ.get('LOCAL_BATCH_MAX_SIZE', 8)))
+        self.local_model_timeout = float(self.config.get('local_model_timeout', os.environ.get('LOCAL_MODEL_TIMEOUT', 30)))
+        self._local_lock = threading.Lock()
+        self._local_batcher = None
+        
+        # Smallest remaining budget worth starting another provider attempt with
+        self.min_attempt_seconds = float(self.config.get('min_attempt_seconds', os.environ.get('MIN_PROVIDER_ATTEMPT_SECONDS', 1.0)))
+        
         # Log available APIs
         self._log_available_apis()
         
@@ -46,7 +173,7 @@ class MultiProviderTextGen:
         if not any([self.openai_key, self.anthropic_key, self.grok_key, self.deepseek_key, self.hf_key]):
             logger.info("No API keys provided - will use local model as fallback")
             try:
-                self.local_model = pipeline("text-generation", model="distilgpt2", device=-1)
+                self.local_model = self._load_local_model()
                 logger.info("Local model initialized successfully")
             except Exception as e:
                 logger.error(f"Error initializing local model: {str(e)}")
@@ -157,54 +284,15 @@ class MultiProviderTextGen:
         Returns:
             str: Cleaned description text
         """
-        # List of speculative phrases to remove or replace
-        speculative_phrases = [
-            # Phrases that suggest dialogue content
-            (r'saying "[^"]*"', "with a speech bubble"),
-            (r'says "[^"]*"', "has a speech bubble"),
-            (r'reads "[^"]*"', "contains text"),
-            (r'exclaims "[^"]*"', "has a speech bubble"),
-            (r'thinking "[^"]*"', "is present"),
-            
-            # Phrases that suggest emotions or thoughts
-            (r'appears to be (feeling|thinking|considering)', "is"),
-            (r'seems to be (happy|sad|angry|excited|nervous|worried|concerned|thinking)', "is"),
-            (r'looks (happy|sad|angry|excited|nervous|worried|concerned)', "is visible"),
-            
-            # Phrases that suggest narrative context
-            (r'is about to', "is"),
-            (r'is going to', "is"),
-            (r'is trying to', "is"),
-            (r'is planning to', "is"),
-            (r'has just', "is"),
-            (r'had just', "is"),
-            
-            # Phrases that suggest interpretation
-            (r'probably', ""),
-            (r'possibly', ""),
-            (r'perhaps', ""),
-            (r'maybe', ""),
-            (r'might be', "is"),
-            (r'could be', "is"),
-            (r'would be', "is"),
-            (r'appears to be', "is"),
-            (r'seems to be', "is"),
-            (r'looks like', "shows"),
-        ]
-        
-        # Apply replacements
-        import re
-        for pattern, replacement in speculative_phrases:
-            text = re.sub(pattern, replacement, text, flags=re.IGNORECASE)
-        
-        return text
+        return remove_speculative_language(text)
     
-    def _generate_with_openai(self, prompt):
+    def _generate_with_openai(self, prompt, deadline=None):
         """
         Generate text using OpenAI API.
         
         Args:
             prompt (str): The prompt to send to the API
+            deadline (Deadline, optional): Request budget that caps the timeout
             
         Returns:
             str: Generated text
@@ -216,28 +304,21 @@ class MultiProviderTextGen:
             "Content-Type": "application/json"
         }
         
-        payload = {
-            "model": "gpt-3.5-turbo",
-            "messages": [
-                {
-                    "role": "system", 
-                    "content": "You are a comic panel describer that ONLY states what is objectively visible. NEVER invent dialogue content, emotions, or scene details. If you see a speech bubble, only mention its presence - NEVER guess what's written inside unless the text is clearly legible. Describe only physical elements that are definitely present in the image. Do not make assumptions about what characters are thinking or feeling unless their expressions are extremely clear. Do not use interpretive language - stick to physical descriptions only. Your descriptions must be factual enough to charge money for."
-                },
-                {"role": "user", "content": prompt}
-            ],
-            "max_tokens": 100,
-            "temperature": 0.5
-        }
+        # Static system prompt first so the provider can cache the prefix
+        payload = build_chat_payload(prompt, SYSTEM_PROMPT, model="gpt-3.5-turbo", max_tokens=100, temperature=0.5)
         
-        response = requests.post(
+        response = post_with_retry(
+            "openai",
             self.openai_url,
-            json=payload,
-            headers=headers,
-            timeout=10
+            payload,
+            headers,
+            timeout=10,
+            deadline=deadline
         )
         
         if response.status_code == 200:
             result = response.json()
+            prompt_cache_stats.record("openai", result)
             generated_text = result["choices"][0]["message"]["content"].strip()
             logger.info(f"OpenAI generated: {generated_text}")
             return generated_text
@@ -245,12 +326,13 @@ class MultiProviderTextGen:
             logger.error(f"OpenAI API error: {response.status_code} - {response.text}")
             raise Exception(f"OpenAI API error: {response.status_code}")
     
-    def _generate_with_anthropic(self, prompt):
+    def _generate_with_anthropic(self, prompt, deadline=None):
         """
         Generate text using Anthropic API.
         
         Args:
             prompt (str): The prompt to send to the API
+            deadline (Deadline, optional): Request budget that caps the timeout
             
         Returns:
             str: Generated text
@@ -263,23 +345,21 @@ class MultiProviderTextGen:
             "Content-Type": "application/json"
         }
         
-        payload = {
-            "model": "claude-instant-1.2",
-            "max_tokens": 50,
-            "messages": [
-                {"role": "user", "content": prompt}
-            ]
-        }
+        # System prompt goes in a cache_control block so Anthropic caches it
+        payload = build_anthropic_payload(prompt, SYSTEM_PROMPT, model="claude-instant-1.2", max_tokens=50)
         
-        response = requests.post(
+        response = post_with_retry(
+            "anthropic",
             self.anthropic_url,
-            json=payload,
-            headers=headers,
-            timeout=10
+            payload,
+            headers,
+            timeout=10,
+            deadline=deadline
         )
         
         if response.status_code == 200:
             result = response.json()
+            prompt_cache_stats.record("anthropic", result)
             generated_text = result["content"][0]["text"].strip()
             logger.info(f"Anthropic generated: {generated_text}")
             return generated_text
@@ -287,12 +367,13 @@ class MultiProviderTextGen:
             logger.error(f"Anthropic API error: {response.status_code} - {response.text}")
             raise Exception(f"Anthropic API error: {response.status_code}")
     
-    def _generate_with_grok(self, prompt):
+    def _generate_with_grok(self, prompt, deadline=None):
         """
         Generate text using Grok API.
         
         Args:
             prompt (str): The prompt to send to the API
+            deadline (Deadline, optional): Request budget that caps the timeout
             
         Returns:
             str: Generated text
@@ -304,23 +385,20 @@ class MultiProviderTextGen:
             "Content-Type": "application/json"
         }
         
-        payload = {
-            "messages": [
-                {"role": "user", "content": prompt}
-            ],
-            "max_tokens": 50,
-            "temperature": 0.7
-        }
+        payload = build_chat_payload(prompt, None, max_tokens=50, temperature=0.7)
         
-        response = requests.post(
+        response = post_with_retry(
+            "grok",
             self.grok_url,
-            json=payload,
-            headers=headers,
-            timeout=5
+            payload,
+            headers,
+            timeout=5,
+            deadline=deadline
         )
         
         if response.status_code == 200:
             result = response.json()
+            prompt_cache_stats.record("grok", result)
             generated_text = result["choices"][0]["message"]["content"].strip()
             logger.info(f"Grok API generated: {generated_text}")
             return generated_text
@@ -328,12 +406,13 @@ class MultiProviderTextGen:
             logger.error(f"Grok API error: {response.status_code} - {response.text}")
             raise Exception(f"Grok API error: {response.status_code}")
     
-    def _generate_with_deepseek(self, prompt):
+    def _generate_with_deepseek(self, prompt, deadline=None):
         """
         Generate text using DeepSeek API.
         
         Args:
             prompt (str): The prompt to send to the API
+            deadline (Deadline, optional): Request budget that caps the timeout
             
         Returns:
             str: Generated text
@@ -345,24 +424,20 @@ class MultiProviderTextGen:
             "Content-Type": "application/json"
         }
         
-        payload = {
-            "model": "deepseek-chat",
-            "messages": [
-                {"role": "user", "content": prompt}
-            ],
-            "max_tokens": 50,
-            "temperature": 0.7
-        }
+        payload = build_chat_payload(prompt, None, model="deepseek-chat", max_tokens=50, temperature=0.7)
         
-        response = requests.post(
+        response = post_with_retry(
+            "deepseek",
             self.deepseek_url,
-            json=payload,
-            headers=headers,
-            timeout=5
+            payload,
+            headers,
+            timeout=5,
+            deadline=deadline
         )
         
         if response.status_code == 200:
             result = response.json()
+            prompt_cache_stats.record("deepseek", result)
             generated_text = result["choices"][0]["message"]["content"].strip()
             logger.info(f"DeepSeek API generated: {generated_text}")
             return generated_text
@@ -370,12 +445,13 @@ class MultiProviderTextGen:
             logger.error(f"DeepSeek API error: {response.status_code} - {response.text}")
             raise Exception(f"DeepSeek API error: {response.status_code}")
     
-    def _generate_with_huggingface(self, prompt):
+    def _generate_with_huggingface(self, prompt, deadline=None):
         """
         Generate text using HuggingFace Inference API.
         
         Args:
             prompt (str): The prompt to send to the API
+            deadline (Deadline, optional): Request budget that caps the timeout
             
         Returns:
             str: Generated text
@@ -399,11 +475,13 @@ class MultiProviderTextGen:
             }
         }
         
-        response = requests.post(
+        response = post_with_retry(
+            "huggingface",
             f"{self.hf_inference_url}{model}",
-            json=payload,
-            headers=headers,
-            timeout=10
+            payload,
+            headers,
+            timeout=10,
+            deadline=deadline
         )
         
         if response.status_code == 200:
@@ -417,38 +495,27 @@ class MultiProviderTextGen:
             logger.error(f"HuggingFace API error: {response.status_code} - {response.text}")
             raise Exception(f"HuggingFace API error: {response.status_code}")
     
-    def _generate_with_local_model(self, prompt):
+    def _generate_with_local_model(self, prompt, deadline=None):
         """
         Generate text using local model.
         
         Args:
             prompt (str): The prompt to send to the model
+            deadline (Deadline, optional): Request budget that caps the wait
             
         Returns:
             str: Generated text
         """
         logger.info(f"Generating with local model. Prompt: {prompt}")
         
-        # Load model if not already loaded
-        if not hasattr(self, "local_model") or self.local_model is None:
-            try:
-                logger.info("Loading local model on demand")
-                self.local_model = pipeline("text-generation", model="distilgpt2", device=-1)
-            except Exception as e:
-                logger.error(f"Failed to load local model: {str(e)}")
-                raise Exception("Failed to load local model")
-        
-        result = self.local_model(
-            prompt,
-            max_length=50,
-            num_return_sequences=1,
-            temperature=0.7,
-            top_p=0.9,
-            top_k=40,
-            do_sample=True
-        )
-        
-        generated_text = result[0]["generated_text"]
+        # Concurrent requests share one batching worker instead of calling the pipeline directly
+        future = self._get_local_batcher().submit(prompt)
+        try:
+            timeout = self.local_model_timeout if deadline is None else deadline.timeout_for(self.local_model_timeout)
+            generated_text = future.result(timeout=timeout)
+        except Exception:
+            future.cancel()
+            raise
         
         # Extract just the completion part (remove the prompt)
         completion = generated_text[len(prompt):].strip()
@@ -460,6 +527,55 @@ class MultiProviderTextGen:
         logger.info(f"Local model generated: {completion}")
         return completion
     
+    def _load_local_model(self):
+        """
+        Load the local text-generation pipeline.
+        
+        transformers is imported here rather than at module level: it is only
+        needed for the local fallback, is slow to import, and its hub client
+        does not import under gevent's monkey-patching.
+        
+        Returns:
+            Pipeline: Hugging Face text-generation pipeline
+        """
+        from transformers import pipeline
+        return pipeline("text-generation", model="distilgpt2", device=-1)
+    
+    def _get_local_batcher(self):
+        """
+        Get the local model batcher, loading the model on first use.
+        
+        Returns:
+            LocalModelBatcher: Batcher that owns the local pipeline
+        """
+        with self._local_lock:
+            if self._local_batcher is not None:
+                return self._local_batcher
+            
+            # Load model if not already loaded
+            if not hasattr(self, "local_model") or self.local_model is None:
+                try:
+                    logger.info("Loading local model on demand")
+                    self.local_model = self._load_local_model()
+                except Exception as e:
+                    logger.error(f"Failed to load local model: {str(e)}")
+                    raise Exception("Failed to load local model")
+            
+            self._local_batcher = LocalModelBatcher(
+                self.local_model,
+                window_ms=self.local_batch_window_ms,
+                max_batch_size=self.local_batch_max_size,
+                generation_kwargs={
+                    "max_new_tokens": 50,
+                    "num_return_sequences": 1,
+                    "temperature": 0.7,
+                    "top_p": 0.9,
+                    "top_k": 40,
+                    "do_sample": True
+                }
+            )
+            return self._local_batcher
+    
     def _generate_rule_based(self, image_data, panel_num):
         """
         Generate a description using rule-based approach (no ML/API).
@@ -506,70 +622,90 @@ class MultiProviderTextGen:
         logger.info(f"Rule-based generated: {description}")
         return description
     
-    def generate(self, image_data, panel_num=1):
+    def generate(self, image_data, panel_num=1, deadline=None):
         """
         Generate a description for a comic panel based on image analysis data.
         Tries each provider in priority order, falling back to the next if one fails.
         
+        When a deadline is given, each provider attempt gets at most the time
+        left in the budget, and the chain skips straight to rule-based
+        generation once the remaining budget cannot fit another attempt.
+        
         Args:
             image_data (dict): Dictionary containing image analysis results
             panel_num (int, optional): Panel number. Defaults to 1.
+            deadline (Deadline, optional): Request-scoped time budget
             
         Returns:
             str: Generated panel description
         """
         prompt = self._create_prompt(image_data, panel_num)
         
-        # Try each provider in priority order
-        for provider in self.priority:
-            try:
-                if provider == 'openai' and self.openai_key:
-                    generated_text = self._generate_with_openai(prompt)
-                    return self._format_description(generated_text, panel_num)
-                
-                elif provider == 'anthropic' and self.anthropic_key:
-                    generated_text = self._generate_with_anthropic(prompt)
-                    return self._format_description(generated_text, panel_num)
-                
-                elif provider == 'grok' and self.grok_key:
-                    generated_text = self._generate_with_grok(prompt)
-                    return self._format_description(generated_text, panel_num)
-                
-                elif provider == 'deepseek' and self.deepseek_key:
-                    generated_text = self._generate_with_deepseek(prompt)
-                    return self._format_description(generated_text, panel_num)
-                
-                elif provider == 'huggingface' and self.hf_key:
-                    generated_text = self._generate_with_huggingface(prompt)
-                    return self._format_description(generated_text, panel_num)
-                
-                elif provider == 'local_model' and hasattr(self, 'local_model') and self.local_model is not None:
-                    generated_text = self._generate_with_local_model(prompt)
-                    return self._format_description(generated_text, panel_num)
-                
-                elif provider == 'rule_based':
+        # Providers that failed before one answered, recorded as the fallback depth
+        failures = 0
+        source = 'basic'
+        try:
+            # Try each provider in priority order
+            for provider in self.priority:
+                if deadline is not None and provider != 'rule_based' and not deadline.can_fit(self.min_attempt_seconds):
+                    logger.warning(f"{deadline.remaining():.2f}s left in request budget - skipping to rule-based generation")
+                    source = 'rule_based'
                     return self._generate_rule_based(image_data, panel_num)
                 
-            except Exception as e:
-                logger.error(f"Error with {provider}: {str(e)}")
-                continue
-        
-        # Ultimate fallback if all providers fail
-        logger.warning("All providers failed, using basic fallback")
-        return f"Panel {panel_num}: Comic scene with {image_data.get('figures', 1)} character(s)."
+                source = provider
+                try:
+                    if provider == 'openai' and self.openai_key:
+                        generated_text = self._generate_with_openai(prompt, deadline)
+                        return self._format_description(generated_text, panel_num)
+                    
+                    elif provider == 'anthropic' and self.anthropic_key:
+                        generated_text = self._generate_with_anthropic(prompt, deadline)
+                        return self._format_description(generated_text, panel_num)
+                    
+                    elif provider == 'grok' and self.grok_key:
+                        generated_text = self._generate_with_grok(prompt, deadline)
+                        return self._format_description(generated_text, panel_num)
+                    
+                    elif provider == 'deepseek' and self.deepseek_key:
+                        generated_text = self._generate_with_deepseek(prompt, deadline)
+                        return self._format_description(generated_text, panel_num)
+                    
+                    elif provider == 'huggingface' and self.hf_key:
+                        generated_text = self._generate_with_huggingface(prompt, deadline)
+                        return self._format_description(generated_text, panel_num)
+                    
+                    elif provider == 'local_model' and hasattr(self, 'local_model') and self.local_model is not None:
+                        generated_text = self._generate_with_local_model(prompt, deadline)
+                        return self._format_description(generated_text, panel_num)
+                    
+                    elif provider == 'rule_based':
+                        return self._generate_rule_based(image_data, panel_num)
+                    
+                except Exception as e:
+                    logger.error(f"Error with {provider}: {str(e)}")
+                    failures += 1
+                    continue
+            
+            # Ultimate fallback if all providers fail
+            source = 'basic'
+            logger.warning("All providers failed, using basic fallback")
+            return f"Panel {panel_num}: Comic scene with {image_data.get('figures', 1)} character(s)."
+        finally:
+            fallback_depth.observe(failures, source=source)
 
 # Create a singleton instance with environment variables
 text_generator = MultiProviderTextGen()
 
-def generate_description(image_data, panel_num):
+def generate_description(image_data, panel_num, deadline=None):
     """
     Legacy function for backward compatibility.
     
     Args:
         image_data (dict): Dictionary containing image analysis results
         panel_num (int): Panel number
+        deadline (Deadline, optional): Request-scoped time budget
         
     Returns:
         str: Generated panel description
     """
-    return text_generator.generate(image_data, panel_num)
+    return text_generator.generate(image_data, panel_num, deadline)
@@ -1,46 +1,57 @@
 import cv2
 import numpy as np
 import logging
+from mcp_server.utils.metrics import metrics_registry
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def analyze_panel(image_path):
+vision_stage_seconds = metrics_registry.histogram(
+    "vision_stage_seconds", "Time spent in each image analysis stage", ("stage",))
+
+def decode_image(image_bytes):
     """
-    Analyze a comic panel image to detect figures, motion, and objects.
+    Decode encoded image bytes (JPEG, PNG, ...) to a grayscale image.
     
     Args:
-        image_path (str): Path to the image file
+        image_bytes (bytes): Encoded image data
         
     Returns:
-        dict: Dictionary containing analysis results:
-            - figures: Number of figures/characters detected
-            - motion: "action" or "static" based on edge density
-            - objects: "sparks" or "none" based on edge intensity
+        numpy.ndarray: Grayscale image, or None if the data cannot be decoded
     """
-    try:
-        # Load image in grayscale
-        logger.info(f"Loading image from {image_path}")
-        img = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
-        
-        # Check if image was loaded successfully
-        if img is None:
-            logger.error(f"Failed to load image from {image_path}")
-            # Return default values if image loading fails
-            return {"figures": 1, "motion": "static", "objects": "none"}
-        
-        # Get image dimensions for logging
-        height, width = img.shape
-        logger.info(f"Image loaded successfully. Dimensions: {width}x{height}")
+    buffer = np.frombuffer(image_bytes, dtype=np.uint8)
+    if buffer.size == 0:
+        return None
+    with vision_stage_seconds.time(stage="decode"):
+        return cv2.imdecode(buffer, cv2.IMREAD_GRAYSCALE)
+
+def analyze_image(img):
+    """
+    Analyze a grayscale comic panel image to detect figures, motion, and objects.
+    
+    Unlike analyze_panel, errors are raised to the caller.
+    
+    Args:
+        img (numpy.ndarray): Grayscale image
         
+    Returns:
+        dict: Dictionary containing analysis results (see analyze_panel)
+    """
+    # Get image dimensions for logging
+    height, width = img.shape
+    logger.info(f"Image loaded successfully. Dimensions: {width}x{height}")
+    
+    with vision_stage_seconds.time(stage="blur"):
         # Apply Gaussian blur to reduce noise
         img_blurred = cv2.GaussianBlur(img, (5, 5), 0)
-        
+    
+    with vision_stage_seconds.time(stage="edges"):
         # Edge detection using Canny
         # Adjusted thresholds for better edge detection in comics
         edges = cv2.Canny(img_blurred, 100, 200)
-        
+    
+    with vision_stage_seconds.time(stage="figures"):
         # Find contours for figure detection
         contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
         
@@ -63,21 +74,22 @@ def analyze_panel(image_path):
                 # Character contours typically have reasonable aspect ratios and solidity
                 if 0.2 < aspect_ratio < 5 and solidity > 0.1:
                     filtered_contours.append(c)
+    
+    # Count figures with a reasonable upper limit for comic panels
+    figures = len(filtered_contours)
+    
+    # Apply a sanity check - most comic panels have 1-5 characters
+    if figures > 5:
+        logger.warning(f"Detected unusually high figure count ({figures}), capping at 5")
+        figures = min(figures, 5)
+    
+    # If no figures detected, default to 1 (assume at least one character)
+    if figures == 0:
+        figures = 1
         
-        # Count figures with a reasonable upper limit for comic panels
-        figures = len(filtered_contours)
-        
-        # Apply a sanity check - most comic panels have 1-5 characters
-        if figures > 5:
-            logger.warning(f"Detected unusually high figure count ({figures}), capping at 5")
-            figures = min(figures, 5)
-        
-        # If no figures detected, default to 1 (assume at least one character)
-        if figures == 0:
-            figures = 1
-            
-        logger.info(f"Detected {figures} figures in the image")
-        
+    logger.info(f"Detected {figures} figures in the image")
+    
+    with vision_stage_seconds.time(stage="motion"):
         # Improved motion detection with adjusted threshold
         # Comic panels typically have high edge density even in static scenes
         edge_density = np.mean(edges) / 255.0  # Normalize to 0-1 range
@@ -89,9 +101,10 @@ def analyze_panel(image_path):
         # Combined criteria for action detection
         is_action = edge_density > 0.08 and edge_std_normalized > 0.2
         motion = "action" if is_action else "static"
-        
-        logger.info(f"Edge density: {edge_density:.4f}, Edge std normalized: {edge_std_normalized:.4f}, Motion: {motion}")
-        
+    
+    logger.info(f"Edge density: {edge_density:.4f}, Edge std normalized: {edge_std_normalized:.4f}, Motion: {motion}")
+    
+    with vision_stage_seconds.time(stage="objects"):
         # Improved object detection with more specific criteria for sparks
         # Sparks have very specific visual characteristics
         edge_max = np.max(edges)
@@ -106,16 +119,132 @@ def analyze_panel(image_path):
         # More specific criteria for sparks
         has_sparks = edge_max > 220 and edge_std > 60 and small_bright_regions >= 3
         objects = "sparks" if has_sparks else "none"
+    
+    logger.info(f"Edge max: {edge_max}, Edge std: {edge_std:.2f}, Small bright regions: {small_bright_regions}, Objects: {objects}")
+    
+    return {
+        "figures": figures,
+        "motion": motion,
+        "objects": objects
+    }
+
+def analyze_panel(image_path):
+    """
+    Analyze a comic panel image to detect figures, motion, and objects.
+    
+    Args:
+        image_path (str): Path to the image file
         
-        logger.info(f"Edge max: {edge_max}, Edge std: {edge_std:.2f}, Small bright regions: {small_bright_regions}, Objects: {objects}")
+    Returns:
+        dict: Dictionary containing analysis results:
+            - figures: Number of figures/characters detected
+            - motion: "action" or "static" based on edge density
+            - objects: "sparks" or "none" based on edge intensity
+    """
+    try:
+        # Load image in grayscale
+        logger.info(f"Loading image from {image_path}")
+        with vision_stage_seconds.time(stage="decode"):
+            img = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+        
+        # Check if image was loaded successfully
+        if img is None:
+            logger.error(f"Failed to load image from {image_path}")
+            # Return default values if image loading fails
+            return {"figures": 1, "motion": "static", "objects": "none"}
         
-        return {
-            "figures": figures,
-            "motion": motion,
-            "objects": objects
-        }
+        return analyze_image(img)
         
     except Exception as e:
         logger.error(f"Error analyzing image: {str(e)}")
         # Return default values in case of error
         return {"figures": 1, "motion": "static", "objects": "none"}
+
+def _content_spans(img, axis, std_threshold, min_gutter, min_span):
+    """
+    Find the spans of an image between uniform gutters along one axis.
+    
+    Args:
+        img (numpy.ndarray): Grayscale image
+        axis (int): 0 to split into horizontal bands, 1 to split into vertical strips
+        std_threshold (float): Rows/columns with a lower standard deviation are gutter
+        min_gutter (int): Shortest run of gutter that separates two spans
+        min_span (int): Shortest span kept; shorter ones are page furniture or noise
+        
+    Returns:
+        list: (start, end) pairs
+    """
+    # A gutter row/column is nearly one colour (white paper or a black border)
+    is_gutter = img.std(axis=1 - axis) < std_threshold
+    
+    spans = []
+    start = None
+    gap = 0
+    for index, gutter in enumerate(is_gutter):
+        if not gutter:
+            if start is None:
+                start = index
+            gap = 0
+        elif start is not None:
+            gap += 1
+            if gap >= min_gutter:
+                spans.append((start, index - gap + 1))
+                start = None
+                gap = 0
+    if start is not None:
+        spans.append((start, len(is_gutter) - gap))
+    
+    return [(s, e) for s, e in spans if e - s >= min_span]
+
+def split_page_into_panels(img, min_panel_fraction=0.15, std_threshold=8.0, max_depth=3):
+    """
+    Split a grayscale comic page into panel images in reading order.
+    
+    Uses recursive XY-cuts: the page is cut into horizontal bands at full-width
+    gutters, each band into panels at full-height gutters, and so on. Pages
+    without clear gutters come back as a single panel.
+    
+    Args:
+        img (numpy.ndarray): Grayscale page image
+        min_panel_fraction (float, optional): Smallest panel side as a fraction of the page side.
+            Defaults to 0.15.
+        std_threshold (float, optional): Gutter uniformity threshold. Defaults to 8.0.
+        max_depth (int, optional): Maximum number of nested cuts. Defaults to 3.
+        
+    Returns:
+        list: Panel images (views into img), top to bottom and left to right
+    """
+    height, width = img.shape
+    min_gutter = max(3, int(0.005 * min(height, width)))
+    min_span = (int(min_panel_fraction * height), int(min_panel_fraction * width))
+    
+    def cut(x, y, w, h, axis, depth):
+        region = img[y:y + h, x:x + w]
+        spans = _content_spans(region, axis, std_threshold, min_gutter, min_span[axis])
+        if len(spans) <= 1:
+            if depth == 0:
+                # Cutting along this axis found nothing; try the other one first
+                spans_other = _content_spans(region, 1 - axis, std_threshold, min_gutter, min_span[1 - axis])
+                if len(spans_other) > 1:
+                    return cut(x, y, w, h, 1 - axis, depth)
+            return [(x, y, w, h)] if spans else []
+        
+        boxes = []
+        for start, end in spans:
+            if axis == 0:
+                box = (x, y + start, w, end - start)
+            else:
+                box = (x + start, y, end - start, h)
+            if depth + 1 < max_depth:
+                boxes.extend(cut(*box, 1 - axis, depth + 1) or [box])
+            else:
+                boxes.append(box)
+        return boxes
+    
+    with vision_stage_seconds.time(stage="split"):
+        boxes = cut(0, 0, width, height, 0, 0)
+    if len(boxes) <= 1:
+        return [img]
+    
+    logger.info(f"Split page into {len(boxes)} panels")
+    return [img[y:y + h, x:x + w] for x, y, w, h in boxes]
@@ -0,0 +1,96 @@
+"""
+Concurrency load test for the API server's production serving mode.
+
+Starts the stand-in provider server with a fixed provider latency, runs the
+API under gunicorn with gunicorn_api.conf.py, and fires many /api/describe
+requests at once. With gevent workers, requests waiting on providers do not
+hold an OS thread, so a single process completes N concurrent requests in
+roughly one provider latency. Compare with --worker-class gthread.
+
+Usage:
+    python benchmark_concurrency.py --requests 500 --latency 2
+    python benchmark_concurrency.py --requests 500 --latency 2 --worker-class gthread
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmark_providers import percentile
+from stub_provider_server import StubConfig, start_stub_server
+
+def wait_for_health(url, timeout=30):
+    """Wait until the API answers its health check."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"{url}/health", timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("API server did not start")
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description="Load test concurrent describe requests against gunicorn")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--latency", type=float, default=2.0, help="Provider latency in seconds")
+    parser.add_argument("--worker-class", default="gevent")
+    parser.add_argument("--port", type=int, default=8011)
+    args = parser.parse_args()
+
+    stub = start_stub_server(StubConfig(f"fixed:{args.latency}"))
+
+    env = dict(os.environ)
+    for provider, url in stub.base_urls().items():
+        env[f"{provider.upper()}_BASE_URL"] = url
+    env.update({
+        "OPENAI_API_KEY": "stub-key",
+        "ANTHROPIC_API_KEY": "",
+        "API_PORT": str(args.port),
+        "API_WORKER_CLASS": args.worker_class,
+        "USE_MCP": "false",
+        "HF_HUB_OFFLINE": "1"
+    })
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn_api.conf.py", "--access-logfile", "/dev/null",
+         "app.api_server:app"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+    api_url = f"http://127.0.0.1:{args.port}/api"
+    try:
+        wait_for_health(api_url)
+        body = {"image_data": {"figures": 2, "motion": "action", "objects": "none"}, "panel_num": 1}
+
+        def one_request(i):
+            start = time.perf_counter()
+            response = requests.post(f"{api_url}/describe", json=body, timeout=300)
+            return time.perf_counter() - start, response.status_code
+
+        print(f"{args.worker_class}: {args.requests} concurrent describe requests, provider latency {args.latency}s")
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.requests) as executor:
+            results = list(executor.map(one_request, range(args.requests)))
+        elapsed = time.perf_counter() - start
+
+        latencies = sorted(latency for latency, _ in results)
+        failures = sum(1 for _, status in results if status != 200)
+        print(f"Wall time: {elapsed:.2f}s, throughput {args.requests / elapsed:.1f} requests/s, {failures} failed")
+        print(f"Latency p50={percentile(latencies, 0.50):.2f}s p95={percentile(latencies, 0.95):.2f}s "
+              f"p99={percentile(latencies, 0.99):.2f}s")
+        print(f"Average requests in flight: {sum(latencies) / elapsed:.0f}")
+    finally:
+        server.terminate()
+        server.wait()
+        stub.shutdown()
+        stub.server_close()
+
+if __name__ == '__main__':
+    main()
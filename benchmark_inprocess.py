@@ -0,0 +1,104 @@
+"""
+Web app pipeline mode benchmark.
+
+Runs the web app and the API server in this process, with every provider
+pointed at the stand-in server, and uploads the same panel through the web
+app with PIPELINE_MODE=http (one /api/process call per upload) and with
+PIPELINE_MODE=inprocess (the pipeline called directly). The difference in
+latency is what the HTTP hop between the two services costs.
+
+Usage:
+    python benchmark_inprocess.py --requests 200 --concurrency 8 --latency 0.05
+"""
+
+import argparse
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+import requests
+from werkzeug.serving import make_server
+
+from benchmark_providers import percentile
+from stub_provider_server import StubConfig, start_stub_server
+
+def make_panel(side=800, seed=0):
+    """Create a PNG panel with a few figure-like shapes to analyze."""
+    rng = np.random.default_rng(seed)
+    img = np.full((side, side), 255, dtype=np.uint8)
+    for _ in range(6):
+        center = tuple(int(v) for v in rng.integers(side // 8, side - side // 8, size=2))
+        cv2.circle(img, center, int(rng.integers(side // 20, side // 8)), 0, 3)
+    ok, encoded = cv2.imencode('.png', img)
+    return encoded.tobytes()
+
+def serve(app):
+    """Serve a WSGI app on a free port on a background thread."""
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def run_mode(url, panel, total, concurrency):
+    """Upload the panel total times and return the sorted latencies and failures."""
+    session = requests.Session()
+
+    def one_upload(i):
+        start = time.perf_counter()
+        response = session.post(url, files={"file": ("panel.png", panel, "image/png")}, timeout=120)
+        return time.perf_counter() - start, response.status_code
+
+    # Warm up once so imports and caches are not measured
+    one_upload(0)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(one_upload, range(total)))
+
+    latencies = sorted(latency for latency, _ in results)
+    failures = sum(1 for _, status in results if status != 200)
+    return latencies, failures
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description="Compare the web app's http and inprocess pipeline modes")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.0, help="Provider latency in seconds")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+
+    stub = start_stub_server(StubConfig(f"fixed:{args.latency}"))
+    for provider, url in stub.base_urls().items():
+        os.environ[f"{provider.upper()}_BASE_URL"] = url
+    os.environ.update({"OPENAI_API_KEY": "stub-key", "ANTHROPIC_API_KEY": "", "USE_MCP": "false"})
+
+    from app import app as web
+    from app.api_server import app as api_app
+    api_server = serve(api_app)
+    web_server = serve(web.app)
+    web.API_BASE_URL = f"http://127.0.0.1:{api_server.server_port}/api"
+    web_url = f"http://127.0.0.1:{web_server.server_port}/"
+
+    panel = make_panel()
+    print(f"{args.requests} uploads, concurrency {args.concurrency}, provider latency {args.latency}s")
+    print(f"{'mode':<12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}{'failed':>8}")
+
+    try:
+        for mode in ("http", "inprocess"):
+            web.PIPELINE_MODE = mode
+            start = time.perf_counter()
+            latencies, failures = run_mode(web_url, panel, args.requests, args.concurrency)
+            elapsed = time.perf_counter() - start
+            print(f"{mode:<12}{percentile(latencies, 0.50) * 1000:>10.1f}{percentile(latencies, 0.95) * 1000:>10.1f}"
+                  f"{percentile(latencies, 0.99) * 1000:>10.1f}{args.requests / elapsed:>10.1f}{failures:>8}")
+    finally:
+        web_server.shutdown()
+        api_server.shutdown()
+        stub.shutdown()
+        stub.server_close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Offline load test for the provider fallback chain.
+
+Starts the stand-in provider server with the given latency and failure
+profile, points every provider at it through <PROVIDER>_BASE_URL, and fires
+concurrent description requests through the MCP server's MultiProviderAPI.
+Reports throughput, latency percentiles and how the stand-in answered each
+provider, so fallback and throughput behaviour can be compared between runs.
+
+Usage:
+    python benchmark_providers.py --requests 500 --concurrency 32 \
+        --latency lognormal:-1.5,0.5 --error-rate 0.05 --rate-limit-rate 0.05
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from stub_provider_server import StubConfig, start_stub_server
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a sorted list."""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, int(round(fraction * len(values))) - 1))
+    return values[index]
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description="Load test the provider chain against the stand-in server")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--providers", default="openai,anthropic", help="Providers given a key, in priority order")
+    parser.add_argument("--latency", default="lognormal:-2.0,0.5")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--timeout-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=0.5)
+    parser.add_argument("--hang-seconds", type=float, default=12.0)
+    parser.add_argument("--rpm", type=float, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    # Per-request provider errors are expected here; keep the report readable
+    logging.disable(logging.CRITICAL)
+
+    config = StubConfig(args.latency, args.error_rate, args.rate_limit_rate, args.timeout_rate,
+                        args.retry_after, args.hang_seconds, args.rpm)
+    server = start_stub_server(config, seed=args.seed)
+    for provider, url in server.base_urls().items():
+        os.environ[f"{provider.upper()}_BASE_URL"] = url
+
+    # Imported after the environment is set so the client picks up the stand-in URLs
+    from mcp_server.utils.api_utils import MultiProviderAPI
+
+    client = MultiProviderAPI()
+    enabled = args.providers.split(",")
+    client.keys = {provider: ("stub-key" if provider in enabled else "") for provider in client.keys}
+    client.priority = enabled
+
+    image_analysis = {"figures": [{}, {}], "motion": {"type": "action"}, "objects": {"type": "none"}}
+
+    def one_request(i):
+        start = time.perf_counter()
+        client.generate_description(image_analysis, panel_num=i % 9 + 1)
+        return time.perf_counter() - start
+
+    print(f"Sending {args.requests} requests with concurrency {args.concurrency} to {server.url}")
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        latencies = sorted(executor.map(one_request, range(args.requests)))
+    elapsed = time.perf_counter() - start
+
+    print(f"Throughput: {args.requests / elapsed:.1f} requests/s ({elapsed:.2f}s)")
+    print(f"Latency p50={percentile(latencies, 0.50) * 1000:.0f}ms "
+          f"p95={percentile(latencies, 0.95) * 1000:.0f}ms "
+          f"p99={percentile(latencies, 0.99) * 1000:.0f}ms")
+    print("Stand-in responses by provider:")
+    print(json.dumps(server.stats, indent=2))
+
+    server.shutdown()
+    server.server_close()
+
+if __name__ == '__main__':
+    main()
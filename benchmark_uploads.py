@@ -0,0 +1,87 @@
+"""
+Upload format benchmark for /api/analyze.
+
+Runs the API server in-process and posts the same large scan as base64 JSON,
+as a multipart upload and as a raw image/png body. Request bodies are built
+before measuring, so the reported peak memory (tracemalloc) is what the
+server allocates to receive and decode each format.
+
+Usage:
+    python benchmark_uploads.py --size-mb 10 --repeat 5
+"""
+
+import argparse
+import base64
+import json
+import logging
+import statistics
+import threading
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+import requests
+from werkzeug.serving import make_server
+
+def make_scan(size_mb, seed=0):
+    """Create a PNG of about size_mb megabytes (noise does not compress)."""
+    side = int((size_mb * 1024 * 1024) ** 0.5)
+    rng = np.random.default_rng(seed)
+    img = rng.integers(0, 256, size=(side, side), dtype=np.uint8)
+    ok, encoded = cv2.imencode('.png', img)
+    return encoded.tobytes()
+
+def build_requests(url, scan):
+    """Prepare one request per upload format."""
+    session = requests.Session()
+    formats = {
+        "base64 json": requests.Request(
+            "POST", url, data=json.dumps({"image_data": base64.b64encode(scan).decode(), "is_path": False}),
+            headers={"Content-Type": "application/json"}),
+        "multipart": requests.Request("POST", url, files={"file": ("scan.png", scan, "image/png")}),
+        "raw image/png": requests.Request("POST", url, data=scan, headers={"Content-Type": "image/png"})
+    }
+    return session, {name: session.prepare_request(req) for name, req in formats.items()}
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description="Compare /api/analyze upload formats")
+    parser.add_argument("--size-mb", type=float, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+
+    from app.api_server import app
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/api/analyze"
+
+    scan = make_scan(args.size_mb)
+    session, prepared = build_requests(url, scan)
+    print(f"Scan: {len(scan) / 1024 / 1024:.1f} MB PNG, {args.repeat} requests per format")
+    print(f"{'format':<16}{'body MB':>10}{'median ms':>12}{'peak MB':>10}")
+
+    for name, req in prepared.items():
+        # Warm up once so imports and caches are not measured
+        session.send(req).raise_for_status()
+
+        latencies = []
+        peaks = []
+        for _ in range(args.repeat):
+            tracemalloc.start()
+            start = time.perf_counter()
+            response = session.send(req)
+            latencies.append((time.perf_counter() - start) * 1000)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            response.raise_for_status()
+
+        print(f"{name:<16}{len(req.body) / 1024 / 1024:>10.1f}{statistics.median(latencies):>12.0f}"
+              f"{max(peaks) / 1024 / 1024:>10.1f}")
+
+    server.shutdown()
+
+if __name__ == '__main__':
+    main()
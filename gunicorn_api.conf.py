@@ -0,0 +1,35 @@
+"""
+Gunicorn configuration for the API server.
+
+Uses gevent workers by default: each in-flight request is a greenlet, so
+requests waiting on LLM providers cost no OS thread, and one process can
+hold hundreds of them. CPU-bound analysis runs on native threads
+(app/concurrency.py). Keep a single worker per container unless jobs are
+moved out of process: progressive describe and /api/jobs results live in
+the memory of the worker that accepted them.
+
+Usage:
+    gunicorn -c gunicorn_api.conf.py app.api_server:app
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.environ.get('API_PORT', 8001)}"
+
+# gevent (default), or gthread / sync for debugging
+worker_class = os.environ.get('API_WORKER_CLASS', 'gevent')
+workers = int(os.environ.get('API_WORKERS', 1))
+
+# Concurrent requests per gevent worker
+worker_connections = int(os.environ.get('API_WORKER_CONNECTIONS', 1000))
+
+# Threads per gthread worker
+threads = int(os.environ.get('API_THREADS', 8))
+
+# Long enough for long-polls and the describe budget
+timeout = int(os.environ.get('API_TIMEOUT_SECONDS', 120))
+graceful_timeout = 30
+keepalive = 5
+backlog = 2048
+
+accesslog = '-'
@@ -2,6 +2,7 @@
 import os
 import sys
 import logging
+import time
 from mcp import Server, StdioServerTransport
 from mcp.types import (
     ListToolsRequestSchema,
@@ -16,8 +17,11 @@ from .tools import (
     generate_description_tool,
     analyze_panel_tool,
     verify_description_tool,
-    process_feedback_tool
+    process_feedback_tool,
+    get_metrics_tool
 )
+from .utils.metrics import metrics_registry
+from .utils.tracing import TRACE_ARGUMENT, start_trace
 
 # Configure logging
 logging.basicConfig(
@@ -27,6 +31,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger("comic-mcp-server")
 
+tool_seconds = metrics_registry.histogram(
+    "mcp_tool_seconds", "Time to run each MCP tool call", ("tool", "status"))
+
 class ComicPanelMcpServer:
     """MCP server for comic panel analysis and description generation."""
     
@@ -155,6 +162,10 @@ class ComicPanelMcpServer:
                             "relationships": {
                                 "type": "array",
                                 "description": "Relationships between figures"
+                            },
+                            "budget_seconds": {
+                                "type": "number",
+                                "description": "Time left in the caller's request budget; providers are skipped once it runs out"
                             }
                         },
                         "required": ["figures", "scene_type", "relationships"]
@@ -227,6 +238,20 @@ class ComicPanelMcpServer:
                         },
                         "required": ["rating", "original_description", "edited_description"]
                     }
+                },
+                {
+                    "name": "get_metrics",
+                    "description": "Get the server's latency, provider and cache metrics",
+                    "inputSchema": {
+                        "type": "object",
+                        "properties": {
+                            "format": {
+                                "type": "string",
+                                "description": "Output format: \"prometheus\" text or \"json\"",
+                                "default": "prometheus"
+                            }
+                        }
+                    }
                 }
             ]
         }
@@ -234,10 +259,24 @@ class ComicPanelMcpServer:
     async def _handle_call_tool(self, request):
         """Handle request to call a tool."""
         tool_name = request.params.name
-        arguments = request.params.arguments
+        # The caller's trace context rides along as an extra argument
+        arguments = dict(request.params.arguments or {})
+        traceparent = arguments.pop(TRACE_ARGUMENT, None)
         
         logger.info(f"Tool call: {tool_name}")
         
+        start = time.perf_counter()
+        status = "error"
+        try:
+            with start_trace(f"mcp {tool_name}", traceparent):
+                result = await self._call_tool(tool_name, arguments)
+            status = "ok"
+            return result
+        finally:
+            tool_seconds.observe(time.perf_counter() - start, tool=tool_name, status=status)
+    
+    async def _call_tool(self, tool_name, arguments):
+        """Dispatch a tool call to its implementation."""
         try:
             if tool_name == "detect_objects":
                 return await detect_objects_tool(arguments, self.openai_key)
@@ -253,6 +292,8 @@ class ComicPanelMcpServer:
                 return await verify_description_tool(arguments, self.openai_key)
             elif tool_name == "process_feedback":
                 return await process_feedback_tool(arguments, self.openai_key)
+            elif tool_name == "get_metrics":
+                return await get_metrics_tool(arguments, self.openai_key)
             else:
                 raise McpError(ErrorCode.MethodNotFound, f"Unknown tool: {tool_name}")
         except Exception as e:
@@ -7,6 +7,7 @@ from .generate_description import generate_description_tool
 from .analyze_panel import analyze_panel_tool
 from .verify_description import verify_description_tool
 from .process_feedback import process_feedback_tool
+from .get_metrics import get_metrics_tool
 
 __all__ = [
     'detect_objects_tool',
@@ -15,5 +16,6 @@ __all__ = [
     'generate_description_tool',
     'analyze_panel_tool',
     'verify_description_tool',
-    'process_feedback_tool'
+    'process_feedback_tool',
+    'get_metrics_tool'
 ]
@@ -3,10 +3,10 @@
 import json
 import logging
 from mcp.types import ErrorCode, McpError
-from .detect_objects import detect_objects_tool
-from .classify_scene import classify_scene_tool
-from .analyze_relationships import analyze_relationships_tool
-from .generate_description import generate_description_tool
+from ..utils.api_utils import api_client
+from ..utils.image_utils import load_image
+from ..utils.offload import run_cpu
+from ..utils.panel_analysis import analyze_panel
 
 logger = logging.getLogger("comic-mcp-server")
 
@@ -32,53 +32,12 @@ async def analyze_panel_tool(arguments, openai_key=None):
         raise McpError(ErrorCode.InvalidParams, "Missing image_data parameter")
     
     try:
-        # Step 1: Detect objects
-        objects_result = await detect_objects_tool({
-            "image_data": image_data,
-            "is_path": is_path
-        }, openai_key)
-        objects_json = json.loads(objects_result["content"][0]["text"])
-        figures = objects_json.get("figures", [])
+        if openai_key and not api_client.keys["openai"]:
+            api_client.keys["openai"] = openai_key
         
-        # Step 2: Classify scene
-        scene_result = await classify_scene_tool({
-            "image_data": image_data,
-            "is_path": is_path
-        }, openai_key)
-        scene_json = json.loads(scene_result["content"][0]["text"])
-        scene_type = scene_json.get("scene_type", "unknown")
-        scene_attributes = scene_json.get("attributes", [])
-        
-        # Step 3: Analyze relationships
-        relationships_result = await analyze_relationships_tool({
-            "image_data": image_data,
-            "figures": figures,
-            "is_path": is_path
-        }, openai_key)
-        relationships_json = json.loads(relationships_result["content"][0]["text"])
-        relationships = relationships_json.get("relationships", [])
-        
-        # Step 4: Generate description
-        description_result = await generate_description_tool({
-            "panel_num": panel_num,
-            "figures": figures,
-            "scene_type": scene_type,
-            "attributes": scene_attributes,
-            "relationships": relationships
-        }, openai_key)
-        description = description_result["content"][0]["text"]
-        
-        # Compile complete analysis
-        analysis = {
-            "panel_num": panel_num,
-            "figures": figures,
-            "scene": {
-                "type": scene_type,
-                "attributes": scene_attributes
-            },
-            "relationships": relationships,
-            "description": description
-        }
+        # Decode once and pass the image and native results between the stages
+        img = await run_cpu(load_image, image_data, is_path)
+        analysis = await analyze_panel(img, panel_num)
         
         return {
             "content": [
@@ -3,7 +3,9 @@
 import json
 import logging
 from mcp.types import ErrorCode, McpError
-from ..utils.image_utils import load_image, detect_motion
+from ..utils.image_utils import load_image
+from ..utils.offload import run_cpu
+from ..utils.panel_analysis import classify_scene
 
 logger = logging.getLogger("comic-mcp-server")
 
@@ -29,25 +31,10 @@ async def classify_scene_tool(arguments, openai_key=None):
     
     try:
         # Load the image
-        img = load_image(image_data, is_path)
+        img = await run_cpu(load_image, image_data, is_path)
         
-        # Detect motion
-        motion = detect_motion(img)
-        
-        # Determine scene attributes based on motion
-        scene_attributes = []
-        
-        if motion["type"] == "action":
-            scene_attributes.append("dynamic")
-        else:
-            scene_attributes.append("calm")
-        
-        # Compile scene information
-        scene_info = {
-            "scene_type": motion["type"],
-            "attributes": scene_attributes,
-            "motion": motion
-        }
+        # Classify the scene from its motion
+        scene_info = await run_cpu(classify_scene, img)
         
         return {
             "content": [
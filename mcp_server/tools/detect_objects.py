@@ -3,7 +3,9 @@
 import json
 import logging
 from mcp.types import ErrorCode, McpError
-from ..utils.image_utils import load_image, detect_figures, detect_objects
+from ..utils.image_utils import load_image
+from ..utils.offload import run_cpu
+from ..utils.panel_analysis import detect_objects
 
 logger = logging.getLogger("comic-mcp-server")
 
@@ -29,22 +31,10 @@ async def detect_objects_tool(arguments, openai_key=None):
     
     try:
         # Load the image
-        img = load_image(image_data, is_path)
-        height, width = img.shape[:2]
+        img = await run_cpu(load_image, image_data, is_path)
         
-        # Detect figures (characters)
-        figures = detect_figures(img)
-        
-        # Detect special objects (like sparks)
-        objects_info = detect_objects(img)
-        
-        # Compile results
-        result = {
-            "figures": figures,
-            "objects": objects_info,
-            "count": len(figures),
-            "image_dimensions": [width, height]
-        }
+        # Detect figures (characters) and special objects (like sparks)
+        result = await run_cpu(detect_objects, img)
         
         return {
             "content": [
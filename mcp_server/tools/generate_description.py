@@ -3,6 +3,9 @@
 import logging
 from mcp.types import ErrorCode, McpError
 from ..utils.api_utils import api_client
+from ..utils.offload import run_io
+from ..utils.panel_analysis import describe
+from ..utils.provider_utils import Deadline
 
 logger = logging.getLogger("comic-mcp-server")
 
@@ -23,26 +26,22 @@ async def generate_description_tool(arguments, openai_key=None):
     panel_num = arguments.get("panel_num", 1)
     figures = arguments.get("figures", [])
     scene_type = arguments.get("scene_type", "unknown")
-    scene_attributes = arguments.get("attributes", [])
     relationships = arguments.get("relationships", [])
+    budget_seconds = arguments.get("budget_seconds")
     
     if not figures:
         raise McpError(ErrorCode.InvalidParams, "Missing figures parameter")
     
     try:
-        # Prepare image analysis data
-        image_analysis = {
-            "figures": figures,
-            "motion": {"type": scene_type},
-            "objects": {"type": "none"},  # Default
-            "relationships": relationships
-        }
-        
         # Generate description using the API client
         if openai_key and not api_client.keys["openai"]:
             api_client.keys["openai"] = openai_key
         
-        description = api_client.generate_description(image_analysis, panel_num)
+        # Honor the caller's remaining time budget, if it sent one
+        deadline = Deadline(budget_seconds) if budget_seconds is not None else None
+        
+        # The provider chain blocks on the network; keep it off the event loop
+        description = await run_io(describe, panel_num, figures, scene_type, relationships, deadline)
         
         return {
             "content": [
@@ -0,0 +1,41 @@
+"""Metrics tool for the Comic Panel MCP Server."""
+
+import json
+import logging
+from mcp.types import ErrorCode, McpError
+from ..utils.metrics import metrics_registry
+
+logger = logging.getLogger("comic-mcp-server")
+
+async def get_metrics_tool(arguments, openai_key=None):
+    """
+    Get the server's metrics, e.g. tool latency and provider attempts.
+    
+    Args:
+        arguments (dict): Tool arguments
+        openai_key (str, optional): OpenAI API key
+        
+    Returns:
+        dict: Tool response with the metrics in the Prometheus text format,
+            or as JSON when format is "json"
+        
+    Raises:
+        McpError: If an error occurs
+    """
+    try:
+        if arguments.get("format") == "json":
+            text = json.dumps(metrics_registry.snapshot())
+        else:
+            text = metrics_registry.to_prometheus()
+        
+        return {
+            "content": [
+                {
+                    "type": "text",
+                    "text": text
+                }
+            ]
+        }
+    except Exception as e:
+        logger.error(f"Error in get_metrics_tool: {str(e)}")
+        raise McpError(ErrorCode.InternalError, f"Error reading metrics: {str(e)}")
@@ -1,10 +1,11 @@
 """Feedback processing tool for the Comic Panel MCP Server."""
 
-import os
 import json
 import logging
 import time
 from mcp.types import ErrorCode, McpError
+from ..utils.feedback_store import get_feedback_store
+from ..utils.offload import run_io
 
 logger = logging.getLogger("comic-mcp-server")
 
@@ -32,12 +33,6 @@ async def process_feedback_tool(arguments, openai_key=None):
         raise McpError(ErrorCode.InvalidParams, "Missing required parameters")
     
     try:
-        # Store the feedback
-        feedback_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'feedback')
-        os.makedirs(feedback_dir, exist_ok=True)
-        
-        feedback_file = os.path.join(feedback_dir, f"feedback_{int(time.time())}.json")
-        
         feedback_data = {
             "rating": rating,
             "issue_type": issue_type,
@@ -47,8 +42,10 @@ async def process_feedback_tool(arguments, openai_key=None):
             "timestamp": time.time()
         }
         
-        with open(feedback_file, 'w') as f:
-            json.dump(feedback_data, f, indent=2)
+        # Queue the feedback for the store; it is written in the background.
+        # Opening the store on first use touches the database, so that runs off the loop
+        store = await run_io(get_feedback_store)
+        store.submit(feedback_data, source="mcp")
         
         # Analyze the feedback to learn from it
         analysis = analyze_feedback(feedback_data)
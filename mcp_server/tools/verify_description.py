@@ -1,8 +1,8 @@
 """Description verification tool for the Comic Panel MCP Server."""
 
 import logging
-import re
 from mcp.types import ErrorCode, McpError
+from ..utils.text_utils import remove_speculative_language, collapse_whitespace
 
 logger = logging.getLogger("comic-mcp-server")
 
@@ -52,47 +52,10 @@ def verify_description(description):
     Returns:
         str: Verified description
     """
-    # List of speculative phrases to remove or replace
-    speculative_phrases = [
-        # Phrases that suggest dialogue content
-        (r'saying "[^"]*"', "with a speech bubble"),
-        (r'says "[^"]*"', "has a speech bubble"),
-        (r'reads "[^"]*"', "contains text"),
-        (r'exclaims "[^"]*"', "has a speech bubble"),
-        (r'thinking "[^"]*"', "is present"),
-        
-        # Phrases that suggest emotions or thoughts
-        (r'appears to be (feeling|thinking|considering)', "is"),
-        (r'seems to be (happy|sad|angry|excited|nervous|worried|concerned|thinking)', "is"),
-        (r'looks (happy|sad|angry|excited|nervous|worried|concerned)', "is visible"),
-        
-        # Phrases that suggest narrative context
-        (r'is about to', "is"),
-        (r'is going to', "is"),
-        (r'is trying to', "is"),
-        (r'is planning to', "is"),
-        (r'has just', "is"),
-        (r'had just', "is"),
-        
-        # Phrases that suggest interpretation
-        (r'probably', ""),
-        (r'possibly', ""),
-        (r'perhaps', ""),
-        (r'maybe', ""),
-        (r'might be', "is"),
-        (r'could be', "is"),
-        (r'would be', "is"),
-        (r'appears to be', "is"),
-        (r'seems to be', "is"),
-        (r'looks like', "shows"),
-    ]
-    
     # Apply replacements
-    verified_description = description
-    for pattern, replacement in speculative_phrases:
-        verified_description = re.sub(pattern, replacement, verified_description, flags=re.IGNORECASE)
+    verified_description = remove_speculative_language(description)
     
     # Clean up any double spaces
-    verified_description = re.sub(r'\s+', ' ', verified_description)
+    verified_description = collapse_whitespace(verified_description)
     
     return verified_description
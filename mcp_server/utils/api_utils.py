@@ -3,7 +3,7 @@
 import os
 import json
 import logging
-import requests
+from .provider_utils import SYSTEM_PROMPT, build_chat_payload, build_anthropic_payload, prompt_cache_stats, post_with_retry, provider_url, fallback_depth
 
 logger = logging.getLogger("comic-mcp-server")
 
@@ -20,9 +20,15 @@ class MultiProviderAPI:
             "deepseek": os.environ.get("DEEPSEEK_API_KEY", "")
         }
         
+        # API endpoints (base URLs can be overridden with <PROVIDER>_BASE_URL)
+        self.urls = {provider: provider_url(provider) for provider in self.keys}
+        
         # Default priority order (can be configured)
         self.priority = ["openai", "anthropic", "grok", "deepseek"]
         
+        # Smallest remaining budget worth starting another provider attempt with
+        self.min_attempt_seconds = float(os.environ.get("MIN_PROVIDER_ATTEMPT_SECONDS", 1.0))
+        
         # Log available APIs
         apis = [api for api, key in self.keys.items() if key]
         if apis:
@@ -30,7 +36,7 @@ class MultiProviderAPI:
         else:
             logger.warning("No API keys provided")
     
-    def call_openai(self, system_prompt, user_prompt, model="gpt-3.5-turbo", max_tokens=150, temperature=0.5):
+    def call_openai(self, system_prompt, user_prompt, model="gpt-3.5-turbo", max_tokens=150, temperature=0.5, deadline=None):
         """
         Call the OpenAI API.
         
@@ -40,6 +46,7 @@ class MultiProviderAPI:
             model (str): Model to use
             max_tokens (int): Maximum number of tokens to generate
             temperature (float): Temperature for sampling
+            deadline (Deadline, optional): Request budget that caps the timeout
             
         Returns:
             str: Generated text
@@ -50,34 +57,27 @@ class MultiProviderAPI:
         if not self.keys["openai"]:
             raise ValueError("OpenAI API key not provided")
         
-        url = "https://api.openai.com/v1/chat/completions"
+        url = self.urls["openai"]
         headers = {
             "Authorization": f"Bearer {self.keys['openai']}",
             "Content-Type": "application/json"
         }
         
-        payload = {
-            "model": model,
-            "messages": [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            "max_tokens": max_tokens,
-            "temperature": temperature
-        }
+        payload = build_chat_payload(user_prompt, system_prompt, model=model, max_tokens=max_tokens, temperature=temperature)
         
         logger.info(f"Calling OpenAI API with model {model}")
-        response = requests.post(url, json=payload, headers=headers, timeout=10)
+        response = post_with_retry("openai", url, payload, headers, timeout=10, deadline=deadline)
         
         if response.status_code == 200:
             result = response.json()
+            prompt_cache_stats.record("openai", result)
             return result["choices"][0]["message"]["content"].strip()
         else:
             error_msg = f"OpenAI API error: {response.status_code} - {response.text}"
             logger.error(error_msg)
             raise Exception(error_msg)
     
-    def call_anthropic(self, prompt, model="claude-instant-1.2", max_tokens=150, temperature=0.7):
+    def call_anthropic(self, prompt, model="claude-instant-1.2", max_tokens=150, temperature=0.7, system_prompt=SYSTEM_PROMPT, deadline=None):
         """
         Call the Anthropic API.
         
@@ -86,6 +86,8 @@ class MultiProviderAPI:
             model (str): Model to use
             max_tokens (int): Maximum number of tokens to generate
             temperature (float): Temperature for sampling
+            system_prompt (str, optional): Static system prompt, sent as a cacheable block
+            deadline (Deadline, optional): Request budget that caps the timeout
             
         Returns:
             str: Generated text
@@ -96,34 +98,28 @@ class MultiProviderAPI:
         if not self.keys["anthropic"]:
             raise ValueError("Anthropic API key not provided")
         
-        url = "https://api.anthropic.com/v1/messages"
+        url = self.urls["anthropic"]
         headers = {
             "x-api-key": self.keys["anthropic"],
             "anthropic-version": "2023-06-01",
             "Content-Type": "application/json"
         }
         
-        payload = {
-            "model": model,
-            "max_tokens": max_tokens,
-            "messages": [
-                {"role": "user", "content": prompt}
-            ],
-            "temperature": temperature
-        }
+        payload = build_anthropic_payload(prompt, system_prompt, model=model, max_tokens=max_tokens, temperature=temperature)
         
         logger.info(f"Calling Anthropic API with model {model}")
-        response = requests.post(url, json=payload, headers=headers, timeout=10)
+        response = post_with_retry("anthropic", url, payload, headers, timeout=10, deadline=deadline)
         
         if response.status_code == 200:
             result = response.json()
+            prompt_cache_stats.record("anthropic", result)
             return result["content"][0]["text"].strip()
         else:
             error_msg = f"Anthropic API error: {response.status_code} - {response.text}"
             logger.error(error_msg)
             raise Exception(error_msg)
     
-    def call_grok(self, prompt, max_tokens=150, temperature=0.7):
+    def call_grok(self, prompt, max_tokens=150, temperature=0.7, system_prompt=None, deadline=None):
         """
         Call the Grok API.
         
@@ -131,6 +127,8 @@ class MultiProviderAPI:
             prompt (str): Prompt
             max_tokens (int): Maximum number of tokens to generate
             temperature (float): Temperature for sampling
+            system_prompt (str, optional): Static system prompt; none is sent by default
+            deadline (Deadline, optional): Request budget that caps the timeout
             
         Returns:
             str: Generated text
@@ -141,33 +139,27 @@ class MultiProviderAPI:
         if not self.keys["grok"]:
             raise ValueError("Grok API key not provided")
         
-        # Note: This is a placeholder for the Grok API endpoint
-        url = "https://api.xai.com/v1/chat/completions"
+        url = self.urls["grok"]
         headers = {
             "Authorization": f"Bearer {self.keys['grok']}",
             "Content-Type": "application/json"
         }
         
-        payload = {
-            "messages": [
-                {"role": "user", "content": prompt}
-            ],
-            "max_tokens": max_tokens,
-            "temperature": temperature
-        }
+        payload = build_chat_payload(prompt, system_prompt, max_tokens=max_tokens, temperature=temperature)
         
         logger.info("Calling Grok API")
-        response = requests.post(url, json=payload, headers=headers, timeout=10)
+        response = post_with_retry("grok", url, payload, headers, timeout=10, deadline=deadline)
         
         if response.status_code == 200:
             result = response.json()
+            prompt_cache_stats.record("grok", result)
             return result["choices"][0]["message"]["content"].strip()
         else:
             error_msg = f"Grok API error: {response.status_code} - {response.text}"
             logger.error(error_msg)
             raise Exception(error_msg)
     
-    def call_deepseek(self, prompt, model="deepseek-chat", max_tokens=150, temperature=0.7):
+    def call_deepseek(self, prompt, model="deepseek-chat", max_tokens=150, temperature=0.7, system_prompt=None, deadline=None):
         """
         Call the DeepSeek API.
         
@@ -176,6 +168,8 @@ class MultiProviderAPI:
             model (str): Model to use
             max_tokens (int): Maximum number of tokens to generate
             temperature (float): Temperature for sampling
+            system_prompt (str, optional): Static system prompt; none is sent by default
+            deadline (Deadline, optional): Request budget that caps the timeout
             
         Returns:
             str: Generated text
@@ -186,40 +180,35 @@ class MultiProviderAPI:
         if not self.keys["deepseek"]:
             raise ValueError("DeepSeek API key not provided")
         
-        # Note: This is a placeholder for the DeepSeek API endpoint
-        url = "https://api.deepseek.com/v1/chat/completions"
+        url = self.urls["deepseek"]
         headers = {
             "Authorization": f"Bearer {self.keys['deepseek']}",
             "Content-Type": "application/json"
         }
         
-        payload = {
-            "model": model,
-            "messages": [
-                {"role": "user", "content": prompt}
-            ],
-            "max_tokens": max_tokens,
-            "temperature": temperature
-        }
+        payload = build_chat_payload(prompt, system_prompt, model=model, max_tokens=max_tokens, temperature=temperature)
         
         logger.info(f"Calling DeepSeek API with model {model}")
-        response = requests.post(url, json=payload, headers=headers, timeout=10)
+        response = post_with_retry("deepseek", url, payload, headers, timeout=10, deadline=deadline)
         
         if response.status_code == 200:
             result = response.json()
+            prompt_cache_stats.record("deepseek", result)
             return result["choices"][0]["message"]["content"].strip()
         else:
             error_msg = f"DeepSeek API error: {response.status_code} - {response.text}"
             logger.error(error_msg)
             raise Exception(error_msg)
     
-    def generate_description(self, image_analysis, panel_num=1):
+    def generate_description(self, image_analysis, panel_num=1, deadline=None):
         """
         Generate a description using multiple providers with fallback.
         
         Args:
             image_analysis (dict): Image analysis data
             panel_num (int): Panel number
+            deadline (Deadline, optional): Request budget; once too little is
+                left for another provider attempt, falls back to rules
             
         Returns:
             str: Generated description
@@ -244,49 +233,58 @@ class MultiProviderAPI:
             f"Keep the description minimal, factual, and focused only on what can be seen."
         )
         
-        system_prompt = (
-            "You are a comic panel describer that ONLY states what is objectively visible. "
-            "NEVER invent dialogue content, emotions, or scene details. If you see a speech bubble, "
-            "only mention its presence - NEVER guess what's written inside unless the text is clearly legible. "
-            "Describe only physical elements that are definitely present in the image. "
-            "Do not make assumptions about what characters are thinking or feeling unless their expressions are extremely clear. "
-            "Do not use interpretive language - stick to physical descriptions only. "
-            "Your descriptions must be factual enough to charge money for."
-        )
-        
-        # Try each provider in priority order
-        for provider in self.priority:
-            if provider == "openai" and self.keys["openai"]:
-                try:
-                    logger.info("Trying OpenAI for description generation")
-                    return self.call_openai(system_prompt, prompt)
-                except Exception as e:
-                    logger.error(f"OpenAI failed: {str(e)}")
-            
-            elif provider == "anthropic" and self.keys["anthropic"]:
-                try:
-                    logger.info("Trying Anthropic for description generation")
-                    return self.call_anthropic(prompt)
-                except Exception as e:
-                    logger.error(f"Anthropic failed: {str(e)}")
-            
-            elif provider == "grok" and self.keys["grok"]:
-                try:
-                    logger.info("Trying Grok for description generation")
-                    return self.call_grok(prompt)
-                except Exception as e:
-                    logger.error(f"Grok failed: {str(e)}")
+        # The static system prompt is shared by every call so providers can cache it
+        system_prompt = SYSTEM_PROMPT
+        
+        # Providers that failed before one answered, recorded as the fallback depth
+        failures = 0
+        source = "rule_based"
+        try:
+            # Try each provider in priority order
+            for provider in self.priority:
+                if deadline is not None and not deadline.can_fit(self.min_attempt_seconds):
+                    logger.warning(f"{deadline.remaining():.2f}s left in request budget - skipping to rule-based description")
+                    break
+                
+                source = provider
+                if provider == "openai" and self.keys["openai"]:
+                    try:
+                        logger.info("Trying OpenAI for description generation")
+                        return self.call_openai(system_prompt, prompt, deadline=deadline)
+                    except Exception as e:
+                        logger.error(f"OpenAI failed: {str(e)}")
+                        failures += 1
+                
+                elif provider == "anthropic" and self.keys["anthropic"]:
+                    try:
+                        logger.info("Trying Anthropic for description generation")
+                        return self.call_anthropic(prompt, system_prompt=system_prompt, deadline=deadline)
+                    except Exception as e:
+                        logger.error(f"Anthropic failed: {str(e)}")
+                        failures += 1
+                
+                elif provider == "grok" and self.keys["grok"]:
+                    try:
+                        logger.info("Trying Grok for description generation")
+                        return self.call_grok(prompt, deadline=deadline)
+                    except Exception as e:
+                        logger.error(f"Grok failed: {str(e)}")
+                        failures += 1
+                
+                elif provider == "deepseek" and self.keys["deepseek"]:
+                    try:
+                        logger.info("Trying DeepSeek for description generation")
+                        return self.call_deepseek(prompt, deadline=deadline)
+                    except Exception as e:
+                        logger.error(f"DeepSeek failed: {str(e)}")
+                        failures += 1
             
-            elif provider == "deepseek" and self.keys["deepseek"]:
-                try:
-                    logger.info("Trying DeepSeek for description generation")
-                    return self.call_deepseek(prompt)
-                except Exception as e:
-                    logger.error(f"DeepSeek failed: {str(e)}")
-        
-        # Fallback to rule-based description
-        logger.info("Using rule-based description generation")
-        return self._generate_rule_based_description(image_analysis, panel_num)
+            # Fallback to rule-based description
+            source = "rule_based"
+            logger.info("Using rule-based description generation")
+            return self._generate_rule_based_description(image_analysis, panel_num)
+        finally:
+            fallback_depth.observe(failures, source=source)
     
     def _generate_rule_based_description(self, image_analysis, panel_num):
         """
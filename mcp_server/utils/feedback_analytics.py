@@ -0,0 +1,244 @@
+"""
+Running feedback aggregates for the Comic Panel Description Generator.
+
+Aggregates are built once from the feedback store and then kept up to date by
+a background thread that reads only the submissions added since the last
+update, so serving statistics costs the same at a million submissions as at
+ten and never diffs descriptions on the request path. Submissions written by
+the MCP server land in the same database and are picked up the same way.
+"""
+
+import difflib
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+from .feedback_store import feedback_db_path, get_feedback_store
+
+logger = logging.getLogger("comic-mcp-server")
+
+# Phrases reported per list, and the longest run of words counted as a phrase;
+# longer runs are rewrites rather than recurring edits
+TOP_PHRASES = 20
+MAX_PHRASE_WORDS = 6
+# Distinct phrases counted per list before the rarest are dropped
+MAX_TRACKED_PHRASES = 50 * TOP_PHRASES
+
+# Seconds between background updates of the aggregates
+REFRESH_INTERVAL = float(os.environ.get("FEEDBACK_ANALYTICS_INTERVAL", 5))
+
+# Rows read from the store per query while catching up
+READ_CHUNK_SIZE = 1000
+
+_WORD_RE = re.compile(r"[\w']+")
+
+def diff_phrases(original, edited):
+    """
+    Find the phrases an edit removed and inserted.
+
+    Args:
+        original (str): Generated description
+        edited (str): Description after the artist's edits
+
+    Returns:
+        tuple: (removed phrases, inserted phrases), lowercase
+    """
+    original_words = _WORD_RE.findall(original.lower())
+    edited_words = _WORD_RE.findall(edited.lower())
+    matcher = difflib.SequenceMatcher(None, original_words, edited_words, autojunk=False)
+
+    removed = []
+    inserted = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag in ("replace", "delete") and 0 < i2 - i1 <= MAX_PHRASE_WORDS:
+            removed.append(" ".join(original_words[i1:i2]))
+        if tag in ("replace", "insert") and 0 < j2 - j1 <= MAX_PHRASE_WORDS:
+            inserted.append(" ".join(edited_words[j1:j2]))
+    return removed, inserted
+
+class TopCounter:
+    """
+    Counter that keeps its most common entries up to date on every increment.
+
+    Counts only grow, so an entry can only join the top list by passing its
+    smallest member; each increment costs at most one scan of the top list.
+    Memory is bounded: once max_tracked distinct keys are counted, the rarer
+    half is dropped and those keys start again from zero if they recur.
+    """
+
+    def __init__(self, size, max_tracked=None):
+        """
+        Initialize an empty counter.
+
+        Args:
+            size (int): Number of top entries kept
+            max_tracked (int, optional): Most distinct keys counted. Defaults to 50 * size.
+        """
+        self.size = size
+        self.max_tracked = max(2 * size, max_tracked or 50 * size)
+        self.counts = Counter()
+        self.top = {}
+
+    def add(self, key, amount=1):
+        """Increase the count for a key."""
+        count = self.counts[key] + amount
+        self.counts[key] = count
+        if len(self.counts) > self.max_tracked:
+            self._prune()
+
+        if key in self.top or len(self.top) < self.size:
+            self.top[key] = count
+            return
+
+        smallest = min(self.top, key=self.top.get)
+        if count > self.top[smallest]:
+            del self.top[smallest]
+            self.top[key] = count
+
+    def _prune(self):
+        """Keep the more common half of the counted keys, and always the top list."""
+        kept = dict(self.counts.most_common(self.max_tracked // 2))
+        kept.update((key, self.counts[key]) for key in self.top)
+        self.counts = Counter(kept)
+
+    def most_common(self):
+        """
+        Get the top entries.
+
+        Returns:
+            list: (key, count) pairs, most common first
+        """
+        return sorted(self.top.items(), key=lambda item: (-item[1], item[0]))
+
+class FeedbackAnalytics:
+    """Rating, issue type and edit statistics over all stored feedback."""
+
+    def __init__(self, store):
+        """
+        Initialize empty aggregates over a feedback store.
+
+        Args:
+            store (FeedbackStore): Store to read submissions from
+        """
+        self.store = store
+        self.last_id = 0
+        self.total = 0
+        self.rating_sum = 0
+        self.ratings = Counter()
+        self.issue_types = Counter()
+        self.removed = TopCounter(TOP_PHRASES, MAX_TRACKED_PHRASES)
+        self.inserted = TopCounter(TOP_PHRASES, MAX_TRACKED_PHRASES)
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def add(self, feedback):
+        """
+        Fold one submission into the aggregates.
+
+        Args:
+            feedback (dict): Submission with rating, issue_type,
+                original_description and edited_description
+        """
+        self.total += 1
+        rating = feedback.get("rating")
+        if rating is not None:
+            self.ratings[rating] += 1
+            self.rating_sum += rating
+        self.issue_types[feedback.get("issue_type") or "none"] += 1
+
+        removed, inserted = diff_phrases(feedback.get("original_description") or "",
+                                         feedback.get("edited_description") or "")
+        for phrase in removed:
+            self.removed.add(phrase)
+        for phrase in inserted:
+            self.inserted.add(phrase)
+
+    def refresh(self):
+        """
+        Read the submissions stored since the last refresh.
+
+        Returns:
+            int: Number of new submissions read by this call
+        """
+        with self._refresh_lock:
+            added = 0
+            while True:
+                records = self.store.read_after(self.last_id, READ_CHUNK_SIZE)
+                with self._lock:
+                    for record in records:
+                        self.add(record)
+                    if records:
+                        self.last_id = records[-1]["id"]
+                added += len(records)
+                if len(records) < READ_CHUNK_SIZE:
+                    return added
+                # Let other greenlets run between chunks under gevent
+                time.sleep(0)
+
+    def snapshot(self):
+        """
+        Get the current aggregates.
+
+        Returns:
+            dict: total, ratings, average_rating, issue_types, removed_phrases
+                and inserted_phrases
+        """
+        with self._lock:
+            rated = sum(self.ratings.values())
+            return {
+                "total": self.total,
+                "ratings": {str(rating): count for rating, count in sorted(self.ratings.items())},
+                "average_rating": round(self.rating_sum / rated, 3) if rated else None,
+                "issue_types": dict(self.issue_types.most_common()),
+                "removed_phrases": [{"phrase": phrase, "count": count}
+                                    for phrase, count in self.removed.most_common()],
+                "inserted_phrases": [{"phrase": phrase, "count": count}
+                                     for phrase, count in self.inserted.most_common()]
+            }
+
+_analytics = None
+_analytics_lock = threading.Lock()
+_updater = None
+
+def get_feedback_analytics():
+    """
+    Get the process-wide analytics, empty until refreshed.
+
+    Returns:
+        FeedbackAnalytics: The shared analytics
+    """
+    global _analytics
+    with _analytics_lock:
+        if _analytics is None:
+            _analytics = FeedbackAnalytics(get_feedback_store())
+        return _analytics
+
+def warm_up(interval=REFRESH_INTERVAL):
+    """
+    Build the aggregates from the stored feedback, then keep them current, on a background thread.
+
+    Args:
+        interval (float, optional): Seconds between updates. Defaults to REFRESH_INTERVAL.
+    """
+    global _updater
+
+    def run():
+        loaded = False
+        while True:
+            # Until feedback arrives, avoid creating the database just to read it
+            if os.path.exists(feedback_db_path()):
+                try:
+                    added = get_feedback_analytics().refresh()
+                    if not loaded:
+                        logger.info(f"Loaded feedback analytics from {added} stored submission(s)")
+                        loaded = True
+                except Exception as e:
+                    logger.error(f"Failed to update feedback analytics: {str(e)}")
+            time.sleep(interval)
+
+    with _analytics_lock:
+        if _updater is None:
+            _updater = threading.Thread(target=run, name="feedback-analytics", daemon=True)
+            _updater.start()
@@ -0,0 +1,324 @@
+"""
+Feedback store shared by the API server and the Comic Panel MCP Server.
+
+Feedback is kept in one SQLite database in WAL mode, so both processes can
+write to it while readers run alongside. Submissions are queued and written
+in batches by a background thread, off the request path. Rating, issue type
+and submission time are indexed for filtering and aggregation.
+
+Usage (import the JSON files written by earlier versions):
+    python -m mcp_server.utils.feedback_store import app/feedback mcp_server/feedback
+"""
+
+import atexit
+import glob
+import json
+import logging
+import math
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import closing
+
+logger = logging.getLogger("comic-mcp-server")
+
+DEFAULT_DB_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "feedback", "feedback.db")
+
+# Largest number of submissions written in one transaction
+WRITE_BATCH_SIZE = 500
+# Longest the process waits at exit for queued submissions to be written
+EXIT_FLUSH_TIMEOUT = 10  # seconds
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS feedback (
+    id INTEGER PRIMARY KEY,
+    created_at REAL NOT NULL,
+    rating INTEGER,
+    issue_type TEXT,
+    original_description TEXT NOT NULL,
+    edited_description TEXT NOT NULL,
+    comments TEXT,
+    source TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_feedback_rating ON feedback (rating);
+CREATE INDEX IF NOT EXISTS idx_feedback_issue_type ON feedback (issue_type);
+CREATE INDEX IF NOT EXISTS idx_feedback_created_at ON feedback (created_at);
+"""
+
+COLUMNS = ("id", "created_at", "rating", "issue_type", "original_description",
+           "edited_description", "comments", "source")
+
+def parse_rating(value):
+    """
+    Convert a submitted rating to an integer.
+
+    Args:
+        value: Rating as sent by the client, e.g. "4" or 4
+
+    Returns:
+        int: The rating, or None if it is not a whole number
+    """
+    try:
+        return int(str(value).strip())
+    except (TypeError, ValueError):
+        return None
+
+def parse_timestamp(value):
+    """
+    Convert a submitted timestamp to Unix time.
+
+    Args:
+        value: Timestamp as sent by the client, e.g. "1700000000.5" or 1700000000
+
+    Returns:
+        float: The timestamp, or None if it is not a positive finite number
+    """
+    try:
+        timestamp = float(str(value).strip())
+    except (TypeError, ValueError):
+        return None
+    if not math.isfinite(timestamp) or timestamp <= 0:
+        return None
+    return timestamp
+
+class FeedbackStore:
+    """SQLite-backed feedback log with a batching background writer."""
+
+    def __init__(self, path):
+        """
+        Open the database, creating it and its indexes if needed, and start the writer.
+
+        Args:
+            path (str): Database file
+        """
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._queue = queue.Queue()
+
+        with closing(self._connect()) as conn:
+            conn.executescript(SCHEMA)
+
+        self._writer = threading.Thread(target=self._run, name="feedback-writer", daemon=True)
+        self._writer.start()
+        # The writer is a daemon thread; write what is still queued before the process exits
+        atexit.register(self.flush, EXIT_FLUSH_TIMEOUT)
+
+    def _connect(self):
+        """Open a connection in WAL mode."""
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # WAL stays consistent after a crash with NORMAL; only the last commits may be lost
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def submit(self, feedback, source=None):
+        """
+        Queue a submission for writing and return immediately.
+
+        Args:
+            feedback (dict): rating, issue_type, original_description,
+                edited_description, comments and optionally timestamp
+            source (str, optional): Where the feedback came from, e.g. "api" or "mcp"
+        """
+        self._queue.put({
+            "created_at": parse_timestamp(feedback.get("timestamp")) or time.time(),
+            "rating": parse_rating(feedback.get("rating")),
+            "issue_type": feedback.get("issue_type") or None,
+            "original_description": feedback.get("original_description") or "",
+            "edited_description": feedback.get("edited_description") or "",
+            "comments": feedback.get("comments") or None,
+            "source": source
+        })
+
+    def flush(self, timeout=None):
+        """
+        Block until every queued submission has been written.
+
+        Args:
+            timeout (float, optional): Longest wait in seconds. Defaults to no limit.
+
+        Returns:
+            bool: True if the queue was drained, False if the wait timed out
+        """
+        with self._queue.all_tasks_done:
+            drained = self._queue.all_tasks_done.wait_for(lambda: not self._queue.unfinished_tasks, timeout)
+        if not drained:
+            logger.warning(f"{self._queue.unfinished_tasks} feedback record(s) not written after {timeout}s")
+        return drained
+
+    def _run(self):
+        """Writer loop: commit whatever has queued up as one transaction."""
+        conn = self._connect()
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < WRITE_BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                self._write(conn, batch)
+            except sqlite3.Error as e:
+                logger.error(f"Failed to write {len(batch)} feedback record(s): {str(e)}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write(self, conn, batch):
+        """Insert a batch of records in one transaction."""
+        with conn:
+            conn.executemany(
+                "INSERT INTO feedback (created_at, rating, issue_type, original_description, "
+                "edited_description, comments, source) VALUES (:created_at, :rating, :issue_type, "
+                ":original_description, :edited_description, :comments, :source)",
+                batch
+            )
+
+    def _filters(self, rating=None, issue_type=None, since=None, until=None):
+        """Build a WHERE clause from the indexed filters."""
+        clauses = []
+        params = []
+        if rating is not None:
+            clauses.append("rating = ?")
+            params.append(rating)
+        if issue_type is not None:
+            clauses.append("issue_type = ?")
+            params.append(issue_type)
+        if since is not None:
+            clauses.append("created_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("created_at < ?")
+            params.append(until)
+        return clauses, params
+
+    def query(self, rating=None, issue_type=None, since=None, until=None, before_id=None, limit=100):
+        """
+        Get submissions, newest first.
+
+        Pages are fetched by id rather than offset, so deep pages cost the same
+        as the first one: pass the smallest id of a page as before_id to get the next.
+
+        Args:
+            rating (int, optional): Only this rating
+            issue_type (str, optional): Only this issue type
+            since (float, optional): Only submissions at or after this Unix time
+            until (float, optional): Only submissions before this Unix time
+            before_id (int, optional): Only submissions with a smaller id
+            limit (int, optional): Largest number of submissions returned. Defaults to 100.
+
+        Returns:
+            list: Submission dicts
+        """
+        clauses, params = self._filters(rating, issue_type, since, until)
+        if before_id is not None:
+            clauses.append("id < ?")
+            params.append(before_id)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        # WAL readers never wait for the writer
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM feedback {where} ORDER BY id DESC LIMIT ?",
+                params + [limit]
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def read_after(self, after_id, limit=10000):
+        """
+        Get submissions with an id above after_id, oldest first.
+
+        Used to follow the log incrementally: pass the last id seen.
+
+        Args:
+            after_id (int): Last id already read
+            limit (int, optional): Largest number of submissions returned. Defaults to 10000.
+
+        Returns:
+            list: Submission dicts
+        """
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM feedback WHERE id > ? ORDER BY id LIMIT ?",
+                (after_id, limit)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def import_json_files(self, directory, source=None):
+        """
+        Import feedback_*.json files written by earlier versions.
+
+        Imported files are renamed to *.imported so running this again skips them.
+
+        Args:
+            directory (str): Directory holding the files
+            source (str, optional): Source recorded for the imported submissions
+
+        Returns:
+            int: Number of files imported
+        """
+        imported = 0
+        for path in sorted(glob.glob(os.path.join(directory, "feedback_*.json"))):
+            try:
+                with open(path) as f:
+                    feedback = json.load(f)
+                if "timestamp" not in feedback:
+                    feedback["timestamp"] = os.path.getmtime(path)
+            except (OSError, ValueError) as e:
+                logger.error(f"Skipping {path}: {str(e)}")
+                continue
+            self.submit(feedback, source)
+            os.rename(path, path + ".imported")
+            imported += 1
+
+        self.flush()
+        return imported
+
+_store = None
+_store_lock = threading.Lock()
+
+def feedback_db_path():
+    """
+    Get the database file: FEEDBACK_DB_PATH, or feedback/feedback.db in the project directory.
+
+    Returns:
+        str: Database path
+    """
+    return os.environ.get("FEEDBACK_DB_PATH", DEFAULT_DB_PATH)
+
+def get_feedback_store():
+    """
+    Get the process-wide feedback store, opening it on first use.
+
+    Returns:
+        FeedbackStore: The shared store
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            path = feedback_db_path()
+            logger.info(f"Opening feedback store at {path}")
+            _store = FeedbackStore(path)
+        return _store
+
+def main():
+    """Import legacy feedback files into the store."""
+    if len(sys.argv) < 3 or sys.argv[1] != "import":
+        print("Usage: python -m mcp_server.utils.feedback_store import DIRECTORY [DIRECTORY ...]")
+        sys.exit(1)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    store = get_feedback_store()
+    for directory in sys.argv[2:]:
+        print(f"{directory}: imported {store.import_json_files(directory)} file(s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,346 @@
+"""In-process metrics shared by the app and the Comic Panel MCP Server."""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency buckets in seconds, from cache hits to slow provider calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class _ShardedMetric:
+    """
+    Base class for metrics that are written without locks.
+
+    Each OS thread writes to its own shard and shards are merged when the
+    metric is read. Greenlets on the same thread share a shard, which is
+    safe because writes never yield.
+    """
+
+    metric_type = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        """
+        Initialize the metric.
+
+        Args:
+            name (str): Metric name
+            help_text (str): One-line description
+            labelnames (tuple, optional): Names of the labels values are split by
+        """
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._shards = {}
+        self._lock = threading.Lock()
+
+    def _series(self, labels, factory):
+        """Get the calling thread's series for a label combination."""
+        thread_id = threading.get_native_id()
+        shard = self._shards.get(thread_id)
+        if shard is None:
+            with self._lock:
+                shard = self._shards.setdefault(thread_id, {})
+
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        series = shard.get(key)
+        if series is None:
+            series = shard[key] = factory()
+        return series
+
+    def _merged(self):
+        """Sum the shards element-wise, keyed by label values."""
+        with self._lock:
+            shards = list(self._shards.values())
+
+        merged = {}
+        for shard in shards:
+            for key, series in list(shard.items()):
+                total = merged.get(key)
+                if total is None:
+                    merged[key] = list(series)
+                else:
+                    for index, value in enumerate(series):
+                        total[index] += value
+        return merged
+
+    def _labels(self, key):
+        return dict(zip(self.labelnames, key))
+
+class Counter(_ShardedMetric):
+    """Monotonic count, optionally split by labels."""
+
+    metric_type = "counter"
+
+    def inc(self, amount=1, **labels):
+        """
+        Increase the counter.
+
+        Args:
+            amount (float, optional): Amount to add. Defaults to 1.
+            **labels: Label values, one per label name
+        """
+        self._series(labels, lambda: [0])[0] += amount
+
+    def collect(self):
+        """
+        Merge the shards.
+
+        Returns:
+            list: One dict per label combination with labels and value
+        """
+        return [{"labels": self._labels(key), "value": series[0]}
+                for key, series in sorted(self._merged().items())]
+
+class Gauge(_ShardedMetric):
+    """
+    Value that goes up and down, such as requests in flight.
+
+    Values are either tracked with inc()/dec(), which may happen on
+    different threads, or read from a callback when the gauge is collected.
+    """
+
+    metric_type = "gauge"
+
+    def __init__(self, name, help_text, labelnames=()):
+        """
+        Initialize the gauge.
+
+        Args:
+            name (str): Metric name
+            help_text (str): One-line description
+            labelnames (tuple, optional): Names of the labels values are split by
+        """
+        super().__init__(name, help_text, labelnames)
+        self._callbacks = {}
+
+    def inc(self, amount=1, **labels):
+        """Increase the gauge."""
+        self._series(labels, lambda: [0])[0] += amount
+
+    def dec(self, amount=1, **labels):
+        """Decrease the gauge."""
+        self._series(labels, lambda: [0])[0] -= amount
+
+    @contextmanager
+    def track(self, **labels):
+        """Count a block as in progress while it runs."""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def set_function(self, func, **labels):
+        """
+        Read the gauge value from a callback when collected.
+
+        Args:
+            func (callable): Returns the current value
+            **labels: Label values, one per label name
+        """
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._callbacks[key] = func
+
+    def collect(self):
+        """
+        Merge the shards and read the callbacks.
+
+        Returns:
+            list: One dict per label combination with labels and value
+        """
+        values = {key: series[0] for key, series in self._merged().items()}
+        with self._lock:
+            callbacks = list(self._callbacks.items())
+        for key, func in callbacks:
+            try:
+                values[key] = func()
+            except Exception:
+                continue
+        return [{"labels": self._labels(key), "value": value} for key, value in sorted(values.items())]
+
+class Histogram(_ShardedMetric):
+    """Histogram of observations, optionally split by labels."""
+
+    metric_type = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        """
+        Initialize the histogram.
+
+        Args:
+            name (str): Metric name
+            help_text (str): One-line description
+            labelnames (tuple, optional): Names of the labels observations are split by
+            buckets (tuple, optional): Upper bounds of the buckets, ascending
+        """
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        """
+        Record one observation.
+
+        Args:
+            value (float): Observed value, e.g. seconds
+            **labels: Label values, one per label name
+        """
+        # Bucket counts, then the +Inf count, then the sum
+        series = self._series(labels, lambda: [0] * (len(self.buckets) + 1) + [0.0])
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """
+        Observe the duration of a block in seconds.
+
+        Args:
+            **labels: Label values, one per label name
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def collect(self):
+        """
+        Merge the shards.
+
+        Returns:
+            list: One dict per label combination with labels, cumulative
+                bucket counts, count and sum
+        """
+        samples = []
+        for key, series in sorted(self._merged().items()):
+            cumulative = 0
+            buckets = {}
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                buckets[_format_value(bound)] = cumulative
+            samples.append({
+                "labels": self._labels(key),
+                "buckets": buckets,
+                "count": cumulative,
+                "sum": round(series[-1], 6)
+            })
+        return samples
+
+def _format_value(value):
+    """Format a number for the Prometheus text format."""
+    if value == float("inf"):
+        return "+Inf"
+    return repr(value) if isinstance(value, float) else str(value)
+
+def _format_labels(labels):
+    """Format a label set for the Prometheus text format."""
+    if not labels:
+        return ""
+    parts = []
+    for name, value in labels.items():
+        escaped = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{name}="{escaped}"')
+    return "{" + ",".join(parts) + "}"
+
+class MetricsRegistry:
+    """Process-wide collection of named metrics."""
+
+    def __init__(self):
+        """Initialize an empty registry."""
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _get_or_create(self, cls, name, *args):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already registered as a {metric.metric_type}")
+            return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        """
+        Get a counter, creating it on first use.
+
+        Args:
+            name (str): Metric name, ending in _total
+            help_text (str): One-line description
+            labelnames (tuple, optional): Names of the labels values are split by
+
+        Returns:
+            Counter: The registered counter
+        """
+        return self._get_or_create(Counter, name, help_text, labelnames)
+
+    def gauge(self, name, help_text, labelnames=()):
+        """
+        Get a gauge, creating it on first use.
+
+        Args:
+            name (str): Metric name
+            help_text (str): One-line description
+            labelnames (tuple, optional): Names of the labels values are split by
+
+        Returns:
+            Gauge: The registered gauge
+        """
+        return self._get_or_create(Gauge, name, help_text, labelnames)
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        """
+        Get a histogram, creating it on first use.
+
+        Args:
+            name (str): Metric name
+            help_text (str): One-line description
+            labelnames (tuple, optional): Names of the labels observations are split by
+            buckets (tuple, optional): Upper bounds of the buckets, ascending
+
+        Returns:
+            Histogram: The registered histogram
+        """
+        return self._get_or_create(Histogram, name, help_text, labelnames, buckets)
+
+    def _sorted_metrics(self):
+        with self._lock:
+            return sorted(self._metrics.values(), key=lambda metric: metric.name)
+
+    def snapshot(self):
+        """
+        Get the current value of every metric.
+
+        Returns:
+            dict: Metric name to type, help text and samples
+        """
+        return {
+            metric.name: {"type": metric.metric_type, "help": metric.help, "samples": metric.collect()}
+            for metric in self._sorted_metrics()
+        }
+
+    def to_prometheus(self):
+        """
+        Render every metric in the Prometheus text exposition format.
+
+        Returns:
+            str: Exposition text
+        """
+        lines = []
+        for metric in self._sorted_metrics():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.metric_type}")
+            for sample in metric.collect():
+                labels = sample["labels"]
+                if metric.metric_type == "histogram":
+                    for bound, count in sample["buckets"].items():
+                        lines.append(f"{metric.name}_bucket{_format_labels(dict(labels, le=bound))} {count}")
+                    lines.append(f"{metric.name}_sum{_format_labels(labels)} {_format_value(sample['sum'])}")
+                    lines.append(f"{metric.name}_count{_format_labels(labels)} {sample['count']}")
+                else:
+                    lines.append(f"{metric.name}{_format_labels(labels)} {_format_value(sample['value'])}")
+        return "\n".join(lines) + "\n"
+
+# Process-wide registry shared by every module
+metrics_registry = MetricsRegistry()
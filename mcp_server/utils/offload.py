@@ -0,0 +1,75 @@
+"""
+Executors that keep blocking work off the Comic Panel MCP Server's event loop.
+
+Tool handlers are coroutines on a single event loop, so any blocking call in
+one of them stalls every other tool call. Image decoding and OpenCV stages run
+on a pool sized to the CPU count; OpenCV releases the GIL, so they run in
+parallel. Provider calls, which mostly wait on the network, run on a larger
+pool. Both pools are bounded, and work runs in a copy of the caller's context
+so tracing spans stay attached to the tool call.
+"""
+
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from .metrics import metrics_registry
+
+logger = logging.getLogger("comic-mcp-server")
+
+# Threads for OpenCV work and for blocking provider calls
+MCP_CPU_WORKERS = int(os.environ.get("MCP_CPU_WORKERS", os.cpu_count() or 4))
+MCP_IO_WORKERS = int(os.environ.get("MCP_IO_WORKERS", 32))
+
+offload_in_flight = metrics_registry.gauge(
+    "mcp_offload_in_flight", "Tool work running or queued on the MCP server's executors", ("pool",))
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def _get_pool(name, max_workers):
+    """Create a named pool on first use."""
+    with _pools_lock:
+        pool = _pools.get(name)
+        if pool is None:
+            logger.info(f"Running MCP {name} work on up to {max_workers} threads")
+            pool = _pools[name] = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"mcp-{name}")
+        return pool
+
+async def _run_on(name, max_workers, func, args, kwargs):
+    """Run func on a named pool and wait for it without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    call = functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
+    with offload_in_flight.track(pool=name):
+        return await loop.run_in_executor(_get_pool(name, max_workers), call)
+
+async def run_cpu(func, *args, **kwargs):
+    """
+    Run CPU-bound work, such as decoding or contour analysis, off the event loop.
+
+    Args:
+        func (callable): Function to run
+        *args: Positional arguments for func
+        **kwargs: Keyword arguments for func
+
+    Returns:
+        The return value of func
+    """
+    return await _run_on("cpu", MCP_CPU_WORKERS, func, args, kwargs)
+
+async def run_io(func, *args, **kwargs):
+    """
+    Run blocking I/O, such as a provider call, off the event loop.
+
+    Args:
+        func (callable): Function to run
+        *args: Positional arguments for func
+        **kwargs: Keyword arguments for func
+
+    Returns:
+        The return value of func
+    """
+    return await _run_on("io", MCP_IO_WORKERS, func, args, kwargs)
@@ -0,0 +1,223 @@
+"""
+Panel analysis stages for the Comic Panel MCP Server.
+
+Each stage takes the decoded image and native Python values and returns
+native values, so stages can be chained without reloading the image or
+round-tripping through JSON. The MCP tools are thin wrappers that load the
+image once and serialize the result once. The composite analysis is a
+coroutine that runs the stages as a small dependency graph off the event loop:
+each stage starts as soon as its inputs are ready, so independent stages run
+at the same time.
+"""
+
+import asyncio
+import logging
+import time
+import numpy as np
+from .api_utils import api_client
+from .image_utils import detect_figures, detect_motion, detect_objects as detect_special_objects
+from .offload import run_cpu, run_io
+from .tracing import span
+
+logger = logging.getLogger("comic-mcp-server")
+
+# Centers closer than this fraction of the image diagonal are "near"
+NEAR_DISTANCE = 0.2
+
+def detect_objects(img):
+    """
+    Detect figures and special objects in a panel.
+
+    Args:
+        img (numpy.ndarray): Decoded BGR image
+
+    Returns:
+        dict: figures, objects, count and image_dimensions ([width, height])
+    """
+    height, width = img.shape[:2]
+    figures = detect_figures(img)
+    return {
+        "figures": figures,
+        "objects": detect_special_objects(img),
+        "count": len(figures),
+        "image_dimensions": [width, height]
+    }
+
+def classify_scene(img):
+    """
+    Classify a panel as an action or static scene.
+
+    Args:
+        img (numpy.ndarray): Decoded BGR image
+
+    Returns:
+        dict: scene_type, attributes and the motion measurements
+    """
+    motion = detect_motion(img)
+    attributes = ["dynamic"] if motion["type"] == "action" else ["calm"]
+    return {
+        "scene_type": motion["type"],
+        "attributes": attributes,
+        "motion": motion
+    }
+
+def analyze_relationships(figures, width, height):
+    """
+    Describe where each pair of figures is relative to the other.
+
+    Args:
+        figures (list): Figures with id and center
+        width (int): Image width in pixels
+        height (int): Image height in pixels
+
+    Returns:
+        list: One relationship dict per pair of figures
+    """
+    diagonal = np.sqrt(width**2 + height**2)
+    relationships = []
+    for i, fig1 in enumerate(figures):
+        for j, fig2 in enumerate(figures):
+            if i >= j:  # Skip self and duplicates
+                continue
+
+            center1 = fig1.get("center", [0, 0])
+            center2 = fig2.get("center", [0, 0])
+
+            # Distance between centers, normalized by the image diagonal
+            distance = np.sqrt((center1[0] - center2[0])**2 + (center1[1] - center2[1])**2)
+            normalized_distance = distance / diagonal
+
+            dx = center2[0] - center1[0]
+            dy = center2[1] - center1[1]
+            if abs(dx) > abs(dy):
+                position = "right_of" if dx > 0 else "left_of"
+            else:
+                position = "below" if dy > 0 else "above"
+
+            relationships.append({
+                "figure1_id": fig1.get("id", i),
+                "figure2_id": fig2.get("id", j),
+                "type": "near" if normalized_distance < NEAR_DISTANCE else "far_from",
+                "position": position,
+                "distance": float(normalized_distance)
+            })
+    return relationships
+
+def describe(panel_num, figures, scene_type, relationships, deadline=None):
+    """
+    Generate a panel description with the provider chain.
+
+    Args:
+        panel_num (int): Panel number
+        figures (list): Detected figures
+        scene_type (str): Scene type, e.g. "action"
+        relationships (list): Relationships between figures
+        deadline (Deadline, optional): Time budget for the provider chain
+
+    Returns:
+        str: Generated description
+    """
+    image_analysis = {
+        "figures": figures,
+        "motion": {"type": scene_type},
+        "objects": {"type": "none"},  # Default
+        "relationships": relationships
+    }
+    return api_client.generate_description(image_analysis, panel_num, deadline)
+
+async def run_stages(stages):
+    """
+    Run async stages as a dependency graph.
+
+    Each stage is started at once and awaits only the stages it depends on,
+    then is called with their results as keyword arguments. If a stage fails,
+    the others are cancelled and the error is raised.
+
+    Args:
+        stages (dict): Stage name to (dependency names, async function), with
+            every dependency listed before the stages that use it
+
+    Returns:
+        tuple: (stage name to result, stage name to milliseconds spent in the
+            stage itself, not waiting for its inputs)
+    """
+    tasks = {}
+    timings = {}
+
+    async def run(name, dependencies, func):
+        inputs = {dependency: await tasks[dependency] for dependency in dependencies}
+        start = time.perf_counter()
+        with span(f"panel.{name}"):
+            result = await func(**inputs)
+        timings[name] = round((time.perf_counter() - start) * 1000, 2)
+        return result
+
+    for name, (dependencies, func) in stages.items():
+        tasks[name] = asyncio.ensure_future(run(name, dependencies, func))
+
+    try:
+        results = await asyncio.gather(*tasks.values())
+    except BaseException:
+        for task in tasks.values():
+            task.cancel()
+        raise
+    return dict(zip(tasks, results)), timings
+
+async def analyze_panel(img, panel_num=1, deadline=None):
+    """
+    Run every stage on a decoded panel: figures, objects, scene, relationships and description.
+
+    Figure, object and scene detection only need the image and run at the
+    same time; relationships wait for the figures, and the description for
+    the figures, scene and relationships.
+
+    Args:
+        img (numpy.ndarray): Decoded BGR image
+        panel_num (int, optional): Panel number. Defaults to 1.
+        deadline (Deadline, optional): Time budget for the provider chain
+
+    Returns:
+        dict: panel_num, figures, objects, scene (type and attributes),
+            relationships, description and timings (milliseconds per stage and in total)
+    """
+    height, width = img.shape[:2]
+    start = time.perf_counter()
+
+    async def figures():
+        return await run_cpu(detect_figures, img)
+
+    async def objects():
+        return await run_cpu(detect_special_objects, img)
+
+    async def scene():
+        return await run_cpu(classify_scene, img)
+
+    async def relationships(figures):
+        return analyze_relationships(figures, width, height)
+
+    async def description(figures, scene, relationships):
+        return await run_io(describe, panel_num, figures, scene["scene_type"], relationships, deadline)
+
+    results, stage_ms = await run_stages({
+        "figures": ((), figures),
+        "objects": ((), objects),
+        "scene": ((), scene),
+        "relationships": (("figures",), relationships),
+        "description": (("figures", "scene", "relationships"), description)
+    })
+
+    timings = {f"{name}_ms": ms for name, ms in stage_ms.items()}
+    timings["total_ms"] = round((time.perf_counter() - start) * 1000, 2)
+
+    return {
+        "panel_num": panel_num,
+        "figures": results["figures"],
+        "objects": results["objects"],
+        "scene": {
+            "type": results["scene"]["scene_type"],
+            "attributes": results["scene"]["attributes"]
+        },
+        "relationships": results["relationships"],
+        "description": results["description"],
+        "timings": timings
+    }
@@ -0,0 +1,643 @@
+"""Provider request helpers shared by the app and the Comic Panel MCP Server."""
+
+import email.utils
+import json
+import logging
+import os
+import random
+import threading
+import time
+import requests
+from .metrics import metrics_registry
+from .tracing import span
+
+logger = logging.getLogger("comic-mcp-server")
+
+# Default API base URLs; each can be overridden with <PROVIDER>_BASE_URL,
+# e.g. OPENAI_BASE_URL=http://localhost:9000/v1 to use a local stand-in server
+DEFAULT_BASE_URLS = {
+    "openai": "https://api.openai.com/v1",
+    "anthropic": "https://api.anthropic.com/v1",
+    "grok": "https://api.xai.com/v1",  # Placeholder endpoint
+    "deepseek": "https://api.deepseek.com/v1",  # Placeholder endpoint
+    "huggingface": "https://api-inference.huggingface.co/models"
+}
+
+# Endpoint path appended to each base URL
+PROVIDER_PATHS = {
+    "openai": "/chat/completions",
+    "anthropic": "/messages",
+    "grok": "/chat/completions",
+    "deepseek": "/chat/completions",
+    "huggingface": "/"
+}
+
+def provider_base_url(provider):
+    """
+    Get the base URL for a provider.
+
+    Args:
+        provider (str): Provider name
+
+    Returns:
+        str: Base URL without a trailing slash
+    """
+    base = os.environ.get(f"{provider.upper()}_BASE_URL") or DEFAULT_BASE_URLS[provider]
+    return base.rstrip("/")
+
+def provider_url(provider):
+    """
+    Get the full endpoint URL for a provider.
+
+    Args:
+        provider (str): Provider name
+
+    Returns:
+        str: Endpoint URL
+    """
+    return provider_base_url(provider) + PROVIDER_PATHS[provider]
+
+# Static system prompt sent with every description request. It is kept as a
+# single constant and always placed first so providers can cache it as a
+# stable prompt prefix.
+SYSTEM_PROMPT = (
+    "You are a comic panel describer that ONLY states what is objectively visible. "
+    "NEVER invent dialogue content, emotions, or scene details. If you see a speech bubble, "
+    "only mention its presence - NEVER guess what's written inside unless the text is clearly legible. "
+    "Describe only physical elements that are definitely present in the image. "
+    "Do not make assumptions about what characters are thinking or feeling unless their expressions are extremely clear. "
+    "Do not use interpretive language - stick to physical descriptions only. "
+    "Your descriptions must be factual enough to charge money for."
+)
+
+def build_chat_payload(user_prompt, system_prompt=SYSTEM_PROMPT, model=None, max_tokens=150, temperature=0.5):
+    """
+    Build an OpenAI-compatible chat completions payload.
+
+    The system prompt comes first and is byte-identical across calls, so
+    OpenAI, Grok and DeepSeek can serve it from their automatic prefix caches.
+    Only the user message varies between requests.
+
+    Args:
+        user_prompt (str): Per-panel prompt
+        system_prompt (str, optional): Static system prompt; no system message is sent if None
+        model (str, optional): Model to use; omitted from the payload if None
+        max_tokens (int): Maximum number of tokens to generate
+        temperature (float): Temperature for sampling
+
+    Returns:
+        dict: Request payload
+    """
+    payload = {}
+    if model:
+        payload["model"] = model
+    payload["messages"] = [{"role": "user", "content": user_prompt}]
+    if system_prompt is not None:
+        payload["messages"].insert(0, {"role": "system", "content": system_prompt})
+    payload["max_tokens"] = max_tokens
+    payload["temperature"] = temperature
+    return payload
+
+def build_anthropic_payload(user_prompt, system_prompt=SYSTEM_PROMPT, model="claude-instant-1.2", max_tokens=150, temperature=0.7):
+    """
+    Build an Anthropic messages payload with a cacheable system prompt.
+
+    The system prompt is sent as a content block marked with an ephemeral
+    cache_control breakpoint, so the static prefix is cached by the provider.
+
+    Args:
+        user_prompt (str): Per-panel prompt
+        system_prompt (str, optional): Static system prompt
+        model (str): Model to use
+        max_tokens (int): Maximum number of tokens to generate
+        temperature (float): Temperature for sampling
+
+    Returns:
+        dict: Request payload
+    """
+    return {
+        "model": model,
+        "max_tokens": max_tokens,
+        "system": [
+            {
+                "type": "text",
+                "text": system_prompt,
+                "cache_control": {"type": "ephemeral"}
+            }
+        ],
+        "messages": [
+            {"role": "user", "content": user_prompt}
+        ],
+        "temperature": temperature
+    }
+
+def extract_usage(provider, result):
+    """
+    Extract prompt and cache token counts from a provider response.
+
+    Args:
+        provider (str): Provider name
+        result (dict): Parsed JSON response
+
+    Returns:
+        dict: prompt_tokens, cached_tokens and cache_write_tokens
+    """
+    usage = (result.get("usage") if isinstance(result, dict) else None) or {}
+
+    if provider == "anthropic":
+        cached = usage.get("cache_read_input_tokens", 0) or 0
+        written = usage.get("cache_creation_input_tokens", 0) or 0
+        prompt = (usage.get("input_tokens", 0) or 0) + cached + written
+    else:
+        details = usage.get("prompt_tokens_details") or {}
+        # DeepSeek reports cache hits under its own field name
+        cached = details.get("cached_tokens", usage.get("prompt_cache_hit_tokens", 0)) or 0
+        written = 0
+        prompt = usage.get("prompt_tokens", 0) or 0
+
+    return {
+        "prompt_tokens": prompt,
+        "cached_tokens": cached,
+        "cache_write_tokens": written
+    }
+
+prompt_cache_requests = metrics_registry.counter(
+    "prompt_cache_requests_total", "Provider responses by prompt-cache hit or miss", ("provider", "result"))
+prompt_cache_tokens = metrics_registry.counter(
+    "prompt_cache_tokens_total", "Prompt tokens reported by providers", ("provider", "kind"))
+provider_request_seconds = metrics_registry.histogram(
+    "provider_request_seconds", "Duration of each provider HTTP attempt", ("provider", "status"))
+provider_queue_seconds = metrics_registry.histogram(
+    "provider_rate_limit_wait_seconds", "Time spent waiting on a provider's rate limiter", ("provider",))
+# Number of providers that failed before one answered, by the source that answered
+fallback_depth = metrics_registry.histogram(
+    "provider_fallback_depth", "Providers that failed before a description was produced", ("source",),
+    buckets=(0, 1, 2, 3, 4, 5, 6))
+
+class PromptCacheStats:
+    """Thread-safe running totals of prompt-cache usage per provider."""
+
+    def __init__(self):
+        """Initialize empty totals."""
+        self._lock = threading.Lock()
+        self._totals = {}
+
+    def record(self, provider, result):
+        """
+        Record the token usage reported in a provider response.
+
+        Args:
+            provider (str): Provider name
+            result (dict): Parsed JSON response
+
+        Returns:
+            dict: Usage extracted from this response
+        """
+        usage = extract_usage(provider, result)
+        with self._lock:
+            totals = self._totals.setdefault(provider, {
+                "requests": 0,
+                "prompt_tokens": 0,
+                "cached_tokens": 0,
+                "cache_write_tokens": 0
+            })
+            totals["requests"] += 1
+            for key, value in usage.items():
+                totals[key] += value
+
+        prompt_cache_requests.inc(provider=provider, result="hit" if usage["cached_tokens"] else "miss")
+        for key, value in usage.items():
+            if value:
+                prompt_cache_tokens.inc(value, provider=provider, kind=key)
+
+        if usage["cached_tokens"] or usage["cache_write_tokens"]:
+            logger.info(
+                f"{provider} prompt cache: {usage['cached_tokens']} cached, "
+                f"{usage['cache_write_tokens']} written of {usage['prompt_tokens']} prompt tokens"
+            )
+        return usage
+
+    def snapshot(self):
+        """
+        Get a copy of the current totals.
+
+        Returns:
+            dict: Totals keyed by provider
+        """
+        with self._lock:
+            return {provider: dict(totals) for provider, totals in self._totals.items()}
+
+# Process-wide stats shared by every provider client
+prompt_cache_stats = PromptCacheStats()
+
+# Header carrying the caller's remaining time budget in seconds
+DEADLINE_HEADER = "X-Request-Budget"
+
+class Deadline:
+    """Request-scoped time budget shared by every stage of a request."""
+
+    def __init__(self, seconds):
+        """
+        Start a budget that expires the given number of seconds from now.
+
+        Args:
+            seconds (float): Total budget
+        """
+        self.expires_at = time.monotonic() + max(0.0, float(seconds))
+
+    @classmethod
+    def from_header(cls, value, default_seconds):
+        """
+        Build a deadline from a budget header, capped at a server default.
+
+        Args:
+            value (str): Header value in seconds, may be None or malformed
+            default_seconds (float): Budget to use when the header is absent
+
+        Returns:
+            Deadline: The tighter of the two budgets
+        """
+        seconds = default_seconds
+        if value:
+            try:
+                seconds = min(seconds, float(value))
+            except ValueError:
+                pass
+        return cls(seconds)
+
+    def remaining(self):
+        """
+        Get the time left in the budget.
+
+        Returns:
+            float: Seconds remaining, never negative
+        """
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        """Whether the budget is used up."""
+        return self.remaining() <= 0
+
+    def timeout_for(self, timeout):
+        """
+        Clamp a per-attempt timeout to the remaining budget.
+
+        Args:
+            timeout (float): The stage's own timeout
+
+        Returns:
+            float: min(timeout, remaining budget)
+        """
+        return min(timeout, self.remaining())
+
+    def can_fit(self, seconds):
+        """
+        Whether at least the given time is left.
+
+        Args:
+            seconds (float): Minimum useful time for the next attempt
+
+        Returns:
+            bool: True if the attempt fits in the budget
+        """
+        return self.remaining() >= seconds
+
+# Status codes that mean "slow down and try the same provider again"
+RETRYABLE_STATUS_CODES = {429, 503, 529}
+
+class RateLimitExceeded(Exception):
+    """Raised when a request cannot be admitted by the rate limiter in time."""
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at a per-minute rate.
+
+    Callers reserve capacity up front and are told how long to wait, so
+    concurrent callers queue in arrival order and are paced evenly instead of
+    all retrying at once.
+    """
+
+    def __init__(self, rate_per_minute, capacity=None):
+        """
+        Initialize a full bucket.
+
+        Args:
+            rate_per_minute (float): Refill rate
+            capacity (float, optional): Burst size. Defaults to ten seconds of quota,
+                which keeps bursts small enough that sustained throughput stays
+                close to the quota.
+        """
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(capacity or max(1.0, rate_per_minute / 6.0))
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount, now):
+        """
+        Take capacity from the bucket, possibly going into debt.
+
+        Args:
+            amount (float): Capacity to take
+            now (float): Current monotonic time
+
+        Returns:
+            float: Seconds the caller must wait before proceeding
+        """
+        self._refill(now)
+        self.level -= min(amount, self.capacity)
+        return max(0.0, -self.level / self.rate)
+
+    def refund(self, amount):
+        """
+        Return capacity that was reserved but not used.
+
+        Args:
+            amount (float): Capacity to return
+        """
+        self.level = min(self.capacity, self.level + amount)
+
+class ProviderRateLimiter:
+    """Requests-per-minute and tokens-per-minute limits for one provider."""
+
+    def __init__(self, provider, rpm=None, tpm=None):
+        """
+        Initialize the limiter.
+
+        Args:
+            provider (str): Provider name
+            rpm (float, optional): Requests per minute; unlimited if None
+            tpm (float, optional): Tokens per minute; unlimited if None
+        """
+        self.provider = provider
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=0, max_wait=None):
+        """
+        Wait until a request of the given size may be sent.
+
+        Args:
+            tokens (int): Estimated tokens for the request
+            max_wait (float, optional): Longest acceptable wait in seconds
+
+        Returns:
+            float: Tokens reserved, which is less than asked for a request larger
+                than the bucket; pass it to settle once the real count is known
+
+        Raises:
+            RateLimitExceeded: If the wait would exceed max_wait
+        """
+        reserved = min(tokens, self.tokens.capacity) if self.tokens and tokens else 0
+        with self._lock:
+            now = time.monotonic()
+            wait = max(0.0, self.blocked_until - now)
+            if self.requests:
+                wait = max(wait, self.requests.reserve(1, now))
+            if reserved:
+                wait = max(wait, self.tokens.reserve(reserved, now))
+
+            if max_wait is not None and wait > max_wait:
+                # Give the reservation back so queued callers are not delayed by it
+                if self.requests:
+                    self.requests.refund(1)
+                if reserved:
+                    self.tokens.refund(reserved)
+                raise RateLimitExceeded(f"{self.provider} rate limit: wait of {wait:.2f}s exceeds {max_wait:.2f}s")
+
+        if wait > 0:
+            logger.info(f"Rate limiting {self.provider}: waiting {wait:.2f}s")
+            time.sleep(wait)
+        return reserved
+
+    def wait_unblocked(self, max_wait=None):
+        """
+        Wait out a block without reserving anything, e.g. before retrying a request
+        whose capacity was already reserved by acquire.
+
+        Args:
+            max_wait (float, optional): Longest acceptable wait in seconds
+
+        Raises:
+            RateLimitExceeded: If the wait would exceed max_wait
+        """
+        with self._lock:
+            wait = max(0.0, self.blocked_until - time.monotonic())
+        if max_wait is not None and wait > max_wait:
+            raise RateLimitExceeded(f"{self.provider} rate limit: wait of {wait:.2f}s exceeds {max_wait:.2f}s")
+        if wait > 0:
+            logger.info(f"Rate limiting {self.provider}: waiting {wait:.2f}s")
+            time.sleep(wait)
+
+    def settle(self, reserved, actual):
+        """
+        Correct the token bucket once the real token count is known.
+
+        Args:
+            reserved (float): Tokens reserved by acquire
+            actual (int): Tokens reported by the provider
+        """
+        if not self.tokens or not actual:
+            return
+        with self._lock:
+            self.tokens.refund(reserved - actual)
+
+    def block(self, seconds):
+        """
+        Hold back every caller for this provider, e.g. after a 429.
+
+        Args:
+            seconds (float): How long to block
+        """
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+def _env_number(name):
+    value = os.environ.get(name, "")
+    return float(value) if value else None
+
+def get_rate_limiter(provider):
+    """
+    Get the process-wide rate limiter for a provider.
+
+    Limits come from <PROVIDER>_RPM and <PROVIDER>_TPM environment variables,
+    e.g. OPENAI_RPM=500; a provider without limits is never throttled locally.
+
+    Args:
+        provider (str): Provider name
+
+    Returns:
+        ProviderRateLimiter: Shared limiter
+    """
+    with _rate_limiters_lock:
+        limiter = _rate_limiters.get(provider)
+        if limiter is None:
+            prefix = provider.upper()
+            limiter = ProviderRateLimiter(provider, _env_number(f"{prefix}_RPM"), _env_number(f"{prefix}_TPM"))
+            _rate_limiters[provider] = limiter
+        return limiter
+
+def estimate_tokens(payload):
+    """
+    Roughly estimate the tokens a request will consume.
+
+    Args:
+        payload (dict): Request payload
+
+    Returns:
+        int: Estimated prompt plus completion tokens
+    """
+    completion = payload.get("max_tokens") or payload.get("parameters", {}).get("max_length", 0)
+    return len(json.dumps(payload)) // 4 + completion
+
+def _reported_tokens(result):
+    """Total tokens reported in a provider response, or 0 if unknown."""
+    usage = (result.get("usage") if isinstance(result, dict) else None) or {}
+    if "total_tokens" in usage:
+        return usage["total_tokens"]
+    return sum(usage.get(key, 0) or 0 for key in (
+        "input_tokens", "output_tokens", "cache_read_input_tokens", "cache_creation_input_tokens"
+    ))
+
+def parse_retry_after(headers):
+    """
+    Read how long the provider asked us to wait.
+
+    Args:
+        headers (Mapping): Response headers
+
+    Returns:
+        float: Seconds to wait, or None if the provider did not say
+    """
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000.0
+        except ValueError:
+            pass
+
+    value = headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        parsed = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        # Neither seconds nor an HTTP date, e.g. "soon"
+        return None
+    if parsed is None:
+        return None
+    return max(0.0, parsed.timestamp() - time.time())
+
+def backoff_delay(attempt, retry_after=None, base=0.5, cap=30.0):
+    """
+    Compute a jittered exponential backoff that honors Retry-After.
+
+    Args:
+        attempt (int): Zero-based retry attempt
+        retry_after (float, optional): Delay requested by the provider
+        base (float): Delay for the first retry
+        cap (float): Upper bound on the exponential part
+
+    Returns:
+        float: Seconds to wait
+    """
+    delay = random.uniform(0, min(cap, base * (2 ** attempt)))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+def post_with_retry(provider, url, payload, headers, timeout, max_retries=None, max_wait=None, deadline=None):
+    """
+    POST to a provider through its rate limiter, retrying on 429/503.
+
+    Every call first waits for room under the provider's request and token
+    quotas. A rate-limit response blocks the whole provider for the advertised
+    Retry-After (or a jittered exponential backoff), so concurrent callers back
+    off together, and the request is retried on the same provider. Quota is
+    reserved once per request, not once per attempt.
+
+    Args:
+        provider (str): Provider name
+        url (str): Endpoint URL
+        payload (dict): JSON payload
+        headers (dict): Request headers
+        timeout (float): Per-attempt timeout in seconds
+        max_retries (int, optional): Retries after a rate-limit response.
+            Defaults to RATE_LIMIT_MAX_RETRIES or 2.
+        max_wait (float, optional): Longest time to queue for the limiter or a
+            backoff. Defaults to RATE_LIMIT_MAX_WAIT or 10 seconds.
+        deadline (Deadline, optional): Request budget; clamps every timeout,
+            queueing wait and backoff to the time that is left
+
+    Returns:
+        requests.Response: The last response received
+
+    Raises:
+        RateLimitExceeded: If the request could not be sent within max_wait
+        requests.Timeout: If the deadline runs out before an attempt can start
+    """
+    if max_retries is None:
+        max_retries = int(os.environ.get("RATE_LIMIT_MAX_RETRIES", 2))
+    if max_wait is None:
+        max_wait = float(os.environ.get("RATE_LIMIT_MAX_WAIT", 10))
+
+    limiter = get_rate_limiter(provider)
+    reserved = 0
+
+    for attempt in range(max_retries + 1):
+        wait_budget = max_wait if deadline is None else min(max_wait, deadline.remaining())
+        with span(f"ratelimit.{provider}"), provider_queue_seconds.time(provider=provider):
+            # One reservation per request; retries only wait out the provider's block
+            if attempt == 0:
+                reserved = limiter.acquire(estimate_tokens(payload), wait_budget)
+            else:
+                limiter.wait_unblocked(wait_budget)
+
+        attempt_timeout = timeout if deadline is None else deadline.timeout_for(timeout)
+        if attempt_timeout <= 0:
+            raise requests.Timeout(f"{provider}: request deadline exceeded")
+        with span(f"provider.{provider}", attempt=attempt) as attempt_span:
+            start = time.perf_counter()
+            try:
+                response = requests.post(url, json=payload, headers=headers, timeout=attempt_timeout)
+            except requests.Timeout:
+                provider_request_seconds.observe(time.perf_counter() - start, provider=provider, status="timeout")
+                raise
+            except requests.RequestException:
+                provider_request_seconds.observe(time.perf_counter() - start, provider=provider, status="error")
+                raise
+            provider_request_seconds.observe(time.perf_counter() - start, provider=provider,
+                                             status=str(response.status_code))
+            if attempt_span is not None:
+                attempt_span.set_attribute("status", response.status_code)
+
+        if response.status_code not in RETRYABLE_STATUS_CODES:
+            if response.status_code == 200:
+                try:
+                    limiter.settle(reserved, _reported_tokens(response.json()))
+                except ValueError:
+                    pass
+            return response
+
+        delay = backoff_delay(attempt, parse_retry_after(response.headers))
+        wait_budget = max_wait if deadline is None else min(max_wait, deadline.remaining())
+        if attempt == max_retries or delay > wait_budget:
+            logger.warning(f"{provider} returned {response.status_code}; giving up after {attempt + 1} attempt(s)")
+            return response
+
+        logger.warning(f"{provider} returned {response.status_code}; retrying in {delay:.2f}s")
+        limiter.block(delay)
+
+    return response
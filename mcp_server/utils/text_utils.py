@@ -0,0 +1,97 @@
+"""Text post-processing utilities shared by the app and the Comic Panel MCP Server."""
+
+import re
+
+# Speculative phrases to remove or replace, in priority order.
+# When several rules match at the same position the earlier rule wins.
+SPECULATIVE_PHRASES = [
+    # Phrases that suggest dialogue content
+    (r'saying "[^"]*"', "with a speech bubble"),
+    (r'says "[^"]*"', "has a speech bubble"),
+    (r'reads "[^"]*"', "contains text"),
+    (r'exclaims "[^"]*"', "has a speech bubble"),
+    (r'thinking "[^"]*"', "is present"),
+
+    # Phrases that suggest emotions or thoughts
+    (r'appears to be (?:feeling|thinking|considering)', "is"),
+    (r'seems to be (?:happy|sad|angry|excited|nervous|worried|concerned|thinking)', "is"),
+    (r'looks (?:happy|sad|angry|excited|nervous|worried|concerned)', "is visible"),
+
+    # Phrases that suggest narrative context
+    (r'is about to', "is"),
+    (r'is going to', "is"),
+    (r'is trying to', "is"),
+    (r'is planning to', "is"),
+    (r'has just', "is"),
+    (r'had just', "is"),
+
+    # Phrases that suggest interpretation
+    (r'probably', ""),
+    (r'possibly', ""),
+    (r'perhaps', ""),
+    (r'maybe', ""),
+    (r'might be', "is"),
+    (r'could be', "is"),
+    (r'would be', "is"),
+    (r'appears to be', "is"),
+    (r'seems to be', "is"),
+    (r'looks like', "shows"),
+]
+
+def _compile_rules(rules):
+    """
+    Compile a rule list into a single alternation pattern and a dispatch table.
+
+    Each rule becomes a named group, so the name of the group that matched
+    selects the replacement. Matches are anchored to the start of a word and
+    guarded by a lookahead on the rules' first letters, which lets the regex
+    engine skip most positions without trying every alternative.
+
+    Args:
+        rules (list): (pattern, replacement) pairs, each starting with a literal letter
+
+    Returns:
+        tuple: (compiled pattern, dict mapping group name to replacement)
+    """
+    alternatives = []
+    replacements = {}
+    first_letters = set()
+    for index, (pattern, replacement) in enumerate(rules):
+        name = f"r{index}"
+        alternatives.append(f"(?P<{name}>{pattern})")
+        replacements[name] = replacement
+        first_letters.add(pattern[0].lower())
+
+    guard = r"\b(?=[" + "".join(sorted(first_letters)) + "])"
+    return re.compile(guard + "(?:" + "|".join(alternatives) + ")", re.IGNORECASE), replacements
+
+_SPECULATIVE_PATTERN, _SPECULATIVE_REPLACEMENTS = _compile_rules(SPECULATIVE_PHRASES)
+_WHITESPACE_PATTERN = re.compile(r'\s+')
+
+def _replace_speculative(match):
+    """Look up the replacement for whichever rule matched."""
+    return _SPECULATIVE_REPLACEMENTS[match.lastgroup]
+
+def remove_speculative_language(text):
+    """
+    Remove speculative language in a single pass over the text.
+
+    Args:
+        text (str): Description text
+
+    Returns:
+        str: Cleaned description text
+    """
+    return _SPECULATIVE_PATTERN.sub(_replace_speculative, text)
+
+def collapse_whitespace(text):
+    """
+    Collapse runs of whitespace into single spaces.
+
+    Args:
+        text (str): Text to clean
+
+    Returns:
+        str: Cleaned text
+    """
+    return _WHITESPACE_PATTERN.sub(' ', text)
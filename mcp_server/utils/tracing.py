@@ -0,0 +1,328 @@
+"""
+Request tracing shared by the app and the Comic Panel MCP Server.
+
+A trace starts at the web entry point and follows a request through the API
+server, the MCP server and the provider calls. Between HTTP services the
+context travels in the W3C traceparent header; MCP tool calls carry it in the
+_trace argument. Each process records its own spans, summarizes them in a
+Server-Timing header and, when TRACE_EXPORT_PATH is set, appends them to a
+trace file that chrome://tracing or Perfetto can open.
+"""
+
+import contextvars
+import json
+import logging
+import os
+import re
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger("comic-mcp-server")
+
+TRACEPARENT_HEADER = "traceparent"
+TRACE_ARGUMENT = "_trace"
+
+# File that finished spans are appended to; empty disables export.
+# TRACE_EXPORT_FORMAT is "chrome" (trace event JSON array) or "json" (one span per line).
+TRACE_EXPORT_PATH = os.environ.get("TRACE_EXPORT_PATH", "")
+TRACE_EXPORT_FORMAT = os.environ.get("TRACE_EXPORT_FORMAT", "chrome")
+
+_TRACEPARENT_RE = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+# Characters allowed in a Server-Timing metric name
+_TIMING_NAME_RE = re.compile(r"[^A-Za-z0-9!#$%&'*+.^_`|~-]")
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_export_lock = threading.Lock()
+
+class Trace:
+    """Spans recorded in this process for one trace."""
+
+    def __init__(self, trace_id=None):
+        """
+        Initialize the trace.
+
+        Args:
+            trace_id (str, optional): 32 hex digit id to continue; a new one is generated if omitted
+        """
+        self.trace_id = trace_id or secrets.token_hex(16)
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        """Record a finished span."""
+        with self._lock:
+            self.spans.append(span)
+
+    def finished_spans(self):
+        """
+        Get the spans finished so far.
+
+        Returns:
+            list: Finished spans in completion order
+        """
+        with self._lock:
+            return list(self.spans)
+
+class Span:
+    """One timed stage of a request."""
+
+    def __init__(self, trace, name, parent_id=None, attributes=None):
+        """
+        Start the span.
+
+        Args:
+            trace (Trace): Trace the span belongs to
+            name (str): Stage name, e.g. "analyze" or "provider.openai"
+            parent_id (str, optional): Span id of the parent, possibly in another process
+            attributes (dict, optional): Extra fields recorded with the span
+        """
+        self.trace = trace
+        self.name = name
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.start_time = time.time()
+        self.thread_id = threading.get_native_id()
+        self.duration = None
+        self._start = time.perf_counter()
+
+    @property
+    def traceparent(self):
+        """W3C traceparent value that makes this span the parent of a remote span."""
+        return f"00-{self.trace.trace_id}-{self.span_id}-01"
+
+    def elapsed(self):
+        """Seconds since the span started, or its duration once finished."""
+        if self.duration is not None:
+            return self.duration
+        return time.perf_counter() - self._start
+
+    def set_attribute(self, key, value):
+        """Record an extra field on the span."""
+        self.attributes[key] = value
+
+    def finish(self):
+        """End the span, record it on its trace and export it."""
+        self.duration = time.perf_counter() - self._start
+        self.trace.add(self)
+        export_span(self)
+
+    def to_dict(self):
+        """
+        Convert the span to a JSON-serializable dict.
+
+        Returns:
+            dict: Span fields with times in seconds
+        """
+        return {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start_time,
+            "duration": self.duration,
+            "pid": os.getpid(),
+            "tid": self.thread_id,
+            "attributes": self.attributes
+        }
+
+def parse_traceparent(value):
+    """
+    Parse a W3C traceparent value.
+
+    Args:
+        value (str): Header or argument value, may be None or malformed
+
+    Returns:
+        tuple: (trace_id, parent_span_id), or None if the value is not valid
+    """
+    if not value:
+        return None
+    match = _TRACEPARENT_RE.match(value.strip().lower())
+    if match is None or set(match.group(1)) == {"0"}:
+        return None
+    return match.group(1), match.group(2)
+
+def begin_trace(name, traceparent=None, **attributes):
+    """
+    Start this process's root span, continuing the caller's trace if given.
+
+    Use start_trace where a with block fits; this form is for request hooks.
+
+    Args:
+        name (str): Root span name
+        traceparent (str, optional): Caller's traceparent value
+        **attributes: Extra fields recorded with the span
+
+    Returns:
+        tuple: (root Span, token to pass to end_trace)
+    """
+    parent = parse_traceparent(traceparent)
+    trace = Trace(parent[0] if parent else None)
+    root = Span(trace, name, parent[1] if parent else None, attributes)
+    return root, _current_span.set(root)
+
+def end_trace(root, token, finish=True):
+    """
+    Finish a root span started with begin_trace.
+
+    Args:
+        root (Span): Root span
+        token: Token returned by begin_trace
+        finish (bool, optional): Whether to end the span now; pass False to
+            only detach it from the current context and call root.finish()
+            later, e.g. once a streamed response is sent. Defaults to True.
+    """
+    _current_span.reset(token)
+    if finish:
+        root.finish()
+
+@contextmanager
+def start_trace(name, traceparent=None, **attributes):
+    """
+    Run a block as this process's root span.
+
+    Args:
+        name (str): Root span name
+        traceparent (str, optional): Caller's traceparent value
+        **attributes: Extra fields recorded with the span
+    """
+    root, token = begin_trace(name, traceparent, **attributes)
+    try:
+        yield root
+    finally:
+        end_trace(root, token)
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Time a block as a child of the current span.
+
+    Outside a trace this does nothing and yields None.
+
+    Args:
+        name (str): Stage name
+        **attributes: Extra fields recorded with the span
+    """
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+
+    child = Span(parent.trace, name, parent.span_id, attributes)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except Exception as e:
+        child.set_attribute("error", str(e))
+        raise
+    finally:
+        _current_span.reset(token)
+        child.finish()
+
+def current_span():
+    """Get the active span, or None outside a trace."""
+    return _current_span.get()
+
+def inject_headers(headers=None):
+    """
+    Add the traceparent header for an outgoing HTTP request.
+
+    Args:
+        headers (dict, optional): Headers to extend
+
+    Returns:
+        dict: A copy of headers, with traceparent when a trace is active
+    """
+    headers = dict(headers or {})
+    active = _current_span.get()
+    if active is not None:
+        headers[TRACEPARENT_HEADER] = active.traceparent
+    return headers
+
+def inject_arguments(arguments):
+    """
+    Add the trace context to MCP tool arguments.
+
+    Args:
+        arguments (dict): Tool arguments
+
+    Returns:
+        dict: A copy of arguments, with _trace when a trace is active
+    """
+    arguments = dict(arguments)
+    active = _current_span.get()
+    if active is not None:
+        arguments[TRACE_ARGUMENT] = active.traceparent
+    return arguments
+
+def server_timing(root):
+    """
+    Summarize a trace's stages for a Server-Timing header.
+
+    Spans with the same name are added together; the root span is reported
+    as total.
+
+    Args:
+        root (Span): Root span of the request
+
+    Returns:
+        str: Header value, e.g. "analyze;dur=41.2, describe;dur=230.9, total;dur=275.0"
+    """
+    totals = {}
+    for finished in root.trace.finished_spans():
+        if finished is root:
+            continue
+        name = _TIMING_NAME_RE.sub("-", finished.name)
+        totals[name] = totals.get(name, 0.0) + finished.duration
+
+    entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in totals.items()]
+    entries.append(f"total;dur={root.elapsed() * 1000:.1f}")
+    return ", ".join(entries)
+
+def _chrome_event(finished):
+    """Convert a span to a Chrome trace "complete" event."""
+    args = {"trace_id": finished.trace.trace_id, "span_id": finished.span_id, "parent_id": finished.parent_id}
+    args.update(finished.attributes)
+    return {
+        "name": finished.name,
+        "cat": "comic-panel",
+        "ph": "X",
+        "ts": round(finished.start_time * 1e6),
+        "dur": round(finished.duration * 1e6),
+        "pid": os.getpid(),
+        "tid": finished.thread_id,
+        "args": args
+    }
+
+def export_span(finished):
+    """
+    Append a finished span to TRACE_EXPORT_PATH, if set.
+
+    The Chrome format is a JSON array whose closing bracket is left off, which
+    the trace viewers accept, so spans from several processes can be appended
+    to the same file.
+
+    Args:
+        finished (Span): Finished span
+    """
+    if not TRACE_EXPORT_PATH:
+        return
+
+    chrome = TRACE_EXPORT_FORMAT != "json"
+    if chrome:
+        line = json.dumps(_chrome_event(finished), default=str) + ",\n"
+    else:
+        line = json.dumps(finished.to_dict(), default=str) + "\n"
+
+    try:
+        with _export_lock:
+            with open(TRACE_EXPORT_PATH, "a") as trace_file:
+                if chrome and trace_file.tell() == 0:
+                    trace_file.write("[\n")
+                trace_file.write(line)
+    except OSError as e:
+        logger.warning(f"Could not export span to {TRACE_EXPORT_PATH}: {str(e)}")
@@ -0,0 +1,366 @@
+"""
+Local stand-in server for the text generation providers.
+
+Speaks the OpenAI chat completions format (also used for Grok and DeepSeek),
+the Anthropic messages format and the Hugging Face inference format, with
+configurable latency, error rates, 429s and timeouts. Point the app at it with
+<PROVIDER>_BASE_URL environment variables to load-test the provider chain
+offline without paying for real calls.
+
+Every random decision is drawn from a generator seeded with the server seed,
+the provider and the request's sequence number, so a run with the same seed
+and arrival order behaves the same way every time.
+
+Usage:
+    python stub_provider_server.py --port 9000 --latency lognormal:-1.5,0.5 \
+        --error-rate 0.05 --rate-limit-rate 0.05 --timeout-rate 0.01 --seed 1
+
+Then, in another shell:
+    export OPENAI_BASE_URL=http://localhost:9000/openai/v1
+    export ANTHROPIC_BASE_URL=http://localhost:9000/anthropic/v1
+    export HUGGINGFACE_BASE_URL=http://localhost:9000/huggingface/models
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STUB_DESCRIPTION = "Two characters visible in a static scene."
+
+def parse_latency(spec):
+    """
+    Parse a latency distribution spec into a sampling function.
+
+    Supported forms (all in seconds):
+        fixed:0.2
+        uniform:0.1,0.5
+        exponential:0.3          (mean)
+        lognormal:-1.5,0.5       (mu, sigma of the underlying normal)
+
+    Args:
+        spec (str): Distribution spec
+
+    Returns:
+        callable: Function taking a random.Random and returning a delay
+    """
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",")] if args else []
+
+    if kind == "fixed":
+        return lambda rng: values[0]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "exponential":
+        return lambda rng: rng.expovariate(1.0 / values[0]) if values[0] > 0 else 0.0
+    if kind == "lognormal":
+        return lambda rng: rng.lognormvariate(values[0], values[1])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+class StubConfig:
+    """Behaviour of the stand-in server for one provider (or all of them)."""
+
+    def __init__(self, latency="fixed:0", error_rate=0.0, rate_limit_rate=0.0, timeout_rate=0.0,
+                 retry_after=1.0, hang_seconds=30.0, rpm=None, text=STUB_DESCRIPTION):
+        """
+        Initialize the configuration.
+
+        Args:
+            latency (str): Latency distribution spec, see parse_latency
+            error_rate (float): Fraction of requests answered with a 500
+            rate_limit_rate (float): Fraction of requests answered with a 429
+            timeout_rate (float): Fraction of requests that hang for hang_seconds
+            retry_after (float): Retry-After value sent with 429 responses
+            hang_seconds (float): How long a "timed out" request hangs
+            rpm (float, optional): Enforce a real requests-per-minute quota with 429s
+            text (str): Generated text returned on success
+        """
+        self.latency = latency
+        self.sample_latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.timeout_rate = timeout_rate
+        self.retry_after = retry_after
+        self.hang_seconds = hang_seconds
+        self.rpm = rpm
+        self.text = text
+
+class StubProviderServer(ThreadingHTTPServer):
+    """Threaded HTTP server holding the stand-in state."""
+
+    daemon_threads = True
+    # Load tests open hundreds of connections at once
+    request_queue_size = 1024
+
+    def __init__(self, address, config=None, provider_configs=None, seed=0, record=False):
+        """
+        Initialize the server.
+
+        Args:
+            address (tuple): (host, port); port 0 picks a free port
+            config (StubConfig, optional): Default behaviour
+            provider_configs (dict, optional): Per-provider StubConfig overrides
+            seed (int): Seed for every random decision
+            record (bool): Keep (path, body) of every request in self.received
+        """
+        super().__init__(address, StubProviderHandler)
+        self.config = config or StubConfig()
+        self.provider_configs = provider_configs or {}
+        self.seed = seed
+        self.record = record
+        self.received = []
+        self.stats = {}
+        self._counters = {}
+        self._windows = {}
+        self._seen_prefixes = set()
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        """Base URL of the running server."""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def base_urls(self):
+        """
+        Base URLs to put in <PROVIDER>_BASE_URL for each provider.
+
+        Returns:
+            dict: Provider name to base URL
+        """
+        return {
+            "openai": f"{self.url}/openai/v1",
+            "anthropic": f"{self.url}/anthropic/v1",
+            "grok": f"{self.url}/grok/v1",
+            "deepseek": f"{self.url}/deepseek/v1",
+            "huggingface": f"{self.url}/huggingface/models"
+        }
+
+    def config_for(self, provider):
+        return self.provider_configs.get(provider, self.config)
+
+    def next_random(self, provider):
+        """Deterministic generator for this provider's next request."""
+        with self._lock:
+            index = self._counters.get(provider, 0)
+            self._counters[provider] = index + 1
+        return random.Random(f"{self.seed}:{provider}:{index}")
+
+    def over_quota(self, provider, rpm):
+        """
+        Check a sliding one-minute request window.
+
+        Returns:
+            float: Seconds until a slot frees up, or 0 if the request is admitted
+        """
+        now = time.monotonic()
+        with self._lock:
+            window = [t for t in self._windows.get(provider, []) if now - t < 60.0]
+            if len(window) >= rpm:
+                self._windows[provider] = window
+                return 60.0 - (now - window[0])
+            window.append(now)
+            self._windows[provider] = window
+            return 0.0
+
+    def prefix_seen(self, prefix):
+        """Emulate provider prefix caching: report whether a prefix was sent before."""
+        digest = hashlib.sha256(prefix.encode()).hexdigest()
+        with self._lock:
+            seen = digest in self._seen_prefixes
+            self._seen_prefixes.add(digest)
+        return seen
+
+    def count(self, provider, outcome):
+        with self._lock:
+            provider_stats = self.stats.setdefault(provider, {})
+            provider_stats[outcome] = provider_stats.get(outcome, 0) + 1
+
+class StubProviderHandler(BaseHTTPRequestHandler):
+    """Request handler answering in each provider's response format."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _provider(self):
+        """Work out which provider format a path asks for."""
+        first = self.path.strip("/").split("/", 1)[0]
+        if first in ("openai", "anthropic", "grok", "deepseek", "huggingface"):
+            return first
+        if self.path.endswith("/messages"):
+            return "anthropic"
+        if "/models/" in self.path:
+            return "huggingface"
+        return "openai"
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/stats":
+            with self.server._lock:
+                self._send_json(200, self.server.stats)
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        provider = self._provider()
+        config = self.server.config_for(provider)
+        rng = self.server.next_random(provider)
+
+        if self.server.record:
+            with self.server._lock:
+                self.server.received.append((self.path, body))
+
+        time.sleep(max(0.0, config.sample_latency(rng)))
+
+        if config.rpm:
+            wait = self.server.over_quota(provider, config.rpm)
+            if wait:
+                self.server.count(provider, "429")
+                self._send_json(429, {"error": {"type": "rate_limit_error", "message": "quota exceeded"}},
+                                {"Retry-After": f"{math.ceil(wait)}"})
+                return
+
+        roll = rng.random()
+        if roll < config.timeout_rate:
+            self.server.count(provider, "timeout")
+            time.sleep(config.hang_seconds)
+            self._send_json(504, {"error": {"type": "timeout", "message": "stand-in timeout"}})
+            return
+        roll -= config.timeout_rate
+        if roll < config.rate_limit_rate:
+            self.server.count(provider, "429")
+            self._send_json(429, {"error": {"type": "rate_limit_error", "message": "rate limited"}},
+                            {"Retry-After": f"{config.retry_after:g}"})
+            return
+        roll -= config.rate_limit_rate
+        if roll < config.error_rate:
+            self.server.count(provider, "500")
+            self._send_json(500, {"error": {"type": "server_error", "message": "stand-in error"}})
+            return
+
+        self.server.count(provider, "200")
+        if provider == "anthropic":
+            self._send_json(200, self._anthropic_response(body, config))
+        elif provider == "huggingface":
+            self._send_json(200, [{"generated_text": f"{body.get('inputs', '')} {config.text}"}])
+        else:
+            self._send_json(200, self._chat_response(body, config))
+
+    def _chat_response(self, body, config):
+        messages = body.get("messages", [])
+        system = next((m["content"] for m in messages if m.get("role") == "system"), "")
+        prompt_tokens = len(json.dumps(messages)) // 4
+        cached = len(system) // 4 if system and self.server.prefix_seen(system) else 0
+        completion_tokens = len(config.text) // 4
+        return {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "model": body.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": config.text},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "prompt_tokens_details": {"cached_tokens": cached}
+            }
+        }
+
+    def _anthropic_response(self, body, config):
+        system = body.get("system", "")
+        system_text = "".join(block.get("text", "") for block in system) if isinstance(system, list) else system
+        cacheable = isinstance(system, list) and any("cache_control" in block for block in system)
+        system_tokens = len(system_text) // 4
+        cached = written = 0
+        if cacheable:
+            if self.server.prefix_seen(system_text):
+                cached = system_tokens
+            else:
+                written = system_tokens
+        return {
+            "id": "msg_stub",
+            "type": "message",
+            "role": "assistant",
+            "model": body.get("model", "stub"),
+            "content": [{"type": "text", "text": config.text}],
+            "stop_reason": "end_turn",
+            "usage": {
+                "input_tokens": len(json.dumps(body.get("messages", []))) // 4 + (0 if cacheable else system_tokens),
+                "cache_read_input_tokens": cached,
+                "cache_creation_input_tokens": written,
+                "output_tokens": len(config.text) // 4
+            }
+        }
+
+def start_stub_server(config=None, provider_configs=None, seed=0, host="127.0.0.1", port=0, record=False):
+    """
+    Start the stand-in server on a background thread.
+
+    Args:
+        config (StubConfig, optional): Default behaviour
+        provider_configs (dict, optional): Per-provider overrides
+        seed (int): Seed for every random decision
+        host (str): Interface to bind
+        port (int): Port to bind; 0 picks a free port
+        record (bool): Keep every request body in server.received
+
+    Returns:
+        StubProviderServer: Running server; call shutdown() when done
+    """
+    server = StubProviderServer((host, port), config, provider_configs, seed, record)
+    thread = threading.Thread(target=server.serve_forever, name="stub-provider-server", daemon=True)
+    thread.start()
+    return server
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description="Local stand-in for the text generation providers")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency", default="fixed:0", help="fixed:S | uniform:A,B | exponential:MEAN | lognormal:MU,SIGMA")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--timeout-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--hang-seconds", type=float, default=30.0)
+    parser.add_argument("--rpm", type=float, default=None, help="Enforce a requests-per-minute quota")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    config = StubConfig(args.latency, args.error_rate, args.rate_limit_rate, args.timeout_rate,
+                        args.retry_after, args.hang_seconds, args.rpm)
+    server = StubProviderServer((args.host, args.port), config, seed=args.seed)
+
+    print(f"Stand-in provider server listening on {server.url}")
+    for provider, url in server.base_urls().items():
+        print(f"  export {provider.upper()}_BASE_URL={url}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == '__main__':
+    main()
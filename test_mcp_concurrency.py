@@ -0,0 +1,103 @@
+"""
+Tests that the MCP server's tool handlers do not block its event loop.
+
+Provider calls go to the bundled stand-in server with a fixed latency, so
+several analyses running at once should finish in about one provider latency
+rather than one latency each, while a heartbeat coroutine keeps ticking.
+
+Usage:
+    python -m pytest test_mcp_concurrency.py
+"""
+
+import asyncio
+import json
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from mcp_server.utils import api_utils
+from mcp_server.utils.panel_analysis import analyze_panel
+from mcp_server.utils.provider_utils import provider_url
+from stub_provider_server import StubConfig, start_stub_server
+
+PROVIDER_LATENCY = 0.5
+CONCURRENT_CALLS = 4
+
+@pytest.fixture
+def stand_in(monkeypatch):
+    """Run the stand-in server with a fixed latency and point the MCP provider client at it."""
+    server = start_stub_server(StubConfig(f"fixed:{PROVIDER_LATENCY}"))
+    for provider, url in server.base_urls().items():
+        monkeypatch.setenv(f"{provider.upper()}_BASE_URL", url)
+    client = api_utils.api_client
+    monkeypatch.setattr(client, "keys", {"openai": "test", "anthropic": "", "grok": "", "deepseek": ""})
+    monkeypatch.setattr(client, "urls", {provider: provider_url(provider) for provider in client.keys})
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def make_panel(seed=0):
+    """Create a panel with a few figure-like shapes."""
+    rng = np.random.default_rng(seed)
+    img = np.full((600, 600, 3), 255, dtype=np.uint8)
+    for _ in range(4):
+        center = tuple(int(v) for v in rng.integers(100, 500, size=2))
+        cv2.circle(img, center, int(rng.integers(40, 90)), (0, 0, 0), 3)
+    return img
+
+async def run_with_heartbeat(calls):
+    """Run coroutines at once and measure the longest stall of the event loop."""
+    gaps = []
+    done = asyncio.Event()
+
+    async def heartbeat():
+        last = time.perf_counter()
+        while not done.is_set():
+            await asyncio.sleep(0.01)
+            now = time.perf_counter()
+            gaps.append(now - last)
+            last = now
+
+    ticker = asyncio.create_task(heartbeat())
+    start = time.perf_counter()
+    try:
+        results = await asyncio.gather(*calls)
+    finally:
+        done.set()
+        await ticker
+    return results, time.perf_counter() - start, max(gaps)
+
+def test_concurrent_analyses_overlap(stand_in):
+    panels = [make_panel(seed) for seed in range(CONCURRENT_CALLS)]
+
+    results, elapsed, longest_stall = asyncio.run(
+        run_with_heartbeat([analyze_panel(img, panel_num) for panel_num, img in enumerate(panels, 1)]))
+
+    assert [result["panel_num"] for result in results] == list(range(1, CONCURRENT_CALLS + 1))
+    assert all(result["description"] for result in results)
+    assert set(results[0]["timings"]) == {"figures_ms", "objects_ms", "scene_ms", "relationships_ms",
+                                          "description_ms", "total_ms"}
+    # Run one after another, the provider calls alone would take CONCURRENT_CALLS latencies
+    assert elapsed < 2 * PROVIDER_LATENCY
+    assert longest_stall < PROVIDER_LATENCY / 2
+
+def test_concurrent_tool_calls_overlap(stand_in, tmp_path):
+    pytest.importorskip("mcp")
+    from mcp_server.tools import analyze_panel_tool
+
+    paths = []
+    for seed in range(CONCURRENT_CALLS):
+        path = tmp_path / f"panel_{seed}.png"
+        cv2.imwrite(str(path), make_panel(seed))
+        paths.append(str(path))
+
+    calls = [analyze_panel_tool({"image_data": path, "panel_num": panel_num, "is_path": True})
+             for panel_num, path in enumerate(paths, 1)]
+    responses, elapsed, longest_stall = asyncio.run(run_with_heartbeat(calls))
+
+    analyses = [json.loads(response["content"][0]["text"]) for response in responses]
+    assert [analysis["panel_num"] for analysis in analyses] == list(range(1, CONCURRENT_CALLS + 1))
+    assert elapsed < 2 * PROVIDER_LATENCY
+    assert longest_stall < PROVIDER_LATENCY / 2
@@ -0,0 +1,77 @@
+"""
+Tests for provider prompt caching.
+
+The bundled stand-in provider server records the requests sent by the
+provider clients and answers in the OpenAI and Anthropic formats, reporting
+cached tokens for repeated prefixes, so the request shape and cache
+accounting can be checked without real calls.
+
+Usage:
+    python -m pytest test_prompt_caching.py
+"""
+
+import json
+
+import pytest
+
+from mcp_server.utils.api_utils import MultiProviderAPI
+from mcp_server.utils.provider_utils import SYSTEM_PROMPT, prompt_cache_stats
+from stub_provider_server import start_stub_server
+
+@pytest.fixture
+def stand_in(monkeypatch):
+    """Run the stand-in server and point every provider at it."""
+    server = start_stub_server(record=True)
+    for provider, url in server.base_urls().items():
+        monkeypatch.setenv(f"{provider.upper()}_BASE_URL", url)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def make_client():
+    """Create a provider client with OpenAI and Anthropic keys."""
+    client = MultiProviderAPI()
+    client.keys = {"openai": "test", "anthropic": "test", "grok": "", "deepseek": ""}
+    return client
+
+def test_openai_requests_share_static_prefix(stand_in):
+    client = make_client()
+    before = prompt_cache_stats.snapshot().get("openai", {}).get("cached_tokens", 0)
+
+    client.generate_description({"figures": [{}], "motion": {"type": "static"}}, panel_num=1)
+    client.generate_description({"figures": [{}, {}], "motion": {"type": "action"}}, panel_num=2)
+
+    bodies = [body for path, body in stand_in.received]
+    assert len(bodies) == 2
+    for body in bodies:
+        assert body["messages"][0] == {"role": "system", "content": SYSTEM_PROMPT}
+        assert body["messages"][1]["role"] == "user"
+
+    # Everything before the user message is byte-identical across requests
+    prefixes = [json.dumps(body["messages"][0]) for body in bodies]
+    assert prefixes[0] == prefixes[1]
+    assert bodies[0]["messages"][1] != bodies[1]["messages"][1]
+
+    # The second request repeats the system prompt, so the stand-in reports it as cached
+    after = prompt_cache_stats.snapshot()["openai"]["cached_tokens"]
+    assert after - before == len(SYSTEM_PROMPT) // 4
+
+def test_anthropic_system_prompt_is_cache_marked(stand_in):
+    client = make_client()
+    client.keys["openai"] = ""
+    before = prompt_cache_stats.snapshot().get("anthropic", {}).get("cached_tokens", 0)
+
+    description = client.generate_description({"figures": [{}], "motion": {"type": "static"}}, panel_num=1)
+
+    assert description == "Two characters visible in a static scene."
+    path, body = stand_in.received[0]
+    assert path == "/anthropic/v1/messages"
+    assert body["system"] == [
+        {"type": "text", "text": SYSTEM_PROMPT, "cache_control": {"type": "ephemeral"}}
+    ]
+    assert body["messages"][0]["role"] == "user"
+
+    # A second call reads the prefix written by the first one
+    client.generate_description({"figures": [{}], "motion": {"type": "action"}}, panel_num=2)
+    after = prompt_cache_stats.snapshot()["anthropic"]["cached_tokens"]
+    assert after - before == len(SYSTEM_PROMPT) // 4
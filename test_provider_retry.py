@@ -0,0 +1,45 @@
+"""
+Tests for provider retries and Retry-After handling.
+
+Usage:
+    python -m pytest test_provider_retry.py
+"""
+
+import email.utils
+import time
+
+import pytest
+import requests
+
+from mcp_server.utils import provider_utils
+from mcp_server.utils.provider_utils import parse_retry_after, post_with_retry
+
+class FakeResponse:
+    """Minimal stand-in for requests.Response."""
+
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    def json(self):
+        return {"usage": {"total_tokens": 10}}
+
+def test_retry_after_seconds_and_date():
+    assert parse_retry_after({"Retry-After": "2"}) == 2.0
+    assert parse_retry_after({"retry-after-ms": "1500"}) == 1.5
+    future = email.utils.formatdate(time.time() + 60, usegmt=True)
+    assert 50 < parse_retry_after({"Retry-After": future}) <= 60
+
+@pytest.mark.parametrize("value", ["soon", "Mon, 99 Foo 2024", "-"])
+def test_garbage_retry_after_is_ignored(value):
+    assert parse_retry_after({"Retry-After": value}) is None
+
+def test_garbage_retry_after_still_retries(monkeypatch):
+    responses = [FakeResponse(429, {"Retry-After": "soon"}), FakeResponse(200)]
+    monkeypatch.setattr(requests, "post", lambda *args, **kwargs: responses.pop(0))
+    monkeypatch.setattr(provider_utils, "backoff_delay", lambda attempt, retry_after=None: 0.0)
+
+    response = post_with_retry("retry-test", "http://provider.invalid", {"messages": []}, {}, timeout=5)
+
+    assert response.status_code == 200
+    assert not responses